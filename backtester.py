@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🧪 ملف الاختبار الرجعي (backtester.py) | بوت كاسحة الألغام v6.6 🧪 ---
+# =======================================================================================
+# يعيد تشغيل شموع OHLCV مخزنة عبر قواعد الماسحات في strategies ويحاكي نفس منطق
+# وقف الخسارة/الهدف بالـ ATR والوقف المتحرك المضبوط في DEFAULT_SETTINGS.
+#
+# الاستخدام:
+#   python backtester.py --data-dir ./ohlcv --workers 8 --output report.json
+# كل ملف CSV في المجلد = عملة واحدة بأعمدة: timestamp,open,high,low,close,volume
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_SETTINGS, TIMEFRAME
+from indicators import IndicatorSet, spec
+from strategies import (CandleArrays, required_indicators, momentum_breakout_rule,
+                        breakout_squeeze_pro_rule, sniper_pro_rule)
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# الماسحات التي يمكن اختبارها من الشموع وحدها. support_rebound يحتاج شموع ساعة مستقلة
+# و whale_radar يحتاج دفتر أوامر تاريخي، لذا لا يدعمهما الاختبار الرجعي.
+BACKTEST_RULES = {
+    "momentum_breakout": momentum_breakout_rule,
+    "breakout_squeeze_pro": breakout_squeeze_pro_rule,
+    "sniper_pro": sniper_pro_rule,
+}
+
+EXIT_SEARCH_CHUNK = 512
+
+# =======================================================================================
+# --- Data Loading ---
+# =======================================================================================
+
+def load_ohlcv_dir(data_dir):
+    """Loads every CSV in `data_dir` into {symbol_key: (N, 6) float64 array}, keyed by file name."""
+    data = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        frame = pd.read_csv(path, usecols=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        frame = frame.sort_values('timestamp').drop_duplicates('timestamp')
+        data[os.path.splitext(os.path.basename(path))[0]] = frame[
+            ['timestamp', 'open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+    return data
+
+# =======================================================================================
+# --- Vectorized Signals ---
+# =======================================================================================
+
+def _htf_trend_mask(df, ma_period, timeframe=TIMEFRAME):
+    """Per-bar HTF filter from completed 1h candles only (no look-ahead)."""
+    hourly = df['close'].resample('1h').last().dropna()
+    bullish = hourly > hourly.rolling(ma_period).mean()
+    bullish.index = bullish.index + pd.Timedelta(hours=1)   # الساعة تُعرف فقط عند اكتمالها
+    bar_close_times = df.index + pd.Timedelta(timeframe.replace('m', 'min'))
+    return bullish.reindex(bar_close_times, method='ffill').fillna(False).to_numpy(dtype=bool)
+
+def _series(indicators, n, name, **params):
+    """Indicator values, or all-NaN when the series is too short for it (so every comparison is False)."""
+    values = indicators.value(name, **params)
+    return np.full(n, np.nan) if values is None else values
+
+def compute_signal_masks(candles, settings, strategies=None, indicators=None):
+    """Boolean entry masks for every bar of one symbol, one pass per strategy.
+
+    Bar i is treated like the live "last closed candle"; the trade is entered at the next bar's open.
+    Returns (bars, indicators, {strategy: mask}).
+    """
+    bars = CandleArrays.from_ohlcv(candles)
+    df = pd.DataFrame({'open': bars.open, 'high': bars.high, 'low': bars.low,
+                       'close': bars.close, 'volume': bars.volume},
+                      index=pd.to_datetime(bars.timestamp, unit='ms'))
+    liq_filters = settings['liquidity_filters']
+    vol_filters = settings['volatility_filters']
+    ema_filters = settings['ema_trend_filter']
+    if indicators is None:
+        indicators = IndicatorSet(df)
+    indicators.require(required_indicators(settings) | {
+        spec("sma", source='volume', length=liq_filters['rvol_period']),
+        spec("atr", length=vol_filters['atr_period_for_filter']),
+        spec("atr", length=settings['atr_period']),
+        spec("ema", length=ema_filters['ema_period']),
+    })
+
+    n = len(bars)
+    idx = np.arange(1, max(n - 1, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rvol = np.nan_to_num(bars.volume / _series(indicators, n, "sma", source='volume', length=liq_filters['rvol_period']))
+        atr_percent = _series(indicators, n, "atr", length=vol_filters['atr_period_for_filter']) / bars.close * 100
+
+    base = np.zeros(n, dtype=bool)
+    base[idx] = True
+    base &= atr_percent >= vol_filters['min_atr_percent']
+    if ema_filters['enabled']:
+        base &= bars.close > _series(indicators, n, "ema", length=ema_filters['ema_period'])
+    if settings.get('use_master_trend_filter'):
+        base &= _htf_trend_mask(df, settings['master_trend_filter_ma_period'])
+
+    masks = {}
+    for name in strategies or settings['active_scanners']:
+        rule = BACKTEST_RULES.get(name)
+        if rule is None:
+            continue
+        mask = np.zeros(n, dtype=bool)
+        if len(idx):
+            mask[idx] = np.asarray(rule(bars, indicators, settings.get(name, {}), rvol[idx], idx,
+                                            settings['liquidity_filters']['min_rvol']), dtype=bool)
+        masks[name] = mask & base
+    return bars, indicators, masks
+
+# =======================================================================================
+# --- Trade Simulation ---
+# =======================================================================================
+
+def _tsl_mode(settings, reason):
+    advanced = settings.get('trailing_sl_advanced', {})
+    if advanced.get('use_strategy_mapping'):
+        return advanced.get('strategy_tsl_mapping', {}).get(reason, advanced.get('default_tsl_strategy', 'atr'))
+    return advanced.get('strategy', 'percentage')
+
+def _trailing_stops(bars, start, end, entry, sl, mode, settings, indicators):
+    """Stop level in force on each bar of [start, end): SL until activation, then the trailing rule."""
+    advanced = settings.get('trailing_sl_advanced', {})
+    high = bars.high[start:end]
+    running_max = np.maximum.accumulate(high)
+    if not settings.get('trailing_sl_enabled', True):
+        return np.full(len(high), sl)
+
+    activated = running_max >= entry * (1 + settings['trailing_sl_activation_percent'] / 100)
+    if mode == 'atr':
+        atr = _series(indicators, len(bars), "atr", length=advanced.get('tsl_atr_period', 14))[start:end]
+        trail = running_max - atr * advanced.get('tsl_atr_multiplier', 2.5)
+    elif mode == 'ema':
+        trail = _series(indicators, len(bars), "ema", length=advanced.get('tsl_ema_period', 21))[start:end]
+    else:
+        trail = running_max * (1 - settings['trailing_sl_callback_percent'] / 100)
+    # عند التفعيل يرتفع الوقف لنقطة الدخول على الأقل، ولا ينزل أبداً بعد ذلك
+    stops = np.where(activated, np.fmax(trail, entry), sl)
+    stops = np.maximum.accumulate(np.fmax(stops, sl))
+    # الوقف المحسوب من قمة شمعة يصبح فعالاً من الشمعة التالية
+    return np.concatenate(([sl], stops[:-1]))
+
+def simulate_trades(bars, mask, reason, settings, indicators, fee_percent=0.1):
+    """Walks entries in time order (one open position per symbol/strategy) and finds each exit vectorially."""
+    atr = _series(indicators, len(bars), "atr", length=settings['atr_period'])
+    mode = _tsl_mode(settings, reason)
+    trades = []
+    n = len(bars)
+    next_free = 0
+    for i in np.flatnonzero(mask):
+        if i < next_free or i + 1 >= n or not np.isfinite(atr[i]):
+            continue
+        entry_bar = i + 1
+        entry = bars.open[entry_bar]
+        sl = entry - atr[i] * settings['atr_sl_multiplier']
+        tp = entry + (entry - sl) * settings['risk_reward_ratio']
+
+        exit_bar, exit_price, start = None, None, entry_bar
+        while start < n and exit_bar is None:
+            end = min(n, start + EXIT_SEARCH_CHUNK)
+            stops = _trailing_stops(bars, entry_bar, end, entry, sl, mode, settings, indicators)[start - entry_bar:]
+            stop_hit = bars.low[start:end] <= stops
+            tp_hit = bars.high[start:end] >= tp
+            hits = np.flatnonzero(stop_hit | tp_hit)
+            if hits.size:
+                k = hits[0]
+                exit_bar = start + k
+                # في حال تحقق الشرطين في نفس الشمعة نفترض الأسوأ (الوقف أولاً)
+                exit_price = min(bars.open[exit_bar], stops[k]) if stop_hit[k] else max(bars.open[exit_bar], tp)
+            start = end
+
+        status = "closed"
+        if exit_bar is None:
+            exit_bar, exit_price, status = n - 1, bars.close[-1], "open"
+        pnl_percent = (exit_price / entry - 1) * 100 - 2 * fee_percent
+        trades.append({"reason": reason, "entry_time": int(bars.timestamp[entry_bar]), "exit_time": int(bars.timestamp[exit_bar]),
+                       "entry_price": float(entry), "exit_price": float(exit_price), "pnl_percent": float(pnl_percent),
+                       "bars_held": int(exit_bar - entry_bar), "status": status})
+        next_free = exit_bar + 1
+    return trades
+
+def backtest_symbol(symbol, candles, settings, strategies=None, fee_percent=0.1, indicators=None):
+    """All trades for one symbol across the requested strategies."""
+    if len(candles) < settings['ema_trend_filter']['ema_period'] + 2:
+        return []
+    bars, indicators, masks = compute_signal_masks(candles, settings, strategies, indicators)
+    trades = []
+    for reason, mask in masks.items():
+        for trade in simulate_trades(bars, mask, reason, settings, indicators, fee_percent):
+            trade["symbol"] = symbol
+            trades.append(trade)
+    return trades
+
+# =======================================================================================
+# --- Reporting ---
+# =======================================================================================
+
+def _max_drawdown(pnl_usdt_in_time_order):
+    equity = np.concatenate(([0.0], np.cumsum(pnl_usdt_in_time_order)))
+    return float(np.max(np.maximum.accumulate(equity) - equity)) if equity.size else 0.0
+
+def summarize_trades(trades, settings):
+    """Per-strategy trade count, win rate, PnL (% and virtual USDT) and max drawdown."""
+    trade_size = settings['virtual_portfolio_balance_usdt'] * settings['virtual_trade_size_percentage'] / 100
+    report = {}
+    by_reason = {}
+    for trade in trades:
+        by_reason.setdefault(trade['reason'], []).append(trade)
+    for reason, items in sorted(by_reason.items()):
+        items.sort(key=lambda t: t['exit_time'])
+        pnl = np.array([t['pnl_percent'] for t in items])
+        pnl_usdt = pnl / 100 * trade_size
+        report[reason] = {
+            "trades": len(items), "win_rate": round(float((pnl > 0).mean() * 100), 2),
+            "total_pnl_percent": round(float(pnl.sum()), 2), "avg_pnl_percent": round(float(pnl.mean()), 3),
+            "total_pnl_usdt": round(float(pnl_usdt.sum()), 2), "max_drawdown_usdt": round(_max_drawdown(pnl_usdt), 2),
+            "avg_bars_held": round(float(np.mean([t['bars_held'] for t in items])), 1),
+        }
+    return report
+
+def _backtest_task(args):
+    symbol, candles, settings, strategies, fee_percent = args
+    return backtest_symbol(symbol, candles, settings, strategies, fee_percent)
+
+def run_backtest(data, settings=None, strategies=None, fee_percent=0.1, workers=1):
+    """Backtests every symbol in `data` ({symbol: (N, 6) array}); returns (report, trades)."""
+    settings = settings or copy.deepcopy(DEFAULT_SETTINGS)
+    tasks = [(symbol, candles, settings, strategies, fee_percent) for symbol, candles in data.items()]
+    trades = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_backtest_task, tasks, chunksize=4):
+                trades.extend(result)
+    else:
+        for task in tasks:
+            trades.extend(_backtest_task(task))
+    return summarize_trades(trades, settings), trades
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized backtest of the SCANNERS rules on stored OHLCV.")
+    parser.add_argument('--data-dir', required=True, help="Folder of per-symbol OHLCV CSV files.")
+    parser.add_argument('--settings', help="Settings JSON to use instead of DEFAULT_SETTINGS.")
+    parser.add_argument('--strategies', nargs='*', help="Subset of strategies to test.")
+    parser.add_argument('--fee-percent', type=float, default=0.1, help="Fee per side in percent.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help="Write the JSON report (and trades) to this file.")
+    args = parser.parse_args()
+
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    if args.settings:
+        with open(args.settings, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f))
+
+    data = load_ohlcv_dir(args.data_dir)
+    report, trades = run_backtest(data, settings, args.strategies, args.fee_percent, args.workers)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"report": report, "trades": trades}, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
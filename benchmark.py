@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- ⏲️ ملف قياس الأداء (benchmark.py) | بوت كاسحة الألغام v6.6 ⏲️ ---
+# =======================================================================================
+# قياسات قابلة للتكرار (بذرة ثابتة) للماسحات وحساب الدعم/المقاومة وتصفية الأسواق ومسارات
+# الكتابة في قاعدة البيانات، مع مقارنة بخط أساس محفوظ لاكتشاف التراجع في الأداء.
+#
+# الاستخدام:
+#   python benchmark.py --save-baseline          # حفظ خط الأساس
+#   python benchmark.py --tolerance 0.25         # مقارنة (رمز خروج 1 عند وجود تراجع)
+
+import argparse
+import asyncio
+import copy
+import gc
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import database
+from config import DEFAULT_SETTINGS, APP_ROOT
+from exchanges import bot_state
+from market_data import candle_cache
+from order_books import order_book_service
+from scan_scheduler import select_top_markets, select_top_markets_indexed
+from symbol_universe import SymbolUniverse
+from strategies import SCANNERS, find_support_resistance
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+BENCHMARK_BASELINE_FILE = os.path.join(APP_ROOT, 'benchmark_baseline.json')
+FIXTURE_EXCHANGES = ['binance', 'okx', 'bybit', 'kucoin', 'gate', 'mexc']
+
+# =======================================================================================
+# --- Seeded Fixtures ---
+# =======================================================================================
+
+def make_ohlcv(rng, candles=500, start_price=100.0, timeframe_ms=900_000):
+    """Random-walk OHLCV as an (N, 6) array: [timestamp, open, high, low, close, volume]."""
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.006, candles)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.004, candles))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.004, candles))
+    volume = rng.lognormal(10, 0.8, candles)
+    timestamp = 1_700_000_000_000 + np.arange(candles) * timeframe_ms
+    return np.column_stack([timestamp, open_, high, low, close, volume])
+
+def make_tickers(rng, count=10_000, exchanges=FIXTURE_EXCHANGES):
+    """Ticker dicts as aggregate_top_movers sees them (already tagged with their exchange)."""
+    bases = [f"C{i:05d}" for i in range(count // len(exchanges) + 1)]
+    quotes = rng.choice(['USDT', 'USDT', 'USDT', 'BTC', 'ETH'], size=count)
+    tickers = []
+    for i in range(count):
+        base = bases[i // len(exchanges)]
+        if i % 97 == 0:
+            base += rng.choice(['UP', 'DOWN', '3L', 'BULL'])
+        tickers.append({'symbol': f"{base}/{quotes[i]}", 'exchange': exchanges[i % len(exchanges)],
+                        'quoteVolume': float(rng.lognormal(13, 2)), 'percentage': float(rng.normal(0, 5)),
+                        'last': float(rng.uniform(0.01, 100))})
+    return tickers
+
+def make_order_book(rng, price=100.0, depth=20):
+    bids = [[price * (1 - 0.001 * (k + 1)), float(rng.lognormal(3, 1))] for k in range(depth)]
+    asks = [[price * (1 + 0.001 * (k + 1)), float(rng.lognormal(3, 1))] for k in range(depth)]
+    return {'bids': bids, 'asks': asks}
+
+class FixtureExchange:
+    """Just enough of a ccxt client for the network scanners to run against fixtures."""
+    def __init__(self, exchange_id, ohlcv, order_book):
+        self.id = exchange_id
+        self._ohlcv = ohlcv.tolist()
+        self._order_book = order_book
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=100):
+        return self._ohlcv[-limit:]
+
+    async def fetch_order_book(self, symbol, limit=20):
+        return self._order_book
+
+    def parse_timeframe(self, timeframe):
+        return {'15m': 900, '1h': 3600, '4h': 14400}[timeframe]
+
+    def milliseconds(self):
+        return int(self._ohlcv[-1][0])
+
+# =======================================================================================
+# --- Measurement ---
+# =======================================================================================
+
+def measure(func, repeat=30, warmup=3):
+    """Latency percentiles (ms) over `repeat` calls plus peak traced memory (KiB) of one extra call."""
+    for _ in range(warmup):
+        func()
+    gc.collect()
+    timings = np.empty(repeat)
+    for k in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings[k] = (time.perf_counter() - started) * 1000
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 4), "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4), "mean_ms": round(float(timings.mean()), 4),
+        "peak_kib": round(peak / 1024, 1), "repeat": repeat,
+    }
+
+def _scanner_benchmarks(rng, loop):
+    settings = bot_state.settings
+    ohlcv = make_ohlcv(rng, 500)
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df.index = pd.to_datetime(df['timestamp'], unit='ms')
+    exchange = FixtureExchange('fixture', make_ohlcv(rng, 150, timeframe_ms=3_600_000), make_order_book(rng))
+    benches = {}
+    for name, scanner in SCANNERS.items():
+        params = settings.get(name, {})
+        if asyncio.iscoroutinefunction(scanner):
+            def run(scanner=scanner, params=params):
+                candle_cache.invalidate()   # كل استدعاء يجلب ويحلل من جديد كما في أول فحص للعملة
+                order_book_service.invalidate()
+                return loop.run_until_complete(scanner(df, params, 2.0, 25, exchange, 'FIX/USDT'))
+        else:
+            def run(scanner=scanner, params=params):
+                return scanner(df, params, 2.0, 25, exchange, 'FIX/USDT')
+        benches[f"scanner.{name}"] = run
+    return benches
+
+def _support_resistance_benchmarks(rng):
+    benches = {}
+    for candles in (100, 1000):
+        bars = make_ohlcv(rng, candles)
+        high, low = bars[:, 2], bars[:, 3]
+        benches[f"find_support_resistance.{candles}"] = lambda high=high, low=low: find_support_resistance(high, low, window=[5, 10])
+    return benches
+
+def _aggregation_benchmarks(rng):
+    tickers = make_tickers(rng, 10_000)
+    settings = bot_state.settings
+    tickers_by_exchange = {}
+    for t in tickers:
+        tickers_by_exchange.setdefault(t['exchange'], {})[t['symbol']] = t
+    universe = SymbolUniverse()
+    excluded = settings['stablecoin_filter']['exclude_bases']
+    eligible = {ex_id: universe.sync(ex_id, {s: {'symbol': s} for s in by_symbol}, excluded)
+                for ex_id, by_symbol in tickers_by_exchange.items()}
+    return {"select_top_markets.10k": lambda: select_top_markets(tickers, settings),
+            "select_top_markets_indexed.10k": lambda: select_top_markets_indexed(tickers_by_exchange, eligible, settings)}
+
+def _database_benchmarks(rng, db_path):
+    database.DB_FILE = db_path   # قاعدة بيانات مؤقتة حتى لا نلمس ملف البوت
+    database.init_database()
+    signal = {'exchange': 'Binance', 'symbol': 'FIX/USDT', 'entry_price': 100.0, 'take_profit': 104.0,
+              'stop_loss': 98.0, 'quantity': 1.0, 'entry_value_usdt': 100.0, 'reason': 'momentum_breakout'}
+    trade_ids = [database.log_trade_to_db(signal) for _ in range(200)]
+    prices = itertools.cycle(rng.uniform(100, 110, 10_000).tolist())
+
+    def peak_updates():
+        # دورة تتبع واحدة: تحديث القمة لكل الصفقات المفتوحة (مخزن مؤقتاً)
+        for trade_id in trade_ids:
+            database.update_trade_peak_price_in_db(trade_id, next(prices))
+
+    def peak_updates_and_flush():
+        peak_updates()
+        database.flush_pending_trade_updates()
+
+    def log_and_close():
+        trade_id = database.log_trade_to_db(signal)
+        database.close_trade_in_db(trade_id, 'ناجحة', 104.0, 4.0)
+
+    return {
+        "db.log_trade_and_close": log_and_close,
+        "db.track_cycle_200_peak_updates": peak_updates,
+        "db.track_cycle_200_peak_updates_flush": peak_updates_and_flush,
+        "db.get_active_trades_200": database.get_active_trades_from_db,
+        "db.get_open_trades_200_registry": database.get_open_trades,
+    }
+
+def run_benchmarks(seed=42, repeat=30, only=None):
+    """Runs every benchmark (or those whose name contains `only`) and returns {name: stats}."""
+    bot_state.settings = copy.deepcopy(DEFAULT_SETTINGS)
+    rng = np.random.default_rng(seed)
+    loop = asyncio.new_event_loop()
+    tmp_dir = tempfile.mkdtemp(prefix="minesweeper_bench_")
+    try:
+        benches = {}
+        benches.update(_scanner_benchmarks(rng, loop))
+        benches.update(_support_resistance_benchmarks(rng))
+        benches.update(_aggregation_benchmarks(rng))
+        benches.update(_database_benchmarks(rng, os.path.join(tmp_dir, 'bench.db')))
+        results = {}
+        for name, func in benches.items():
+            if only and only not in name:
+                continue
+            results[name] = measure(func, repeat=repeat)
+            logger.info(f"Benchmark {name}: p50={results[name]['p50_ms']}ms p95={results[name]['p95_ms']}ms")
+        return results
+    finally:
+        loop.close()
+        database.close_db()
+
+# =======================================================================================
+# --- Baseline Comparison ---
+# =======================================================================================
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """Operations whose p50 or p95 grew more than `tolerance` (fraction) over the baseline."""
+    regressions = {}
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if base[key] > 0 and stats[key] > base[key] * (1 + tolerance):
+                regressions.setdefault(name, {})[key] = {"baseline": base[key], "current": stats[key],
+                                                         "change_percent": round((stats[key] / base[key] - 1) * 100, 1)}
+    return regressions
+
+def _environment():
+    return {"python": sys.version.split()[0], "numpy": np.__version__, "pandas": pd.__version__,
+            "cpu_count": os.cpu_count()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded benchmarks for scanners, aggregation and persistence.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--only', help="Run only benchmarks whose name contains this text.")
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmarks(args.seed, args.repeat, args.only)
+    print(f"{'operation':<45}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>11}")
+    for name, stats in results.items():
+        print(f"{name:<45}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['peak_kib']:>11.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"seed": args.seed, "environment": _environment(), "results": results}, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found. Run with --save-baseline first.")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline.get("results", {}), args.tolerance)
+    if not regressions:
+        print(f"No regressions against baseline (tolerance {args.tolerance:.0%}).")
+        return 0
+    print("Regressions:")
+    for name, keys in regressions.items():
+        for key, change in keys.items():
+            print(f"  {name} {key}: {change['baseline']} -> {change['current']} ms (+{change['change_percent']}%)")
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -34,12 +34,71 @@ TIMEFRAME = '15m'
 HIGHER_TIMEFRAME = '1h'
 SCAN_INTERVAL_SECONDS = 900
 TRACK_INTERVAL_SECONDS = 45
+DB_WRITE_BEHIND_FLUSH_SECONDS = 60
+SCAN_BUDGET_GRACE_SECONDS = 15
+SHARD_EXTRA_TIMEOUT_SECONDS = 60  # مهلة إضافية لعمليات الفحص المقسمة (بدء العملية وتحميل الأسواق)
+SHARD_FALLBACK_TIMEOUT_SECONDS = SCAN_INTERVAL_SECONDS  # مهلة عملية الفحص حين لا توجد ميزانية زمنية للفحص
+SHARD_RATE_LIMIT_SHARE = 0.7  # نصيب عملية الفحص من حد طلبات المنصة؛ الباقي للعملية الرئيسية (المتابعة والتداول)
+
+# --- ذاكرة الشموع المشتركة ---
+CANDLE_CACHE_MAX_CANDLES = 1000
+CANDLE_CACHE_MIN_REFRESH_SECONDS = 30
+INDICATOR_STORE_MAX_SERIES = 1000  # حالات المؤشرات التراكمية المحفوظة؛ الأقدم استخداماً يُحذف أولاً
+
+# --- منظم الطلبات المشترك لكل منصة ---
+RATE_LIMIT_BURST_SECONDS = 2
+RATE_LIMIT_HIGH_UTILIZATION = 0.85
+RATE_LIMIT_MAX_BACKOFF_SECONDS = 60
+
+# --- البث المباشر (WebSocket) ---
+STREAM_TRACK_INTERVAL_SECONDS = 5
+STREAM_RECONNECT_MAX_SECONDS = 60
+STREAM_REPLAY_FILE = os.getenv('STREAM_REPLAY_FILE', '')
+
+# --- فهرس الأسواق ---
+UNIVERSE_REFRESH_SECONDS = 6 * 3600
+LEVERAGED_TOKEN_SUFFIXES = ('UP', 'DOWN', '3L', '3S', '5L', '5S', 'BEAR', 'BULL')
+UNIVERSE_SERVER_FILTER_EXCHANGES = {'binance'}  # منصات تصفّي fetch_tickers(symbols) على الخادم
+MARKETS_CACHE_TTL_SECONDS = 6 * 3600  # عمر قائمة الأسواق المحفوظة على القرص قبل إعادة تنزيلها
+
+# --- دفاتر الأوامر المحلية (رادار الحيتان) ---
+ORDER_BOOK_DEPTH = 100
+ORDER_BOOK_STALE_SECONDS = 10
+ORDER_BOOK_WALL_PERCENT = 1.0      # نطاق قياس جدار الشراء حول السعر الأوسط
+ORDER_BOOK_HISTORY_SECONDS = 300   # نافذة قياس ثبات الجدار
+ORDER_BOOK_SAMPLE_SECONDS = 1
+
+# --- ذاكرة مدخلات وضع السوق (اتجاه BTC، الخوف والطمع، المزاج الأساسي) ---
+REGIME_BTC_TREND_TTL_SECONDS = 1800
+REGIME_FEAR_GREED_TTL_SECONDS = 3600
+REGIME_MOOD_TTL_SECONDS = 1800
+REGIME_MAX_STALE_SECONDS = 6 * 3600
+REGIME_HEDGE_DELAY_SECONDS = 2
+REGIME_REFRESH_INTERVAL_SECONDS = 60
+
+# --- الأخبار وتحليل المشاعر ---
+NEWS_FEED_URLS = ["https://cointelegraph.com/rss", "https://www.coindesk.com/arc/outboundfeeds/rss/"]
+NEWS_ENTRIES_PER_FEED = 5
+NEWS_FETCH_TIMEOUT_SECONDS = 15
+NEWS_SENTIMENT_CACHE_SIZE = 2048
+
+# --- التقويم الاقتصادي (Alpha Vantage) ---
+ECONOMIC_CALENDAR_COUNTRIES = ['USD', 'EUR']
+ECONOMIC_CALENDAR_RETRY_SECONDS = 3600  # مهلة إعادة المحاولة بعد فشل الجلب
+
+# --- نقطة القياسات المحلية (Prometheus) ---
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 = تعطيل؛ مثلاً 9108 لتشغيل نقطة القياسات
 
 # --- مسارات الملفات ---
 APP_ROOT = '.'
 DB_FILE = os.path.join(APP_ROOT, 'minesweeper_bot_v6.db')
 SETTINGS_FILE = os.path.join(APP_ROOT, 'minesweeper_settings_v6.json')
 LOG_FILE = os.path.join(APP_ROOT, 'minesweeper_bot_v6.log')
+OPTIMIZED_PRESETS_FILE = os.path.join(APP_ROOT, 'minesweeper_optimized_presets_v6.json')
+INDICATOR_CHECKPOINT_FILE = os.path.join(APP_ROOT, 'minesweeper_indicators_v6.pkl')
+ECONOMIC_CALENDAR_CACHE_FILE = os.path.join(APP_ROOT, 'minesweeper_economic_calendar_v6.json')
+MARKETS_CACHE_DIR = os.path.join(APP_ROOT, 'minesweeper_markets_v6')
 EGYPT_TZ = ZoneInfo("Africa/Cairo")
 
 # --- إعدادات الأنماط الجاهزة ---
@@ -136,7 +195,10 @@ DEFAULT_SETTINGS = {
     "automate_real_tsl": False,
     "real_trade_size_usdt": 15.0,
     "virtual_portfolio_balance_usdt": 1000.0, "virtual_trade_size_percentage": 5.0, "max_concurrent_trades": 10, "top_n_symbols_by_volume": 250, "concurrent_workers": 10,
+    "scan_time_budget_seconds": None,  # ميزانية زمنية اختيارية للفحص بالثواني (None = بدون حد)
+    "scan_priority_weights": {"volume": 1.0, "volatility": 0.5, "signal_proximity": 1.0},
     "market_regime_filter_enabled": True, "fundamental_analysis_enabled": True,
+    "streaming_enabled": False, "streaming_stale_after_seconds": 30,
     "active_scanners": ["momentum_breakout", "breakout_squeeze_pro", "support_rebound", "whale_radar", "sniper_pro"],
     "use_master_trend_filter": True, "master_trend_filter_ma_period": 50, "master_adx_filter_level": 22,
     "btc_trend_source_exchanges": ["binance", "bybit", "kucoin"],
@@ -144,6 +206,7 @@ DEFAULT_SETTINGS = {
     "use_dynamic_risk_management": True, "atr_period": 14, "atr_sl_multiplier": 2.5, "risk_reward_ratio": 2.0,
     "trailing_sl_enabled": True, "trailing_sl_activation_percent": 1.5, "trailing_sl_callback_percent": 1.0,
     "signal_cooldown_multiplier": 4.0,
+    "trade_archive_after_days": None,  # أرشفة الصفقات المغلقة الأقدم من N يوماً (None = بدون أرشفة؛ إحصائيات الأداء تقرأ جدول trades فقط)
     "rescue_sl_multiplier": 1.5,
     "trailing_sl_advanced": {
         "strategy": "percentage",
@@ -167,13 +230,18 @@ DEFAULT_SETTINGS = {
     "momentum_breakout": {"vwap_period": 14, "macd_fast": 12, "macd_slow": 26, "macd_signal": 9, "bbands_period": 20, "bbands_stddev": 2.0, "rsi_period": 14, "rsi_max_level": 68, "volume_spike_multiplier": 1.5},
     "breakout_squeeze_pro": {"bbands_period": 20, "bbands_stddev": 2.0, "keltner_period": 20, "keltner_atr_multiplier": 1.5, "volume_confirmation_enabled": True},
     "sniper_pro": {"compression_hours": 6, "max_volatility_percent": 12.0},
-    "whale_radar": {"wall_threshold_usdt": 30000},
+    "whale_radar": {"wall_threshold_usdt": 30000, "wall_levels": 10, "wall_within_percent": 0, "min_wall_persistence": 0.0},
+    "support_rebound": {"lookback_candles": 100, "sr_windows": [5]},
     "liquidity_filters": {"min_quote_volume_24h_usd": 1_000_000, "max_spread_percent": 0.5, "rvol_period": 20, "min_rvol": 1.5},
     "volatility_filters": {"atr_period_for_filter": 14, "min_atr_percent": 0.8},
     "stablecoin_filter": {"exclude_bases": ["USDT","USDC","DAI","FDUSD","TUSD","USDE","PYUSD","GUSD","EURT","USDJ"]},
     "ema_trend_filter": {"enabled": True, "ema_period": 200},
     "min_tp_sl_filter": {"min_tp_percent": 1.0, "min_sl_percent": 0.5},
     "min_signal_strength": 1,
+    "evaluation_mode": "pandas",
+    "cpu_offload_enabled": False, "cpu_offload_workers": None,
+    "incremental_indicators_enabled": False,
+    "scan_sharding_enabled": False, "scan_shard_groups": [],
     "active_preset_name": "PRO",
     "last_market_mood": {"timestamp": "N/A", "mood": "UNKNOWN", "reason": "No scan performed yet."},
     "last_suggestion_time": 0
@@ -8,26 +8,32 @@ import logging
 import json
 import time
 import pandas as pd
-import pandas_ta as ta
 import httpx
-import feedparser
 import ccxt
 from datetime import datetime
 from collections import defaultdict
 
 # --- استيراد الوحدات المخصصة ---
 from config import *
-from database import (log_trade_to_db, get_active_trades_from_db, close_trade_in_db as db_close_trade,
-                      update_trade_sl_in_db, update_trade_peak_price_in_db, save_settings)
+from database import (log_trade_to_db_async, get_active_trades_from_db_async, get_open_trades_async, close_trade_in_db_async,
+                      update_trade_sl_in_db_async, update_trade_peak_price_in_db_async, save_settings, active_trade_registry)
 from exchanges import bot_state, scan_lock, get_exchange_adapter, get_real_balance
-from strategies import SCANNERS, find_col
-
-# استيراد مشروط لمكتبات التحليل
-try:
-    from nltk.sentiment.vader import SentimentIntensityAnalyzer
-    NLTK_AVAILABLE = True
-except ImportError:
-    NLTK_AVAILABLE = False
+from market_data import candle_cache
+from streaming import market_stream
+from scan_scheduler import PriorityScanQueue, score_markets, select_top_markets_indexed
+from symbol_universe import symbol_universe, reload_markets
+from markets_cache import share_markets
+from scan_shards import run_sharded_scan, shutdown_shards
+from strategies import SCANNERS, NETWORK_SCANNERS, find_col, evaluation_specs
+from incremental_indicators import indicator_store
+from cpu_offload import evaluate_candles_async
+from metrics import metrics
+from regime_cache import regime_cache, hedged
+from news_feed import news_fetcher, sentiment_scorer
+from economic_calendar import economic_calendar
+from lazy_import import LazyModule
+
+ta = LazyModule("pandas_ta")   # يُستورد عند أول حساب وليس عند التشغيل
 
 # سيتم استيراد دوال إرسال الرسائل عند الحاجة لتجنب الاستيراد الدائري
 # from telegram_bot import send_telegram_message
@@ -39,51 +45,27 @@ logger = logging.getLogger("MinesweeperBot_v6")
 # =======================================================================================
 
 async def get_alpha_vantage_economic_events():
+    """Today's high-impact USD/EUR events from the daily on-disk calendar cache (None if unavailable)."""
     if ALPHA_VANTAGE_API_KEY == 'YOUR_AV_KEY_HERE': return []
-    today_str = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-    params = {'function': 'ECONOMIC_CALENDAR', 'horizon': '3month', 'apikey': ALPHA_VANTAGE_API_KEY}
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get('https://www.alphavantage.co/query', params=params, timeout=20)
-            response.raise_for_status()
-        data_str = response.text
-        if "premium" in data_str.lower(): return []
-        lines = data_str.strip().split('\r\n')
-        if len(lines) < 2: return []
-        header = [h.strip() for h in lines[0].split(',')]
-        high_impact_events = [dict(zip(header, [v.strip() for v in line.split(',')])).get('event', 'Unknown Event') 
-                              for line in lines[1:] 
-                              if dict(zip(header, [v.strip() for v in line.split(',')])).get('releaseDate', '') == today_str 
-                              and dict(zip(header, [v.strip() for v in line.split(',')])).get('impact', '').lower() == 'high' 
-                              and dict(zip(header, [v.strip() for v in line.split(',')])).get('country', '') in ['USD', 'EUR']]
-        if high_impact_events: logger.warning(f"High-impact events today: {high_impact_events}")
-        return high_impact_events
-    except httpx.RequestError as e:
-        logger.error(f"Failed to fetch economic calendar: {e}")
-        return None
-
-def get_latest_crypto_news(limit=15):
-    urls = ["https://cointelegraph.com/rss", "https://www.coindesk.com/arc/outboundfeeds/rss/"]
-    headlines = []
-    for url in urls:
-        try:
-            feed = feedparser.parse(url)
-            headlines.extend(entry.title for entry in feed.entries[:5])
-        except Exception as e:
-            logger.error(f"Failed to fetch news from {url}: {e}")
-    return list(set(headlines))[:limit]
+    high_impact_events = await economic_calendar.high_impact_events()
+    if high_impact_events: logger.warning(f"High-impact events today: {high_impact_events}")
+    return high_impact_events
+
+async def get_latest_crypto_news(limit=15):
+    return await news_fetcher.fetch_headlines(limit)
 
 def analyze_sentiment_of_headlines(headlines):
-    if not headlines or not NLTK_AVAILABLE: return 0.0
-    sia = SentimentIntensityAnalyzer()
-    total_compound_score = sum(sia.polarity_scores(headline)['compound'] for headline in headlines)
-    return total_compound_score / len(headlines) if headlines else 0.0
+    return sentiment_scorer.average(headlines)
 
 async def get_fundamental_market_mood():
+    """Cached (see regime_cache); falls back to DANGEROUS only when no recent mood is known."""
+    return await regime_cache.get("fundamental_mood")
+
+async def _fetch_fundamental_market_mood():
     high_impact_events = await get_alpha_vantage_economic_events()
-    if high_impact_events is None: return "DANGEROUS", -1.0, "فشل جلب البيانات الاقتصادية"
+    if high_impact_events is None: raise RuntimeError("Economic calendar unavailable.")
     if high_impact_events: return "DANGEROUS", -0.9, f"أحداث هامة اليوم: {', '.join(high_impact_events)}"
-    sentiment_score = analyze_sentiment_of_headlines(get_latest_crypto_news())
+    sentiment_score = analyze_sentiment_of_headlines(await get_latest_crypto_news())
     logger.info(f"Market sentiment score: {sentiment_score:.2f}")
     if sentiment_score > 0.25: return "POSITIVE", sentiment_score, f"مشاعر إيجابية (الدرجة: {sentiment_score:.2f})"
     elif sentiment_score < -0.25: return "NEGATIVE", sentiment_score, f"مشاعر سلبية (الدرجة: {sentiment_score:.2f})"
@@ -91,37 +73,49 @@ async def get_fundamental_market_mood():
 
 
 async def get_fear_and_greed_index():
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://api.alternative.me/fng/?limit=1", timeout=10)
-            response.raise_for_status()
-            data = response.json().get('data', [])
-            if data:
-                return int(data[0]['value'])
-    except Exception as e:
-        logger.error(f"Could not fetch Fear and Greed Index: {e}")
-    return None
+    """Cached (see regime_cache); None when no value newer than the stale limit is known."""
+    return await regime_cache.get("fear_and_greed")
+
+async def _fetch_fear_and_greed_index():
+    async with httpx.AsyncClient() as client:
+        response = await client.get("https://api.alternative.me/fng/?limit=1", timeout=10)
+        response.raise_for_status()
+        data = response.json().get('data', [])
+    if not data:
+        raise ValueError("Empty Fear and Greed response.")
+    return int(data[0]['value'])
+
+async def _fetch_btc_trend_from(ex_id, exchange):
+    ohlcv = await candle_cache.get_ohlcv(exchange, 'BTC/USDT', '4h', limit=55)
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['sma50'] = ta.sma(df['close'], length=50)
+    if pd.isna(df['sma50'].iloc[-1]):
+        raise ValueError(f"Not enough 4h BTC candles on {ex_id}.")
+    is_bullish = bool(df['close'].iloc[-1] > df['sma50'].iloc[-1])
+    logger.info(f"Successfully fetched BTC trend from {ex_id}. Bullish: {is_bullish}")
+    return is_bullish
+
+async def _fetch_btc_trend():
+    """Hedged across `btc_trend_source_exchanges`: a slow or failing source no longer delays the others."""
+    source_exchanges = bot_state.settings.get("btc_trend_source_exchanges", ["binance"])
+    calls = [lambda ex_id=ex_id, ex=bot_state.public_exchanges[ex_id]: _fetch_btc_trend_from(ex_id, ex)
+             for ex_id in source_exchanges if ex_id in bot_state.public_exchanges]
+    return await hedged(calls, REGIME_HEDGE_DELAY_SECONDS)
+
+regime_cache.register("btc_trend", _fetch_btc_trend, REGIME_BTC_TREND_TTL_SECONDS, REGIME_MAX_STALE_SECONDS)
+regime_cache.register("fear_and_greed", _fetch_fear_and_greed_index, REGIME_FEAR_GREED_TTL_SECONDS, REGIME_MAX_STALE_SECONDS)
+regime_cache.register("fundamental_mood", _fetch_fundamental_market_mood, REGIME_MOOD_TTL_SECONDS, REGIME_MAX_STALE_SECONDS,
+                      default=("DANGEROUS", -1.0, "فشل جلب البيانات الاقتصادية"))
+
+async def refresh_regime_inputs(context):
+    """Job: refreshes regime inputs shortly before they expire so scans always read a warm cache."""
+    regime_cache.refresh_due(lead_seconds=REGIME_REFRESH_INTERVAL_SECONDS)
 
 async def check_market_regime():
     settings = bot_state.settings
     fng_index = "N/A"
     
-    btc_trend_data = None
-    source_exchanges = settings.get("btc_trend_source_exchanges", ["binance"])
-    for ex_id in source_exchanges:
-        exchange = bot_state.public_exchanges.get(ex_id)
-        if not exchange:
-            continue
-        try:
-            ohlcv = await exchange.fetch_ohlcv('BTC/USDT', '4h', limit=55)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['sma50'] = ta.sma(df['close'], length=50)
-            btc_trend_data = df['close'].iloc[-1] > df['sma50'].iloc[-1]
-            logger.info(f"Successfully fetched BTC trend from {ex_id}. Bullish: {btc_trend_data}")
-            break 
-        except Exception as e:
-            logger.warning(f"Could not fetch BTC trend from {ex_id}, trying next... Error: {e}")
-    
+    btc_trend_data = await regime_cache.get("btc_trend")
     if btc_trend_data is None:
         return False, "فشل جلب بيانات BTC من كل المصادر المتاحة."
 
@@ -138,56 +132,48 @@ async def check_market_regime():
     return True, "وضع السوق مناسب لصفقات الشراء."
 
 async def aggregate_top_movers():
-    all_tickers = []
+    settings = bot_state.settings
+    excluded_bases = settings.get('stablecoin_filter', {}).get('exclude_bases', [])
     async def fetch(ex_id, ex):
         try:
-            return [dict(t, exchange=ex_id) for t in (await ex.fetch_tickers()).values()]
+            eligible = symbol_universe.sync(ex_id, getattr(ex, 'markets', None), excluded_bases)
+            # اختيار الأسواق دائماً من REST: البث لا يحمل إلا الرموز المشترك بها فلا يرى المتحركين الجدد
+            symbols = symbol_universe.request_symbols(ex_id)
+            return ex_id, await (ex.fetch_tickers(symbols) if symbols else ex.fetch_tickers()), eligible
         except Exception as e:
             logger.warning(f"Could not fetch tickers from {ex_id}: {e}")
-            return []
+            return ex_id, {}, frozenset()
     
     results = await asyncio.gather(*[fetch(ex_id, ex) for ex_id, ex in bot_state.public_exchanges.items()])
-    for res in results:
-        all_tickers.extend(res)
-        
-    settings = bot_state.settings
-    excluded_bases = settings.get('stablecoin_filter', {}).get('exclude_bases', [])
-    min_volume = settings.get('liquidity_filters', {}).get('min_quote_volume_24h_usd', 1000000)
-    
-    usdt_tickers = [
-        t for t in all_tickers if t.get('symbol') and t['symbol'].upper().endswith('/USDT') and 
-        t['symbol'].split('/')[0] not in excluded_bases and 
-        t.get('quoteVolume') and t['quoteVolume'] >= min_volume and 
-        not any(k in t['symbol'].upper() for k in ['UP','DOWN','3L','3S','BEAR','BULL'])
-    ]
-
-    grouped_symbols = defaultdict(list)
-    for ticker in usdt_tickers:
-        grouped_symbols[ticker['symbol']].append(ticker)
-
-    final_list = []
-    real_trading_exchanges = {ex for ex, enabled in settings.get("real_trading_per_exchange", {}).items() if enabled}
-    
-    for symbol, tickers in grouped_symbols.items():
-        real_trade_options = [t for t in tickers if t['exchange'] in real_trading_exchanges]
-        
-        if real_trade_options:
-            best_option = max(real_trade_options, key=lambda t: t.get('quoteVolume', 0))
-            final_list.append(best_option)
-        else:
-            best_option = max(tickers, key=lambda t: t.get('quoteVolume', 0))
-            final_list.append(best_option)
-
-    final_list.sort(key=lambda t: t.get('quoteVolume', 0), reverse=True)
-    top_markets = final_list[:settings.get('top_n_symbols_by_volume', 250)]
+    tickers_by_exchange = {ex_id: tickers for ex_id, tickers, _ in results}
+    eligible_by_exchange = {ex_id: eligible for ex_id, _, eligible in results}
+    ticker_count = sum(len(tickers) for tickers in tickers_by_exchange.values())
+
+    top_markets, post_filter_count = select_top_markets_indexed(tickers_by_exchange, eligible_by_exchange, settings)
+    track_books = 'whale_radar' in settings.get('active_scanners', [])
+    selected = defaultdict(set)
+    for market in top_markets:
+        selected[market['exchange']].add(market['symbol'])
+    # الاشتراك يتبع أفضل N الحالية: ما خرج منها يُلغى اشتراكه
+    for ex_id in bot_state.public_exchanges:
+        market_stream.set_subscriptions(ex_id, selected.get(ex_id, ()))
+        market_stream.set_book_subscriptions(ex_id, selected.get(ex_id, ()) if track_books else ())
     
-    logger.info(f"Aggregated markets. Found {len(all_tickers)} tickers -> Post-filter: {len(usdt_tickers)} -> Selected top {len(top_markets)} unique pairs with priority logic.")
+    logger.info(f"Aggregated markets. Found {ticker_count} tickers -> Post-filter: {post_filter_count} -> Selected top {len(top_markets)} unique pairs with priority logic.")
     bot_state.status_snapshot['markets_found'] = len(top_markets)
     return top_markets
 
+async def refresh_symbol_universe(context):
+    """Job: reloads market lists so new listings and delistings reach the universe index."""
+    excluded_bases = bot_state.settings.get('stablecoin_filter', {}).get('exclude_bases', [])
+    await reload_markets(bot_state.public_exchanges, excluded_bases)
+    for ex_id, private_exchange in bot_state.exchanges.items():
+        if ex_id in bot_state.public_exchanges:
+            share_markets(bot_state.public_exchanges[ex_id], private_exchange)
+
 async def get_higher_timeframe_trend(exchange, symbol, ma_period):
     try:
-        ohlcv_htf = await exchange.fetch_ohlcv(symbol, HIGHER_TIMEFRAME, limit=ma_period + 5)
+        ohlcv_htf = await candle_cache.get_ohlcv(exchange, symbol, HIGHER_TIMEFRAME, limit=ma_period + 5)
         if len(ohlcv_htf) < ma_period: return None, "Not enough HTF data"
         df_htf = pd.DataFrame(ohlcv_htf, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
         df_htf[f'SMA_{ma_period}'] = ta.sma(df_htf['close'], length=ma_period)
@@ -198,26 +184,78 @@ async def get_higher_timeframe_trend(exchange, symbol, ma_period):
         return None, f"Error: {e}"
 
 async def worker(queue, results_list, settings, failure_counter):
-    while not queue.empty():
-        market_info = await queue.get()
+    while (market_info := queue.get_nowait()) is not None:
         symbol = market_info.get('symbol', 'N/A')
         exchange_id = market_info.get('exchange')
         exchange = bot_state.public_exchanges.get(exchange_id)
         if not exchange or not settings.get('active_scanners'):
-            queue.task_done()
+            queue.task_done(market_info)
             continue
         try:
-            liq_filters = settings['liquidity_filters']
-            vol_filters = settings['volatility_filters']
+            bot_state.scan_proximity.pop((exchange_id, symbol), None)
             ema_filters = settings['ema_trend_filter']
 
-            # ... [The entire complex logic of the worker function] ...
-            # This is a placeholder for brevity in this example.
-            # In the real file, the full worker logic would be here.
+            with metrics.span("scan.fetch_candles", exchange=exchange_id):
+                ohlcv = await candle_cache.get_ohlcv(exchange, symbol, TIMEFRAME, limit=ema_filters['ema_period'] + 20)
+            if len(ohlcv) < ema_filters['ema_period']:
+                continue
+
+            # ... [Spread / order-book liquidity checks] ...
+
+            # المؤشرات والفلاتر والماسحات المعتمدة على الشموع فقط (داخل العملية أو في مجمع العمليات)
+            precomputed = None
+            if settings.get('incremental_indicators_enabled'):
+                # حالة المؤشرات المحفوظة تُحدَّث بالشموع المغلقة الجديدة فقط
+                with metrics.span("scan.incremental_sync"):
+                    precomputed = indicator_store.sync((exchange_id, symbol, TIMEFRAME), ohlcv, evaluation_specs(settings))
+            with metrics.span("scan.evaluate"):
+                evaluation = await evaluate_candles_async(ohlcv, settings, symbol, precomputed)
+            # زمن المؤشرات والماسحات يُقاس داخل evaluate_candles لأنه قد يعمل في عملية أخرى
+            for stage, seconds in evaluation['timings'].items():
+                metrics.observe("stage_duration_seconds", seconds, stage=f"scan.{stage}")
+            if not evaluation['passed_filters']:
+                continue
+
+            confirmed_reasons = list(evaluation['reasons'])
+            if (confirmed_reasons or evaluation['network_checks']) and settings.get('use_master_trend_filter'):
+                with metrics.span("scan.htf_trend", exchange=exchange_id):
+                    is_htf_bullish, _ = await get_higher_timeframe_trend(exchange, symbol, settings['master_trend_filter_ma_period'])
+                if not is_htf_bullish:
+                    continue
+
+            for name in evaluation['network_checks']:
+                _, network_check = NETWORK_SCANNERS[name]
+                try:
+                    with metrics.span(f"scan.network.{name}", exchange=exchange_id):
+                        passed = await network_check(exchange, symbol, settings.get(name, {}))
+                    if passed:
+                        confirmed_reasons.append(name)
+                except ccxt.RateLimitExceeded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"{name} scan failed for {symbol}: {e}")
+
+            bot_state.scan_proximity[(exchange_id, symbol)] = len(confirmed_reasons) / len(settings['active_scanners'])
+
+            # الإشارة تحتاج min_signal_strength ماسحات على الأقل. الدخول سعر إغلاق آخر شمعة مغلقة (نفس الشمعة
+            # التي فُحصت عليها القواعد)، والوقف ATR × atr_sl_multiplier تحته والهدف risk_reward_ratio ضعف المخاطرة
+            if confirmed_reasons and len(confirmed_reasons) >= settings.get('min_signal_strength', 1) and evaluation['atr']:
+                entry_price = evaluation['entry_price']
+                risk = evaluation['atr'] * settings['atr_sl_multiplier']
+                results_list.append({
+                    "symbol": symbol, "exchange": exchange_id.capitalize(), "entry_price": entry_price,
+                    "stop_loss": entry_price - risk, "take_profit": entry_price + risk * settings['risk_reward_ratio'],
+                    "reason": ' + '.join(confirmed_reasons), "strength": len(confirmed_reasons),
+                })
 
         except ccxt.RateLimitExceeded as e:
-            logger.warning(f"Rate limit exceeded for {symbol} on {exchange_id}. Pausing...: {e}")
-            await asyncio.sleep(10)
+            # المنظم المشترك أوقف المنصة مؤقتاً وخفض معدلها، لذا نعيد العملة للطابور بدلاً من النوم
+            if not market_info.get('rate_limit_retried'):
+                logger.warning(f"Rate limit exceeded for {symbol} on {exchange_id}. Re-queued behind the shared limiter: {e}")
+                await queue.put(dict(market_info, rate_limit_retried=True))
+            else:
+                logger.warning(f"Rate limit exceeded again for {symbol} on {exchange_id}. Skipping: {e}")
+                failure_counter[0] += 1
         except ccxt.NetworkError as e:
             logger.warning(f"Network error for {symbol}: {e}")
             failure_counter[0] += 1
@@ -225,24 +263,163 @@ async def worker(queue, results_list, settings, failure_counter):
             logger.error(f"CRITICAL ERROR in worker for {symbol} on {exchange_id}: {e}", exc_info=True)
             failure_counter[0] += 1
         finally:
-            queue.task_done()
+            queue.task_done(market_info)
+
+async def run_scan_workers(top_markets, settings, results_list=None):
+    """Scans markets best-priority first with `concurrent_workers` workers inside the scan's time budget.
+
+    Returns (signals, scan_report, failures); the report counts what the budget forced us to skip.
+    `results_list` may be any list-like collector (scan shards pass one that streams signals out).
+    """
+    scores = score_markets(top_markets, settings.get('scan_priority_weights', {}), bot_state.scan_proximity)
+    budget = settings.get('scan_time_budget_seconds')
+    queue = PriorityScanQueue(top_markets, scores, budget)
+    results_list = results_list if results_list is not None else []
+    failure_counter = [0]
+
+    workers = [asyncio.create_task(worker(queue, results_list, settings, failure_counter))
+               for _ in range(settings.get('concurrent_workers', 10))]
+    # مهلة إضافية قصيرة للعملات التي بدأت قبل انتهاء الميزانية مباشرة
+    timeout = budget + SCAN_BUDGET_GRACE_SECONDS if budget else None
+    _, pending = await asyncio.wait(workers, timeout=timeout)
+    if pending:
+        queue.cancel_in_flight()
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    scan_report = queue.report()
+    if scan_report['skipped'] or scan_report['cancelled']:
+        logger.warning(f"Scan budget of {budget}s exhausted: {scan_report['skipped']} markets skipped, "
+                       f"{scan_report['cancelled']} cancelled mid-scan.")
+    return results_list, scan_report, failure_counter[0]
 
 async def place_real_trade(signal):
     # ... [The entire logic of the place_real_trade function] ...
     return {'success': False, 'data': "Placeholder"}
 
+@metrics.timed("scan.total")
 async def perform_scan(context):
     from binance_trader import send_telegram_message # Local import to avoid circular dependency
-    # ... [The entire logic of the perform_scan function] ...
-    # This includes calling the worker, processing signals, and calling place_real_trade.
-    # It must call save_settings() at the end to persist the last_signal_time.
-    logger.info("Scan complete.")
+    settings = bot_state.settings
+    # ... [Market regime / fundamental mood gates and scan_in_progress bookkeeping] ...
+    with metrics.span("scan.aggregate"):
+        top_markets = await aggregate_top_movers()
+    with metrics.span("scan.workers"):
+        if settings.get('scan_sharding_enabled'):
+            # كل منصة/مجموعة في عملية مستقلة؛ الإشارات تعود هنا لتطبيق التهدئة وحدود الصفقات
+            signals, scan_report, failures, proximity = await run_sharded_scan(
+                top_markets, settings, list(bot_state.public_exchanges), dict(bot_state.scan_proximity))
+            bot_state.scan_proximity.update(proximity)
+        else:
+            await shutdown_shards()   # التقسيم أُوقف من الإعدادات: تُغلق العمليات ويعود حد الطلبات كاملاً
+            signals, scan_report, failures = await run_scan_workers(top_markets, settings)
+    metrics.inc("scan_markets_total", scan_report['completed'])
+    metrics.inc("scan_signals_total", len(signals))
+    metrics.inc("scan_failures_total", failures)
+    bot_state.status_snapshot['last_scan_report'] = scan_report
+    if settings.get('incremental_indicators_enabled') and not settings.get('scan_sharding_enabled'):
+        # مع التقسيم تبقى الحالة في عمليات الفحص وكل عملية تحفظ ملفها
+        await asyncio.to_thread(indicator_store.save_checkpoint, INDICATOR_CHECKPOINT_FILE)
+    opened = await process_signals(context, signals, settings, send_telegram_message)
+    bot_state.status_snapshot['signals_found'] = opened
+    logger.info(f"Scan complete. {len(signals)} signals, {opened} trades opened.")
+
+async def process_signals(context, signals, settings, send_telegram_message):
+    """Opens trades for the scan's signals, strongest first, and returns how many were opened.
+
+    A symbol is skipped while it is within `signal_cooldown_multiplier` candles of its last signal
+    or already has an open trade on that exchange, and nothing opens beyond `max_concurrent_trades`.
+    Exchanges enabled in `real_trading_per_exchange` go through place_real_trade; the rest are
+    logged as virtual trades sized from the virtual portfolio.
+    """
+    if not signals:
+        return 0
+    await get_open_trades_async()   # يضمن تحميل سجل الصفقات قبل عدّها
+    open_markets = active_trade_registry.symbols_by_exchange()
+    free_slots = settings['max_concurrent_trades'] - len(active_trade_registry)
+    cooldown_seconds = settings.get('signal_cooldown_multiplier', 0) * ccxt.Exchange.parse_timeframe(TIMEFRAME)
+    now = time.time()
+    opened = 0
+    for signal in sorted(signals, key=lambda s: s['strength'], reverse=True):
+        symbol, exchange_id = signal['symbol'], signal['exchange'].lower()
+        if opened >= free_slots:
+            logger.info(f"Max concurrent trades ({settings['max_concurrent_trades']}) reached; remaining signals not opened.")
+            break
+        if now - bot_state.last_signal_time.get(symbol, 0) < cooldown_seconds:
+            continue
+        if symbol in open_markets.get(exchange_id, ()):
+            continue
 
+        if settings['real_trading_per_exchange'].get(exchange_id):
+            result = await place_real_trade(signal)
+            if not result.get('success'):
+                logger.warning(f"Real trade for {symbol} on {exchange_id} was not placed: {result.get('data')}")
+                continue
+            signal = dict(signal, **result['data'], is_real_trade=True)
+        else:
+            trade_size = settings['virtual_portfolio_balance_usdt'] * settings['virtual_trade_size_percentage'] / 100
+            signal = dict(signal, quantity=trade_size / signal['entry_price'], entry_value_usdt=trade_size, is_real_trade=False)
+
+        trade_id = await log_trade_to_db_async(signal)
+        if trade_id is None:
+            continue
+        bot_state.last_signal_time[symbol] = now
+        opened += 1
+        metrics.inc("trades_opened_total", exchange=exchange_id, kind="real" if signal['is_real_trade'] else "virtual")
+        await send_telegram_message(context.bot, dict(signal, trade_id=trade_id), is_new=True)
+
+    if opened:
+        save_settings()   # يحفظ last_signal_time حتى تبقى فترة التهدئة بعد إعادة التشغيل
+    return opened
+
+async def fetch_prices_for_open_trades(symbols_by_exchange):
+    """{(exchange_id, symbol): last price} with at most one ticker request per exchange.
+
+    Streamed prices are used first; only the symbols the stream has not seen are fetched over REST.
+    """
+    async def fetch(ex_id, symbols):
+        prices = {}
+        missing = []
+        for symbol in symbols:
+            price = market_stream.get_price(ex_id, symbol)
+            if price is None:
+                missing.append(symbol)
+            else:
+                prices[(ex_id, symbol)] = price
+        exchange = bot_state.public_exchanges.get(ex_id)
+        if missing and exchange:
+            try:
+                tickers = await exchange.fetch_tickers(missing)
+                for symbol in missing:
+                    price = (tickers.get(symbol) or {}).get('last')
+                    if price is not None:
+                        prices[(ex_id, symbol)] = price
+            except Exception as e:
+                logger.warning(f"Tracker: could not fetch prices for {len(missing)} symbols on {ex_id}: {e}")
+        return prices
+
+    results = await asyncio.gather(*[fetch(ex_id, symbols) for ex_id, symbols in symbols_by_exchange.items()])
+    return {key: price for prices in results for key, price in prices.items()}
+
+@metrics.timed("track.total")
 async def track_open_trades(context):
-    # ... [The entire logic of the v6.5 refactored track_open_trades with batch fetching] ...
+    # الصفقات من السجل في الذاكرة، والأسعار بطلب واحد لكل منصة بدلاً من طلب لكل صفقة
+    active_trades = await get_open_trades_async()
+    symbols_by_exchange = active_trade_registry.symbols_by_exchange()
+    # أسعار الصفقات المفتوحة تبقى في البث حتى لو خرجت عملاتها من أفضل N
+    for ex_id in bot_state.public_exchanges:
+        market_stream.set_subscriptions(ex_id, symbols_by_exchange.get(ex_id, ()), group="trades")
+    if not active_trades:
+        return
+    with metrics.span("track.fetch_prices"):
+        prefetched_data = await fetch_prices_for_open_trades(symbols_by_exchange)
+    metrics.inc("track_trades_total", len(active_trades))
+    await asyncio.gather(*[check_single_trade(trade, context, prefetched_data) for trade in active_trades])
     logger.info("Tracking complete.")
 
 async def check_single_trade(trade, context, prefetched_data):
+    # prefetched_data: {(exchange_id, symbol): last price} من fetch_prices_for_open_trades
     # ... [The entire logic of the v6.5 refactored check_single_trade] ...
     # It calls process_trade_closure when a trade needs to be closed.
     pass
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🧵 ملف تفريغ المعالجة (cpu_offload.py) | بوت كاسحة الألغام v6.6 🧵 ---
+# =======================================================================================
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from strategies import evaluate_candles
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Process Pool for Indicator & Strategy Evaluation ---
+# =======================================================================================
+# حسابات pandas_ta والماسحات متزامنة وتحجب حلقة asyncio أثناء الفحص.
+# في هذا الوضع تُرسل مصفوفات الشموع لعمليات منفصلة وتعود النتائج للعمال غير المتزامنين.
+
+_process_pool = None
+
+def get_process_pool(max_workers=None):
+    global _process_pool
+    if _process_pool is None:
+        workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        # spawn: لا نرث حلقة asyncio أو اتصالات المنصات أو قاعدة البيانات من العملية الرئيسية
+        _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        logger.info(f"CPU offload enabled: process pool with {workers} workers.")
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+async def evaluate_candles_async(ohlcv, settings, symbol="", precomputed=None):
+    """Runs strategies.evaluate_candles inline, or in the process pool when `cpu_offload_enabled` is set."""
+    candles = np.asarray(ohlcv, dtype=np.float64)
+    if not settings.get('cpu_offload_enabled'):
+        return evaluate_candles(candles, settings, symbol, precomputed)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_process_pool(settings.get('cpu_offload_workers')),
+                                          evaluate_candles, candles, settings, symbol, precomputed)
+    except BrokenProcessPool:
+        logger.error("CPU offload pool crashed. Recreating it and evaluating this symbol inline.")
+        shutdown_process_pool()
+        return evaluate_candles(candles, settings, symbol, precomputed)
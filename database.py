@@ -6,51 +6,311 @@
 import sqlite3
 import logging
 import json
-from datetime import datetime
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime, timedelta
 from config import DB_FILE, EGYPT_TZ
+from metrics import metrics
 
 logger = logging.getLogger("MinesweeperBot_v6")
 
+# =======================================================================================
+# --- Shared Connection & DB Thread ---
+# =======================================================================================
+# اتصال واحد طويل العمر بوضع WAL بدلاً من فتح وإغلاق اتصال في كل دالة.
+# كل الاستدعاءات غير المتزامنة تمر عبر خيط مخصص حتى لا تحجب حلقة asyncio.
+
+_connection = None
+_connection_lock = threading.RLock()
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="minesweeper-db")
+
+def get_connection():
+    """Returns the process-wide SQLite connection, opening it in WAL mode on first use."""
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            conn = sqlite3.connect(DB_FILE, timeout=10, check_same_thread=False, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            _connection = conn
+        return _connection
+
+@contextmanager
+def _transaction(explicit=False):
+    """Serialises access to the shared connection and commits or rolls back as one unit.
+
+    sqlite3 only opens its implicit transaction before DML, so DDL (ALTER / CREATE) would autocommit
+    statement by statement; `explicit=True` issues BEGIN first so DDL is rolled back with the rest.
+    """
+    with _connection_lock:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            if explicit:
+                cursor.execute("BEGIN")
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def close_db():
+    """Flushes buffered trade updates, closes the shared connection and stops the DB thread (call on shutdown)."""
+    global _connection
+    _db_executor.shutdown(wait=True)
+    flush_pending_trade_updates()
+    with _connection_lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Runs a blocking DB function on the dedicated DB thread (timed including the wait for the thread)."""
+    loop = asyncio.get_running_loop()
+    with metrics.span(f"db.{func.__name__}"):
+        return await loop.run_in_executor(_db_executor, partial(func, *args, **kwargs))
+
+# --- العبارات المجهزة (يعيد sqlite3 استخدامها من ذاكرة العبارات لأن نصها ثابت) ---
+SQL_INSERT_TRADE = '''INSERT INTO trades (timestamp, exchange, symbol, entry_price, take_profit, stop_loss, quantity, entry_value_usdt, status, trailing_sl_active, highest_price, reason, trade_mode, entry_order_id, exit_order_ids_json)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+SQL_SELECT_ACTIVE = "SELECT * FROM trades WHERE status = 'نشطة'"
+SQL_SELECT_TRADE = "SELECT * FROM trades WHERE id=?"
+SQL_SELECT_QUANTITY = "SELECT quantity FROM trades WHERE id=?"
+SQL_CLOSE_TRADE = "UPDATE trades SET status=?, exit_price=?, closed_at=?, exit_value_usdt=?, pnl_usdt=? WHERE id=?"
+SQL_UPDATE_SL_AND_ORDERS = "UPDATE trades SET stop_loss=?, highest_price=?, trailing_sl_active=?, exit_order_ids_json=? WHERE id=?"
+SQL_FLUSH_BUFFERED = ("UPDATE trades SET highest_price=COALESCE(?, highest_price), stop_loss=COALESCE(?, stop_loss), "
+                      "trailing_sl_active=COALESCE(?, trailing_sl_active) WHERE id=?")
+
+# =======================================================================================
+# --- Write-Behind Buffer for Peak Price / Trailing SL ---
+# =======================================================================================
+
+class TradeWriteBuffer:
+    """يجمع تحديثات highest_price / stop_loss لكل صفقة في الذاكرة ويكتبها دفعة واحدة."""
+    FIELDS = ("highest_price", "stop_loss", "trailing_sl_active")
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.stats = {"buffered_writes": 0, "coalesced_writes": 0, "flushed_rows": 0, "flushes": 0}
+
+    def add(self, trade_id, **fields):
+        with self._lock:
+            self.stats["buffered_writes"] += 1
+            if trade_id in self._pending:
+                self.stats["coalesced_writes"] += 1
+                self._pending[trade_id].update(fields)
+            else:
+                self._pending[trade_id] = dict(fields)
+
+    def pop(self, trade_id):
+        with self._lock:
+            return self._pending.pop(trade_id, None)
+
+    def pending(self):
+        with self._lock:
+            return {trade_id: dict(fields) for trade_id, fields in self._pending.items()}
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def restore(self, pending):
+        """Puts back rows from a failed flush without overwriting anything newer."""
+        with self._lock:
+            for trade_id, fields in pending.items():
+                self._pending[trade_id] = {**fields, **self._pending.get(trade_id, {})}
+
+    @classmethod
+    def as_params(cls, trade_id, fields):
+        return tuple(fields.get(name) for name in cls.FIELDS) + (trade_id,)
+
+trade_write_buffer = TradeWriteBuffer()
+
+def flush_pending_trade_updates():
+    """Writes all buffered peak/SL updates in a single transaction. Returns the number of rows flushed."""
+    pending = trade_write_buffer.drain()
+    if not pending:
+        return 0
+    try:
+        with _transaction() as cursor:
+            cursor.executemany(SQL_FLUSH_BUFFERED, [TradeWriteBuffer.as_params(tid, f) for tid, f in pending.items()])
+        trade_write_buffer.stats["flushed_rows"] += len(pending)
+        trade_write_buffer.stats["flushes"] += 1
+        return len(pending)
+    except Exception as e:
+        trade_write_buffer.restore(pending)
+        logger.error(f"Failed to flush {len(pending)} buffered trade updates: {e}")
+        return 0
+
+# =======================================================================================
+# --- In-Memory Open-Trade Registry ---
+# =======================================================================================
+# الصفقات النشطة تُقرأ من SQLite مرة واحدة ثم تبقى متزامنة عبر دوال الفتح والإغلاق وتحديث الوقف،
+# فلا تحتاج كل دورة تتبع إلى قراءة كل الصفوف من جديد.
+
+class ActiveTradeRegistry:
+    """Open trades by id, indexed by (exchange, symbol); updated by the DB functions that change them."""
+    def __init__(self):
+        self._trades = {}
+        self._by_market = {}   # (exchange_id, symbol) -> {trade_id}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    @staticmethod
+    def _market_key(trade):
+        return (str(trade.get('exchange', '')).lower(), trade.get('symbol'))
+
+    def load(self, trades):
+        with self._lock:
+            self._trades, self._by_market = {}, {}
+            for trade in trades:
+                self._add_locked(trade)
+            self.loaded = True
+
+    def _add_locked(self, trade):
+        self._trades[trade['id']] = dict(trade)
+        self._by_market.setdefault(self._market_key(trade), set()).add(trade['id'])
+
+    def add(self, trade):
+        with self._lock:
+            if self.loaded:
+                self._add_locked(trade)
+
+    def remove(self, trade_id):
+        with self._lock:
+            trade = self._trades.pop(trade_id, None)
+            if trade is not None:
+                ids = self._by_market.get(self._market_key(trade))
+                ids.discard(trade_id)
+                if not ids:
+                    del self._by_market[self._market_key(trade)]
+
+    def update(self, trade_id, **fields):
+        with self._lock:
+            trade = self._trades.get(trade_id)
+            if trade is not None:
+                trade.update(fields)
+
+    def snapshot(self):
+        """Copies of all open trades (safe to mutate)."""
+        with self._lock:
+            return [dict(trade) for trade in self._trades.values()]
+
+    def symbols_by_exchange(self):
+        """{exchange_id: [symbols]} with open trades, for one batched price request per exchange."""
+        with self._lock:
+            grouped = {}
+            for exchange_id, symbol in self._by_market:
+                grouped.setdefault(exchange_id, []).append(symbol)
+            return grouped
+
+    def __len__(self):
+        return len(self._trades)
+
+active_trade_registry = ActiveTradeRegistry()
+
+def get_write_buffer_stats():
+    """Counters for the write-behind buffer, including how many writes were coalesced away."""
+    return {**trade_write_buffer.stats, "pending_rows": len(trade_write_buffer.pending())}
+
+# =======================================================================================
+# --- Versioned Schema Migrations ---
+# =======================================================================================
+
+TRADES_COLUMNS = {
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT", "timestamp": "TEXT", "exchange": "TEXT",
+    "symbol": "TEXT", "entry_price": "REAL", "take_profit": "REAL", "stop_loss": "REAL",
+    "quantity": "REAL", "entry_value_usdt": "REAL", "status": "TEXT", "exit_price": "REAL",
+    "closed_at": "TEXT", "exit_value_usdt": "REAL", "pnl_usdt": "REAL",
+    "trailing_sl_active": "BOOLEAN", "highest_price": "REAL", "reason": "TEXT",
+    "is_real_trade": "BOOLEAN", "trade_mode": "TEXT DEFAULT 'virtual'",
+    "entry_order_id": "TEXT", "exit_order_ids_json": "TEXT"
+}
+
+def _migration_add_missing_columns(cursor):
+    cursor.execute("PRAGMA table_info(trades)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    for col_name, col_type in TRADES_COLUMNS.items():
+        if col_name not in existing_columns:
+            logger.warning(f"Database schema mismatch. Missing column '{col_name}'. Adding it now.")
+            cursor.execute(f"ALTER TABLE trades ADD COLUMN {col_name} {col_type}")
+            logger.info(f"Column '{col_name}' added successfully.")
+
+def _migration_trade_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_status ON trades(status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_exchange_symbol ON trades(exchange, symbol)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_closed_at ON trades(closed_at)")
+
+def _migration_archive_table(cursor):
+    columns = {**TRADES_COLUMNS, "id": "INTEGER PRIMARY KEY"}
+    column_defs = ", ".join(f"{name} {col_type}" for name, col_type in columns.items())
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS trades_archive ({column_defs})")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_archive_closed_at ON trades_archive(closed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_archive_exchange_symbol ON trades_archive(exchange, symbol)")
+
+# (الإصدار، الوصف، الدالة) — لا تعدل ترحيلاً منشوراً، أضف ترحيلاً جديداً بإصدار أعلى
+SCHEMA_MIGRATIONS = [
+    (1, "ensure all trade columns exist", _migration_add_missing_columns),
+    (2, "indexes on status, (exchange, symbol) and closed_at", _migration_trade_indexes),
+    (3, "trades_archive table for old closed trades", _migration_archive_table),
+]
+
+def get_schema_version():
+    with _transaction() as cursor:
+        return cursor.execute("PRAGMA user_version").fetchone()[0]
+
 def migrate_database():
-    """Ensures the database schema is up-to-date with all required columns."""
+    """Applies every schema migration newer than the recorded version, each in its own transaction."""
     logger.info("Checking database schema...")
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        cursor = conn.cursor()
-        
-        required_columns = {
-            "id": "INTEGER PRIMARY KEY AUTOINCREMENT", "timestamp": "TEXT", "exchange": "TEXT",
-            "symbol": "TEXT", "entry_price": "REAL", "take_profit": "REAL", "stop_loss": "REAL",
-            "quantity": "REAL", "entry_value_usdt": "REAL", "status": "TEXT", "exit_price": "REAL",
-            "closed_at": "TEXT", "exit_value_usdt": "REAL", "pnl_usdt": "REAL",
-            "trailing_sl_active": "BOOLEAN", "highest_price": "REAL", "reason": "TEXT",
-            "is_real_trade": "BOOLEAN", "trade_mode": "TEXT DEFAULT 'virtual'",
-            "entry_order_id": "TEXT", "exit_order_ids_json": "TEXT"
-        }
-        
-        cursor.execute("PRAGMA table_info(trades)")
-        existing_columns = {row[1] for row in cursor.fetchall()}
-        
-        for col_name, col_type in required_columns.items():
-            if col_name not in existing_columns:
-                logger.warning(f"Database schema mismatch. Missing column '{col_name}'. Adding it now.")
-                cursor.execute(f"ALTER TABLE trades ADD COLUMN {col_name} {col_type}")
-                logger.info(f"Column '{col_name}' added successfully.")
-        
-        conn.commit()
-        conn.close()
-        logger.info("Database schema check complete.")
+        current_version = get_schema_version()
+        with _transaction() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)")
+
+        for version, description, migration in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            logger.info(f"Applying schema migration v{version}: {description}")
+            with _transaction(explicit=True) as cursor:
+                migration(cursor)
+                cursor.execute("INSERT OR REPLACE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                               (version, description, datetime.now(EGYPT_TZ).strftime('%Y-%m-%d %H:%M:%S')))
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+            current_version = version
+
+        logger.info(f"Database schema check complete (version {current_version}).")
     except Exception as e:
         logger.error(f"CRITICAL: Database migration failed: {e}", exc_info=True)
 
+def archive_closed_trades(older_than_days: int):
+    """Moves closed trades older than `older_than_days` into trades_archive. Returns the number moved."""
+    cutoff_str = (datetime.now(EGYPT_TZ) - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    column_list = ", ".join(TRADES_COLUMNS)
+    where = "status != 'نشطة' AND closed_at IS NOT NULL AND closed_at < ?"
+    try:
+        with _transaction() as cursor:
+            cursor.execute(f"INSERT OR REPLACE INTO trades_archive ({column_list}) SELECT {column_list} FROM trades WHERE {where}", (cutoff_str,))
+            cursor.execute(f"DELETE FROM trades WHERE {where}", (cutoff_str,))
+            moved = cursor.rowcount
+        if moved:
+            logger.info(f"Archived {moved} closed trades older than {older_than_days} days.")
+        return moved
+    except Exception as e:
+        logger.error(f"Failed to archive closed trades: {e}")
+        return 0
+
 def init_database():
     """Initializes the database file and table if they don't exist."""
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        cursor = conn.cursor()
-        cursor.execute('CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY AUTOINCREMENT)')
-        conn.commit()
-        conn.close()
+        with _transaction() as cursor:
+            cursor.execute('CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY AUTOINCREMENT)')
         migrate_database()
         logger.info(f"Database initialized and schema verified at: {DB_FILE}")
     except Exception as e:
@@ -59,11 +319,6 @@ def init_database():
 def log_trade_to_db(signal):
     """Logs a new trade signal to the database."""
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        cursor = conn.cursor()
-        sql = '''INSERT INTO trades (timestamp, exchange, symbol, entry_price, take_profit, stop_loss, quantity, entry_value_usdt, status, trailing_sl_active, highest_price, reason, trade_mode, entry_order_id, exit_order_ids_json)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
-
         if 'quantity' not in signal or signal['quantity'] is None:
             logger.error(f"Attempted to log trade for {signal['symbol']} with missing quantity.")
             return None
@@ -79,10 +334,12 @@ def log_trade_to_db(signal):
             signal['reason'], 'real' if signal.get('is_real_trade') else 'virtual',
             signal.get('entry_order_id'), signal.get('exit_order_ids_json')
         )
-        cursor.execute(sql, params)
-        trade_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with _transaction() as cursor:
+            cursor.execute(SQL_INSERT_TRADE, params)
+            trade_id = cursor.lastrowid
+            if active_trade_registry.loaded:
+                cursor.execute(SQL_SELECT_TRADE, (trade_id,))
+                active_trade_registry.add(dict(cursor.fetchone()))
         return trade_id
     except Exception as e:
         logger.error(f"Failed to log recommendation to DB: {e}", exc_info=True)
@@ -91,70 +348,121 @@ def log_trade_to_db(signal):
 def get_active_trades_from_db():
     """Fetches all active trades from the database."""
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM trades WHERE status = 'نشطة'")
-        active_trades = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with _transaction() as cursor:
+            cursor.execute(SQL_SELECT_ACTIVE)
+            active_trades = [dict(row) for row in cursor.fetchall()]
+        # القيم التي لم تُكتب بعد من المخزن المؤقت أحدث من قاعدة البيانات
+        pending = trade_write_buffer.pending()
+        if pending:
+            for trade in active_trades:
+                trade.update(pending.get(trade['id'], {}))
         return active_trades
     except Exception as e:
         logger.error(f"DB error in get_active_trades_from_db: {e}")
         return []
 
+def get_open_trades():
+    """Active trades from the in-memory registry (loaded from the DB on first use)."""
+    if not active_trade_registry.loaded:
+        try:
+            with _transaction() as cursor:
+                cursor.execute(SQL_SELECT_ACTIVE)
+                active_trades = [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"DB error while loading the open-trade registry: {e}")
+            return []
+        pending = trade_write_buffer.pending()
+        for trade in active_trades:
+            trade.update(pending.get(trade['id'], {}))
+        active_trade_registry.load(active_trades)
+        logger.info(f"Open-trade registry loaded with {len(active_trades)} active trades.")
+    return active_trade_registry.snapshot()
+
 def close_trade_in_db(trade_id: int, status: str, exit_price: float, pnl_usdt: float):
     """Updates a trade to a closed status in the database."""
     closed_at_str = datetime.now(EGYPT_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    pending = None
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        # First, get the quantity to calculate exit_value_usdt
-        cursor.execute("SELECT quantity FROM trades WHERE id=?", (trade_id,))
-        trade = cursor.fetchone()
-        if not trade:
-            logger.error(f"Cannot close trade #{trade_id}: Not found in DB.")
-            return
-        
-        exit_value_usdt = exit_price * trade['quantity']
-        
-        cursor.execute("UPDATE trades SET status=?, exit_price=?, closed_at=?, exit_value_usdt=?, pnl_usdt=? WHERE id=?",
-                       (status, exit_price, closed_at_str, exit_value_usdt, pnl_usdt, trade_id))
-        conn.commit()
-        conn.close()
+        pending = trade_write_buffer.pop(trade_id)
+        with _transaction() as cursor:
+            if pending:
+                cursor.execute(SQL_FLUSH_BUFFERED, TradeWriteBuffer.as_params(trade_id, pending))
+            # First, get the quantity to calculate exit_value_usdt
+            cursor.execute(SQL_SELECT_QUANTITY, (trade_id,))
+            trade = cursor.fetchone()
+            if not trade:
+                logger.error(f"Cannot close trade #{trade_id}: Not found in DB.")
+                return
+
+            exit_value_usdt = exit_price * trade['quantity']
+
+            cursor.execute(SQL_CLOSE_TRADE, (status, exit_price, closed_at_str, exit_value_usdt, pnl_usdt, trade_id))
+        active_trade_registry.remove(trade_id)
         logger.info(f"Successfully closed trade #{trade_id} in DB with status '{status}'.")
     except Exception as e:
+        if pending:
+            trade_write_buffer.restore({trade_id: pending})   # لا نفقد تحديثات القمة/الوقف المؤجلة
         logger.error(f"DB update failed while closing trade #{trade_id}: {e}")
 
 def update_trade_sl_in_db(trade_id: int, new_sl: float, highest_price: float, new_exit_ids_json: str = None):
-    """Updates the stop loss, highest price, and optionally order IDs for a trade."""
+    """Updates the stop loss, highest price, and optionally order IDs for a trade.
+
+    Without new order IDs the change is buffered (write-behind); order-ID changes are written immediately.
+    """
+    if new_exit_ids_json is None:
+        trade_write_buffer.add(trade_id, stop_loss=new_sl, highest_price=highest_price, trailing_sl_active=True)
+        active_trade_registry.update(trade_id, stop_loss=new_sl, highest_price=highest_price, trailing_sl_active=True)
+        return
+    pending = None
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        cursor = conn.cursor()
-        
-        sql = "UPDATE trades SET stop_loss=?, highest_price=?, trailing_sl_active=? "
-        params = [new_sl, highest_price, True]
-        
-        if new_exit_ids_json is not None:
-            sql += ", exit_order_ids_json=? "
-            params.append(new_exit_ids_json)
-
-        sql += "WHERE id=?"
-        params.append(trade_id)
-
-        cursor.execute(sql, tuple(params))
-        conn.commit()
-        conn.close()
+        pending = trade_write_buffer.pop(trade_id)
+        with _transaction() as cursor:
+            cursor.execute(SQL_UPDATE_SL_AND_ORDERS, (new_sl, highest_price, True, new_exit_ids_json, trade_id))
+        active_trade_registry.update(trade_id, stop_loss=new_sl, highest_price=highest_price, trailing_sl_active=True,
+                                     exit_order_ids_json=new_exit_ids_json)
     except Exception as e:
+        if pending:
+            trade_write_buffer.restore({trade_id: pending})
         logger.error(f"Failed to update SL for trade #{trade_id} in DB: {e}")
 
 def update_trade_peak_price_in_db(trade_id: int, highest_price: float):
-    """Updates only the highest price for a trade."""
-    try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE trades SET highest_price=? WHERE id=?", (highest_price, trade_id))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Failed to update peak price for trade #{trade_id} in DB: {e}")
+    """Updates only the highest price for a trade (buffered, flushed by flush_pending_trade_updates)."""
+    trade_write_buffer.add(trade_id, highest_price=highest_price)
+    active_trade_registry.update(trade_id, highest_price=highest_price)
+
+# =======================================================================================
+# --- Async Facade ---
+# =======================================================================================
+# نفس الدوال أعلاه لكن تُنفذ على خيط قاعدة البيانات المخصص، للاستخدام من داخل حلقة asyncio.
+
+async def log_trade_to_db_async(signal):
+    return await run_in_db_thread(log_trade_to_db, signal)
+
+async def get_active_trades_from_db_async():
+    return await run_in_db_thread(get_active_trades_from_db)
+
+async def get_open_trades_async():
+    if active_trade_registry.loaded:
+        return active_trade_registry.snapshot()   # لا حاجة لخيط قاعدة البيانات
+    return await run_in_db_thread(get_open_trades)
+
+async def close_trade_in_db_async(trade_id: int, status: str, exit_price: float, pnl_usdt: float):
+    return await run_in_db_thread(close_trade_in_db, trade_id, status, exit_price, pnl_usdt)
+
+async def update_trade_sl_in_db_async(trade_id: int, new_sl: float, highest_price: float, new_exit_ids_json: str = None):
+    return await run_in_db_thread(update_trade_sl_in_db, trade_id, new_sl, highest_price, new_exit_ids_json)
+
+async def update_trade_peak_price_in_db_async(trade_id: int, highest_price: float):
+    return await run_in_db_thread(update_trade_peak_price_in_db, trade_id, highest_price)
+
+async def archive_closed_trades_async(context=None, older_than_days: int = None):
+    """Job-queue friendly archive pass; defaults to the configured retention (off when it is not set)."""
+    from exchanges import bot_state  # استيراد محلي لتجنب الاستيراد الدائري
+    days = older_than_days or bot_state.settings.get('trade_archive_after_days')
+    if not days:
+        return 0
+    return await run_in_db_thread(archive_closed_trades, days)
+
+async def flush_pending_trade_updates_async(context=None):
+    """Job-queue friendly flush of the write-behind buffer."""
+    return await run_in_db_thread(flush_pending_trade_updates)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 📅 ملف التقويم الاقتصادي (economic_calendar.py) | بوت كاسحة الألغام v6.6 📅 ---
+# =======================================================================================
+# تقويم Alpha Vantage (3 أشهر) يُجلب مرة واحدة يومياً على الأكثر، ويُحلل مرة واحدة إلى فهرس
+# (تاريخ -> أحداث عالية التأثير) محفوظ على القرص. استعلام "أحداث اليوم" يصبح بحثاً في قاموس،
+# ويستمر العمل من الذاكرة عند تقييد الـ API أو انقطاعه.
+
+import csv
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from config import (ALPHA_VANTAGE_API_KEY, ECONOMIC_CALENDAR_CACHE_FILE, ECONOMIC_CALENDAR_COUNTRIES,
+                    ECONOMIC_CALENDAR_RETRY_SECONDS)
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+ALPHA_VANTAGE_URL = 'https://www.alphavantage.co/query'
+
+def parse_calendar_csv(text, countries=ECONOMIC_CALENDAR_COUNTRIES):
+    """{'YYYY-MM-DD': [{"event", "country", "time"}]} of the high-impact events for `countries`."""
+    index = {}
+    for row in csv.DictReader(io.StringIO(text.strip())):
+        row = {(k or '').strip(): (v or '').strip() for k, v in row.items()}
+        if row.get('impact', '').lower() != 'high' or row.get('country', '') not in countries:
+            continue
+        date = row.get('releaseDate', '')
+        if date:
+            index.setdefault(date, []).append({"event": row.get('event') or 'Unknown Event', "country": row['country'],
+                                               "time": row.get('releaseTime', '')})
+    return index
+
+class EconomicCalendar:
+    """Date-indexed high-impact events, refreshed at most once per UTC day and persisted to disk."""
+    def __init__(self, path=ECONOMIC_CALENDAR_CACHE_FILE, retry_seconds=ECONOMIC_CALENDAR_RETRY_SECONDS):
+        self.path = path
+        self.retry_seconds = retry_seconds
+        self.index = {}
+        self.fetched_date = None   # تاريخ UTC لآخر جلب ناجح
+        self.horizon_end = None    # آخر تاريخ يغطيه التقويم المحفوظ
+        self._last_attempt = 0.0
+        self._last_attempt_ok = False
+        self._loaded = False
+
+    # --- القرص ---
+    def _load(self):
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.index = data.get("index", {})
+            self.fetched_date = data.get("fetched_date")
+            self.horizon_end = data.get("horizon_end")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable economic calendar cache {self.path}: {e}")
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"fetched_date": self.fetched_date, "horizon_end": self.horizon_end, "index": self.index},
+                          f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save economic calendar cache to {self.path}: {e}")
+
+    # --- الجلب ---
+    async def _download(self):
+        params = {'function': 'ECONOMIC_CALENDAR', 'horizon': '3month', 'apikey': ALPHA_VANTAGE_API_KEY}
+        async with httpx.AsyncClient() as client:
+            response = await client.get(ALPHA_VANTAGE_URL, params=params, timeout=20)
+            response.raise_for_status()
+        return response.text
+
+    async def refresh(self, now=None):
+        """Downloads and re-indexes the calendar unless it was already fetched today (UTC).
+
+        Returns False when the download failed; the previous index stays in use.
+        """
+        if not self._loaded:
+            self._load()
+        now = now or datetime.now(timezone.utc)
+        today = now.strftime('%Y-%m-%d')
+        if self.fetched_date == today:
+            return True
+        if time.time() - self._last_attempt < self.retry_seconds:
+            return self._last_attempt_ok
+        self._last_attempt, self._last_attempt_ok = time.time(), False
+        try:
+            text = await self._download()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to fetch economic calendar: {e}")
+            return False
+        if "premium" in text.lower():
+            # المفتاح لا يدعم التقويم: نعامله كتقويم فارغ لهذا اليوم كما في السابق
+            self.index = {}
+        elif 'releaseDate' not in text.split('\n', 1)[0]:
+            # رسالة تقييد أو خطأ بصيغة JSON بدلاً من CSV
+            logger.warning(f"Economic calendar returned no CSV (rate-limited?): {text[:120]!r}")
+            return False
+        else:
+            self.index = parse_calendar_csv(text)
+        self.fetched_date, self._last_attempt_ok = today, True
+        self.horizon_end = (now + timedelta(days=90)).strftime('%Y-%m-%d')
+        self._save()
+        logger.info(f"Economic calendar refreshed: {sum(len(v) for v in self.index.values())} high-impact events indexed.")
+        return True
+
+    # --- الاستعلام ---
+    def covers(self, date_str):
+        return self.fetched_date is not None and self.fetched_date <= date_str <= (self.horizon_end or '')
+
+    def events_between(self, start, end):
+        """High-impact events from `start` to `end` (UTC datetimes). Events without a time count for their whole day."""
+        events = []
+        day = start.date()
+        while day <= end.date():
+            for event in self.index.get(day.isoformat(), []):
+                if event["time"]:
+                    try:
+                        at = datetime.fromisoformat(f"{day.isoformat()}T{event['time']}").replace(tzinfo=timezone.utc)
+                        if not start <= at <= end:
+                            continue
+                    except ValueError:
+                        pass
+                events.append(event["event"])
+            day += timedelta(days=1)
+        return events
+
+    async def high_impact_events(self, hours=None, now=None):
+        """Today's high-impact events (or those in the next `hours`); None if no cached calendar covers today."""
+        now = now or datetime.now(timezone.utc)
+        await self.refresh(now)
+        today = now.strftime('%Y-%m-%d')
+        if not self.covers(today):
+            return None
+        if hours is None:
+            return [event["event"] for event in self.index.get(today, [])]
+        return self.events_between(now, now + timedelta(hours=hours))
+
+# نسخة واحدة مشتركة
+economic_calendar = EconomicCalendar()
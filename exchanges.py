@@ -10,6 +10,7 @@ import logging
 import json
 import time
 from collections import deque, defaultdict
+from functools import wraps
 
 # استيراد الإعدادات والمفاتيح من ملف config.py
 from config import (
@@ -22,6 +23,10 @@ from config import (
     BYBIT_API_KEY, BYBIT_API_SECRET
 )
 
+from rate_limiter import attach_rate_limiter
+from markets_cache import load_markets_cached, share_markets
+from metrics import metrics
+
 logger = logging.getLogger("MinesweeperBot_v6")
 
 class BotState:
@@ -34,9 +39,10 @@ class BotState:
         self.status_snapshot = {
             "last_scan_start_time": None, "last_scan_end_time": None,
             "markets_found": 0, "signals_found": 0, "active_trades_count": 0,
-            "scan_in_progress": False, "btc_market_mood": "غير محدد"
+            "scan_in_progress": False, "btc_market_mood": "غير محدد", "last_scan_report": {}
         }
         self.scan_history = deque(maxlen=10)
+        self.scan_proximity = {}
 
 # إنشاء نسخة واحدة يمكن الوصول إليها من كل الملفات
 bot_state = BotState()
@@ -48,6 +54,14 @@ report_lock = asyncio.Lock()
 # --- 🚀 إعادة هيكلة المحولات (Adapters) لدعم منصات متعددة 🚀 ---
 # =======================================================================================
 
+def timed_adapter_call(func):
+    """Times an adapter coroutine as `adapter.<name>` labelled with the adapter's exchange."""
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        with metrics.span(f"adapter.{func.__name__}", exchange=self.exchange.id):
+            return await func(self, *args, **kwargs)
+    return wrapper
+
 class ExchangeAdapter:
     """كلاس أساسي مجرد لنمط المحول."""
     def __init__(self, exchange_client):
@@ -61,6 +75,7 @@ class ExchangeAdapter:
 
 class OcoAdapter(ExchangeAdapter):
     """محول أساسي للمنصات التي تدعم أوامر OCO (مثل Binance, Bybit, Gate, OKX)."""
+    @timed_adapter_call
     async def place_exit_orders(self, signal, verified_quantity):
         symbol = signal['symbol']
         tp_price = self.exchange.price_to_precision(symbol, signal['take_profit'])
@@ -75,6 +90,7 @@ class OcoAdapter(ExchangeAdapter):
         )
         return {"oco_id": oco_order['id']}
 
+    @timed_adapter_call
     async def update_trailing_stop_loss(self, trade, new_sl):
         symbol = trade['symbol']
         exit_ids = json.loads(trade.get('exit_order_ids_json', '{}'))
@@ -104,6 +120,7 @@ class OcoAdapter(ExchangeAdapter):
 
 class DualOrderAdapter(ExchangeAdapter):
     """محول أساسي للمنصات التي تتطلب أمرين منفصلين للخروج (مثل KuCoin, MEXC)."""
+    @timed_adapter_call
     async def place_exit_orders(self, signal, verified_quantity):
         symbol = signal['symbol']
         tp_price = self.exchange.price_to_precision(symbol, signal['take_profit'])
@@ -120,6 +137,7 @@ class DualOrderAdapter(ExchangeAdapter):
         
         return {"tp_id": tp_order['id'], "sl_id": sl_order['id']}
 
+    @timed_adapter_call
     async def update_trailing_stop_loss(self, trade, new_sl):
         symbol = trade['symbol']
         exit_ids = json.loads(trade.get('exit_order_ids_json', '{}'))
@@ -174,7 +192,8 @@ async def initialize_exchanges():
     async def connect(ex_id):
         try:
             public_exchange = getattr(ccxt_async, ex_id)({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
-            await public_exchange.load_markets()
+            attach_rate_limiter(public_exchange)
+            await load_markets_cached(public_exchange)
             bot_state.public_exchanges[ex_id] = public_exchange
             logger.info(f"Connected to {ex_id} with PUBLIC client.")
         except Exception as e:
@@ -193,7 +212,12 @@ async def initialize_exchanges():
             params.update(credentials)
             try:
                 private_exchange = getattr(ccxt_async, ex_id)(params)
-                await private_exchange.load_markets()
+                attach_rate_limiter(private_exchange)
+                if ex_id in bot_state.public_exchanges:
+                    # نفس الأسواق التي حمّلها العميل العام، بدون تنزيل ثانٍ
+                    share_markets(bot_state.public_exchanges[ex_id], private_exchange)
+                else:
+                    await load_markets_cached(private_exchange)
                 bot_state.exchanges[ex_id] = private_exchange
                 logger.info(f"Connected to {ex_id} with PRIVATE client.")
             except Exception as e:
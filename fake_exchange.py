@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🧪 ملف المنصة الوهمية (fake_exchange.py) | بوت كاسحة الألغام v6.6 🧪 ---
+# =======================================================================================
+# منصة داخل العملية تحاكي واجهة ccxt غير المتزامنة التي يستخدمها البوت، لتشغيل الفحص
+# والتتبع والمحولات (Adapters) بدون منصات حقيقية، مع زمن استجابة وأخطاء حدود طلبات قابلة للضبط.
+#
+# اختبار التحميل:
+#   python fake_exchange.py --exchanges 6 --markets 2000 --workers 10 25 50 100
+
+import argparse
+import asyncio
+import copy
+import itertools
+import logging
+import random
+import time
+import zlib
+from collections import defaultdict
+
+import ccxt
+import numpy as np
+
+from config import DEFAULT_SETTINGS, EXCHANGES_TO_SCAN
+from exchanges import bot_state
+from market_data import candle_cache
+from rate_limiter import attach_rate_limiter, rate_limiters
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+TIMEFRAME_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+FAKE_HISTORY_CANDLES = 1000
+
+# =======================================================================================
+# --- Fake Exchange ---
+# =======================================================================================
+
+class FakeExchange:
+    """Synthetic spot exchange with the subset of the ccxt async API the bot calls.
+
+    Prices are seeded random walks per symbol, so runs are reproducible. Every call goes through
+    `throttle()` and `fetch()` like a real ccxt client, so attach_rate_limiter() works unchanged.
+    The fake answers 429s when its own server-side budget (`requests_per_second`) is exceeded.
+    """
+    def __init__(self, exchange_id, markets=2000, seed=0, latency_ms=30.0, jitter_ms=15.0,
+                 requests_per_second=None, error_rate=0.0, rate_limit_ms=50, clock=time.time):
+        self.id = exchange_id
+        self.apiKey = f"fake-{exchange_id}"
+        self.rateLimit = rate_limit_ms
+        self.has = {'fetchTickers': True, 'fetchOHLCV': True, 'fetchOrderBook': True, 'createOrder': True,
+                    'watchOHLCVForSymbols': False}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests_per_second = requests_per_second
+        self.error_rate = error_rate
+        self.clock = clock
+        self.seed = seed
+        self.last_response_headers = {}
+        self._rng = random.Random(zlib.crc32(f"{seed}:{exchange_id}".encode()))
+        self._server_tokens = float(requests_per_second or 0)
+        self._server_refill_at = clock()
+        self._series = {}
+        self._orders = {}
+        self._orders_by_symbol = defaultdict(list)
+        self._order_ids = itertools.count(1)
+        self.balance = {'USDT': 100_000.0}
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "simulated_latency_seconds": 0.0}
+        self.markets = self._build_markets(markets)
+        self.symbols = list(self.markets)
+
+    # --- أدوات ccxt التي تستدعيها المحولات والذاكرة المؤقتة ---
+    async def throttle(self, cost=None):
+        pass
+
+    def milliseconds(self):
+        return int(self.clock() * 1000)
+
+    def parse_timeframe(self, timeframe):
+        return TIMEFRAME_SECONDS[timeframe]
+
+    def price_to_precision(self, symbol, price):
+        return f"{float(price):.{self.markets[symbol]['precision']['price']}f}"
+
+    def amount_to_precision(self, symbol, amount):
+        return f"{float(amount):.{self.markets[symbol]['precision']['amount']}f}"
+
+    async def close(self):
+        pass
+
+    def _build_markets(self, count):
+        markets = {}
+        bases = ['BTC', 'ETH'] + [f"FAKE{i:04d}" for i in range(max(count - 2, 0))]
+        for base in bases[:count]:
+            symbol = f"{base}/USDT"
+            rng = random.Random(zlib.crc32(f"{self.seed}:{symbol}".encode()))   # نفس السعر للعملة على كل المنصات
+            price = 60000.0 if base == 'BTC' else 3000.0 if base == 'ETH' else 10 ** rng.uniform(-3, 2)
+            markets[symbol] = {
+                'id': symbol.replace('/', ''), 'symbol': symbol, 'base': base, 'quote': 'USDT',
+                'active': True, 'spot': True, 'type': 'spot',
+                'precision': {'price': max(2, int(-np.floor(np.log10(price))) + 4), 'amount': 4},
+                'info': {'start_price': price, 'volatility': rng.uniform(0.002, 0.012),
+                         'quote_volume': rng.lognormvariate(15, 1.5)},
+            }
+        return markets
+
+    # --- محاكاة الشبكة ---
+    async def fetch(self, url, method='GET', headers=None, body=None):
+        """Simulated HTTP round trip: latency, jitter, injected errors and server-side rate limiting."""
+        self.stats["requests"] += 1
+        delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        self.stats["simulated_latency_seconds"] += delay
+        await asyncio.sleep(delay)
+
+        headers_out = {}
+        if self.requests_per_second:
+            now = self.clock()
+            self._server_tokens = min(self.requests_per_second,
+                                      self._server_tokens + (now - self._server_refill_at) * self.requests_per_second)
+            self._server_refill_at = now
+            if self._server_tokens < 1:
+                self.stats["rate_limited"] += 1
+                self.last_response_headers = {'Retry-After': '1'}
+                raise ccxt.RateLimitExceeded(f"{self.id} 429 Too Many Requests {url}")
+            self._server_tokens -= 1
+            headers_out = {'x-ratelimit-limit': str(self.requests_per_second),
+                           'x-ratelimit-remaining': str(int(self._server_tokens))}
+        self.last_response_headers = headers_out
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            raise ccxt.RequestTimeout(f"{self.id} simulated timeout {url}")
+        return {}
+
+    async def _request(self, path, cost=1):
+        await self.throttle(cost)
+        await self.fetch(f"https://fake.{self.id}/{path}")
+
+    # --- بيانات السوق ---
+    def _get_series(self, symbol, timeframe):
+        """Candles up to now for one symbol/timeframe, extended as the clock moves forward."""
+        tf_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        now_open = self.milliseconds() // tf_ms * tf_ms
+        key = (symbol, timeframe)
+        series = self._series.get(key)
+        if series is None:
+            info = self.markets[symbol]['info']
+            rng = np.random.default_rng(zlib.crc32(f"{self.seed}:{self.id}:{symbol}:{timeframe}".encode()))
+            start = now_open - (FAKE_HISTORY_CANDLES - 1) * tf_ms
+            series = self._series[key] = {"rng": rng, "candles": self._walk(rng, start, FAKE_HISTORY_CANDLES, tf_ms,
+                                                                              info['start_price'], info['volatility'])}
+        candles = series["candles"]
+        missing = int((now_open - candles[-1, 0]) // tf_ms)
+        if missing > 0:
+            info = self.markets[symbol]['info']
+            new = self._walk(series["rng"], candles[-1, 0] + tf_ms, missing, tf_ms, candles[-1, 4], info['volatility'])
+            series["candles"] = np.vstack([candles, new])[-FAKE_HISTORY_CANDLES:]
+        return series["candles"]
+
+    @staticmethod
+    def _walk(rng, start_ts, count, tf_ms, start_price, volatility):
+        close = start_price * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+        open_ = np.concatenate(([start_price], close[:-1]))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, volatility / 2, count))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, volatility / 2, count))
+        volume = rng.lognormal(10, 0.8, count)
+        return np.column_stack([start_ts + np.arange(count) * tf_ms, open_, high, low, close, volume])
+
+    def last_price(self, symbol):
+        return float(self._get_series(symbol, '15m')[-1, 4])
+
+    def set_price(self, symbol, price):
+        """Forces the live price (closes the forming candle there) and runs order matching. For tests."""
+        candles = self._get_series(symbol, '15m')
+        candles[-1, 4] = price
+        candles[-1, 2] = max(candles[-1, 2], price)
+        candles[-1, 3] = min(candles[-1, 3], price)
+        self._match_orders(symbol, price)
+
+    def _ticker(self, symbol):
+        candles = self._get_series(symbol, '15m')
+        last = float(candles[-1, 4])
+        day_open = float(candles[-96, 1]) if len(candles) >= 96 else float(candles[0, 1])
+        self._match_orders(symbol, last)
+        return {'symbol': symbol, 'timestamp': self.milliseconds(), 'last': last, 'close': last,
+                'bid': last * 0.9995, 'ask': last * 1.0005, 'open': day_open,
+                'percentage': (last / day_open - 1) * 100,
+                'quoteVolume': self.markets[symbol]['info']['quote_volume']}
+
+    async def load_markets(self, reload=False):
+        await self._request('exchangeInfo', cost=10)
+        return self.markets
+
+    async def fetch_tickers(self, symbols=None, params=None):
+        await self._request('ticker/24hr', cost=40 if symbols is None else 2)
+        return {s: self._ticker(s) for s in (symbols or self.symbols) if s in self.markets}
+
+    async def fetch_ticker(self, symbol, params=None):
+        await self._request('ticker/24hr')
+        return self._ticker(symbol)
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        await self._request('klines', cost=2)
+        if symbol not in self.markets:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol}")
+        candles = self._get_series(symbol, timeframe)
+        if since is not None:
+            candles = candles[candles[:, 0] >= since]
+        return candles[-(limit or 500):].tolist()
+
+    async def fetch_order_book(self, symbol, limit=20, params=None):
+        await self._request('depth', cost=5)
+        last = self.last_price(symbol)
+        sizes = self._rng.lognormvariate
+        bids = [[last * (1 - 0.0005 * (k + 1)), sizes(2, 1.2) * 100 / last] for k in range(limit or 20)]
+        asks = [[last * (1 + 0.0005 * (k + 1)), sizes(2, 1.2) * 100 / last] for k in range(limit or 20)]
+        return {'symbol': symbol, 'bids': bids, 'asks': asks, 'timestamp': self.milliseconds()}
+
+    # --- الحساب والأوامر ---
+    async def fetch_balance(self, params=None):
+        await self._request('account', cost=10)
+        free = dict(self.balance)
+        for order in self._orders.values():
+            if order['status'] == 'open' and order['side'] == 'sell':
+                base = self.markets[order['symbol']]['base']
+                free[base] = free.get(base, 0.0) - order['remaining']
+        return {'free': free, 'total': dict(self.balance)}
+
+    def _new_order(self, symbol, type, side, amount, price=None, stop_price=None, status='open', oco_id=None):
+        order = {'id': str(next(self._order_ids)), 'symbol': symbol, 'type': type, 'side': side,
+                 'amount': float(amount), 'price': float(price) if price is not None else None,
+                 'stopPrice': float(stop_price) if stop_price is not None else None,
+                 'status': status, 'filled': 0.0, 'remaining': float(amount), 'average': None,
+                 'timestamp': self.milliseconds(), 'info': {'oco_id': oco_id}}
+        self._orders[order['id']] = order
+        self._orders_by_symbol[symbol].append(order)
+        return order
+
+    def _fill(self, order, price):
+        base = self.markets[order['symbol']]['base']
+        amount = order['remaining']
+        if order['side'] == 'buy':
+            self.balance['USDT'] = self.balance.get('USDT', 0.0) - amount * price
+            self.balance[base] = self.balance.get(base, 0.0) + amount
+        else:
+            self.balance[base] = self.balance.get(base, 0.0) - amount
+            self.balance['USDT'] = self.balance.get('USDT', 0.0) + amount * price
+        order.update(status='closed', filled=order['amount'], remaining=0.0, average=price)
+
+    def _match_orders(self, symbol, price):
+        for order in list(self._orders_by_symbol.get(symbol, ())):
+            if order['status'] != 'open':
+                continue
+            triggered = False
+            if order['stopPrice'] is not None and order['type'] in ('market', 'stop_loss'):
+                triggered = price <= order['stopPrice'] if order['side'] == 'sell' else price >= order['stopPrice']
+            elif order['type'] == 'limit':
+                triggered = price >= order['price'] if order['side'] == 'sell' else price <= order['price']
+            if not triggered:
+                continue
+            self._fill(order, price if order['type'] != 'limit' else order['price'])
+            oco_id = order['info'].get('oco_id')
+            if oco_id:
+                # تنفيذ أحد طرفي OCO يلغي الطرف الآخر
+                for sibling in self._orders_by_symbol[symbol]:
+                    if sibling['info'].get('oco_id') == oco_id and sibling['status'] == 'open':
+                        sibling['status'] = 'canceled'
+                self._orders[oco_id]['status'] = 'closed'
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None, stopPrice=None):
+        await self._request('order', cost=1)
+        if symbol not in self.markets:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol}")
+        params = params or {}
+        amount = float(amount)
+        stop_price = stopPrice if stopPrice is not None else params.get('stopPrice')
+
+        if type == 'oco':
+            parent = self._new_order(symbol, 'oco', side, amount, price, stop_price)
+            self._new_order(symbol, 'limit', side, amount, price, oco_id=parent['id'])
+            self._new_order(symbol, 'stop_loss', side, amount, stop_price=float(params.get('stopLimitPrice', stop_price)),
+                            oco_id=parent['id'])
+            return copy.deepcopy(parent)
+
+        if side == 'sell' and self.balance.get(self.markets[symbol]['base'], 0.0) < amount - 1e-12:
+            raise ccxt.InsufficientFunds(f"{self.id} insufficient {self.markets[symbol]['base']} balance")
+        order = self._new_order(symbol, type, side, amount, price, stop_price)
+        if type == 'market' and stop_price is None:
+            self._fill(order, self.last_price(symbol))
+        else:
+            self._match_orders(symbol, self.last_price(symbol))
+        return copy.deepcopy(order)
+
+    async def cancel_order(self, id, symbol=None, params=None):
+        await self._request('order', cost=1)
+        order = self._orders.get(str(id))
+        if order is None or order['status'] != 'open':
+            raise ccxt.OrderNotFound(f"{self.id} order {id} not found or not open")
+        order['status'] = 'canceled'
+        if order['type'] == 'oco':
+            for sibling in self._orders_by_symbol[order['symbol']]:
+                if sibling['info'].get('oco_id') == order['id'] and sibling['status'] == 'open':
+                    sibling['status'] = 'canceled'
+        return copy.deepcopy(order)
+
+    async def fetch_order(self, id, symbol=None, params=None):
+        await self._request('order', cost=2)
+        order = self._orders.get(str(id))
+        if order is None:
+            raise ccxt.OrderNotFound(f"{self.id} order {id} not found")
+        self._match_orders(order['symbol'], self.last_price(order['symbol']))
+        return copy.deepcopy(order)
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        await self._request('openOrders', cost=6 if symbol else 80)
+        return [copy.deepcopy(o) for o in self._orders.values()
+                if o['status'] == 'open' and o['type'] != 'oco' and (symbol is None or o['symbol'] == symbol)]
+
+# =======================================================================================
+# --- Registration ---
+# =======================================================================================
+
+def install_fake_exchanges(exchange_ids=None, markets=2000, private=True, with_rate_limiter=True, **fake_kwargs):
+    """Replaces the ccxt clients in bot_state with FakeExchange instances (one shared per exchange id)."""
+    exchange_ids = exchange_ids or EXCHANGES_TO_SCAN
+    rate_limiters.clear()
+    fakes = {}
+    for ex_id in exchange_ids:
+        fake = FakeExchange(ex_id, markets=markets, **fake_kwargs)
+        if with_rate_limiter:
+            attach_rate_limiter(fake)
+        fakes[ex_id] = fake
+        bot_state.public_exchanges[ex_id] = fake
+        if private:
+            bot_state.exchanges[ex_id] = fake
+    candle_cache.invalidate()
+    logger.info(f"Installed fake exchanges: {', '.join(exchange_ids)} with {markets} markets each.")
+    return fakes
+
+# =======================================================================================
+# --- Scan Load Test ---
+# =======================================================================================
+
+async def run_scan_load_test(exchange_ids, markets, worker_counts, settings_overrides=None, **fake_kwargs):
+    """Runs aggregate_top_movers + run_scan_workers on fake exchanges for each worker count.
+
+    The throughput column shows where adding workers stops helping (rate limits, CPU or the event loop).
+    """
+    from core_logic import aggregate_top_movers, run_scan_workers   # استيراد متأخر: core_logic يحمل كل التبعيات
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    settings['top_n_symbols_by_volume'] = markets * len(exchange_ids)
+    settings.update(settings_overrides or {})
+    bot_state.settings = settings
+    rows = []
+    for workers in worker_counts:
+        fakes = install_fake_exchanges(exchange_ids, markets, **fake_kwargs)
+        bot_state.scan_proximity.clear()
+        settings['concurrent_workers'] = workers
+        started = time.perf_counter()
+        top_markets = await aggregate_top_movers()
+        aggregated = time.perf_counter()
+        signals, report, failures = await run_scan_workers(top_markets, settings)
+        finished = time.perf_counter()
+        scan_seconds = finished - aggregated
+        rows.append({
+            "workers": workers, "markets": len(top_markets), "completed": report['completed'],
+            "skipped": report['skipped'], "signals": len(signals), "failures": failures,
+            "aggregate_seconds": round(aggregated - started, 2), "scan_seconds": round(scan_seconds, 2),
+            "markets_per_second": round(report['completed'] / scan_seconds, 1) if scan_seconds else 0.0,
+            "requests": sum(f.stats['requests'] for f in fakes.values()),
+            "rate_limited": sum(f.stats['rate_limited'] for f in fakes.values()),
+            "limiter_wait_seconds": round(sum(l.stats['waited_seconds'] for l in rate_limiters.values()), 1),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test perform_scan's pipeline against in-process fake exchanges.")
+    parser.add_argument('--exchanges', type=int, default=len(EXCHANGES_TO_SCAN))
+    parser.add_argument('--markets', type=int, default=2000, help="Markets per exchange.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[10, 25, 50, 100])
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--jitter-ms', type=float, default=15.0)
+    parser.add_argument('--server-rps', type=float, default=None, help="Fake server-side request budget per second.")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--budget', type=float, default=None, help="scan_time_budget_seconds override.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    exchange_ids = (EXCHANGES_TO_SCAN * (args.exchanges // len(EXCHANGES_TO_SCAN) + 1))[:args.exchanges]
+    exchange_ids = [ex if exchange_ids[:i].count(ex) == 0 else f"{ex}{exchange_ids[:i].count(ex)}"
+                    for i, ex in enumerate(exchange_ids)]
+    overrides = {'scan_time_budget_seconds': args.budget} if args.budget is not None else {}
+    rows = asyncio.run(run_scan_load_test(exchange_ids, args.markets, args.workers, overrides,
+                                          latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                          requests_per_second=args.server_rps, error_rate=args.error_rate,
+                                          seed=args.seed))
+    columns = list(rows[0].keys()) if rows else []
+    print("  ".join(f"{c:>18}" for c in columns))
+    for row in rows:
+        print("  ".join(f"{row[c]:>18}" for c in columns))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- ♻️ ملف المؤشرات التراكمية (incremental_indicators.py) | بوت كاسحة الألغام v6.6 ♻️ ---
+# =======================================================================================
+# حالة مؤشرات لكل (منصة، عملة، إطار زمني) تُحدَّث بشمعة مغلقة واحدة في كل فحص بدلاً من
+# إعادة حساب كل التاريخ. المعادلات تتبع تعريفات pandas_ta الافتراضية (EMA مبدوء بـ SMA،
+# RMA بترجيح ewm المعدل، انحراف معياري ddof=0) حتى تتطابق القيم ضمن حد تسامح صغير.
+
+import logging
+import math
+import os
+import pickle
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from config import INDICATOR_CHECKPOINT_FILE, INDICATOR_STORE_MAX_SERIES
+from indicators import IndicatorSet
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+NAN = float('nan')
+# الماسحات تقرأ [-2] (آخر شمعة مغلقة) و [-3] فقط، لذا نحتفظ بآخر 3 قيم مغلقة
+TAIL_LENGTH = 3
+INCREMENTAL_INDICATORS = {"sma", "ema", "rsi", "atr", "macd", "bbands", "kc", "obv"}
+SOURCE_INDEX = {'open': 1, 'high': 2, 'low': 3, 'close': 4, 'volume': 5}
+
+# =======================================================================================
+# --- O(1) Building Blocks ---
+# =======================================================================================
+
+class _Ema:
+    """pandas_ta ema(presma=True): NaN-skipping mean of the first `length` points as seed, then adjust=False."""
+    __slots__ = ("length", "alpha", "position", "seed_sum", "seed_count", "value")
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.position = 0
+        self.seed_sum = 0.0
+        self.seed_count = 0
+        self.value = NAN
+
+    def update(self, x):
+        position = self.position
+        self.position += 1
+        if position < self.length:
+            if x == x:
+                self.seed_sum += x
+                self.seed_count += 1
+            if position == self.length - 1 and self.seed_count:
+                self.value = self.seed_sum / self.seed_count
+            return self.value
+        if x == x:
+            self.value = x if self.value != self.value else self.value + self.alpha * (x - self.value)
+        return self.value
+
+class _Rma:
+    """pandas_ta rma: ewm(alpha=1/length, adjust=True, min_periods=length), kept as running weighted sums."""
+    __slots__ = ("decay", "length", "weighted_sum", "weight", "count")
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+        self.count = 0
+
+    def update(self, x):
+        if x == x:
+            self.weighted_sum = x + self.decay * self.weighted_sum
+            self.weight = 1.0 + self.decay * self.weight
+            self.count += 1
+        return self.weighted_sum / self.weight if self.count >= self.length else NAN
+
+class _Rolling:
+    """Rolling mean and population std over a fixed window, re-summed once per window to bound drift."""
+    __slots__ = ("length", "window", "total", "total_sq", "since_resum")
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.since_resum = 0
+
+    def update(self, x):
+        if len(self.window) == self.length:
+            old = self.window[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.window.append(x)
+        self.total += x
+        self.total_sq += x * x
+        self.since_resum += 1
+        if self.since_resum >= self.length:
+            self.total = math.fsum(self.window)
+            self.total_sq = math.fsum(v * v for v in self.window)
+            self.since_resum = 0
+
+    def mean(self):
+        return self.total / self.length if len(self.window) == self.length else NAN
+
+    def std(self):
+        if len(self.window) < self.length:
+            return NAN
+        mean = self.total / self.length
+        return math.sqrt(max(self.total_sq / self.length - mean * mean, 0.0))
+
+class _TrueRange:
+    __slots__ = ("prev_close",)
+
+    def __init__(self):
+        self.prev_close = NAN
+
+    def update(self, high, low, close):
+        prev, self.prev_close = self.prev_close, close
+        if prev != prev:
+            return NAN
+        return max(high - low, abs(high - prev), abs(prev - low))
+
+# =======================================================================================
+# --- Incremental Indicators (same outputs as indicators.INDICATOR_CALCULATORS) ---
+# =======================================================================================
+
+class _SmaIndicator:
+    def __init__(self, source='close', length=20):
+        self.source, self.rolling = SOURCE_INDEX[source], _Rolling(length)
+
+    def update(self, candle):
+        self.rolling.update(candle[self.source])
+        return {"value": self.rolling.mean()}
+
+class _EmaIndicator:
+    def __init__(self, source='close', length=200):
+        self.source, self.ema = SOURCE_INDEX[source], _Ema(length)
+
+    def update(self, candle):
+        return {"value": self.ema.update(candle[self.source])}
+
+class _RsiIndicator:
+    def __init__(self, length=14):
+        self.gains, self.losses, self.prev_close = _Rma(length), _Rma(length), NAN
+
+    def update(self, candle):
+        close = candle[4]
+        change = close - self.prev_close if self.prev_close == self.prev_close else NAN
+        self.prev_close = close
+        gain = self.gains.update(max(change, 0.0) if change == change else NAN)
+        loss = self.losses.update(-min(change, 0.0) if change == change else NAN)
+        total = gain + loss
+        return {"value": 100.0 * gain / total if total else NAN}
+
+class _AtrIndicator:
+    def __init__(self, length=14):
+        self.true_range, self.rma = _TrueRange(), _Rma(length)
+
+    def update(self, candle):
+        return {"value": self.rma.update(self.true_range.update(candle[2], candle[3], candle[4]))}
+
+class _MacdIndicator:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = _Ema(fast), _Ema(slow), _Ema(signal)
+
+    def update(self, candle):
+        close = candle[4]
+        macd = self.fast.update(close) - self.slow.update(close)
+        # خط الإشارة يبدأ من أول قيمة MACD صالحة كما في pandas_ta
+        signal = self.signal.update(macd) if macd == macd else NAN
+        return {"macd": macd, "hist": macd - signal, "signal": signal}
+
+class _BbandsIndicator:
+    def __init__(self, length=20, std=2.0):
+        self.rolling, self.std = _Rolling(length), std
+
+    def update(self, candle):
+        self.rolling.update(candle[4])
+        mid, deviation = self.rolling.mean(), self.rolling.std()
+        return {"lower": mid - self.std * deviation, "mid": mid, "upper": mid + self.std * deviation}
+
+class _KcIndicator:
+    def __init__(self, length=20, scalar=1.5):
+        self.basis, self.band, self.true_range, self.scalar = _Ema(length), _Ema(length), _TrueRange(), scalar
+
+    def update(self, candle):
+        basis = self.basis.update(candle[4])
+        band = self.band.update(self.true_range.update(candle[2], candle[3], candle[4]))
+        return {"lower": basis - self.scalar * band, "basis": basis, "upper": basis + self.scalar * band}
+
+class _ObvIndicator:
+    def __init__(self):
+        self.total, self.prev_close = 0.0, NAN
+
+    def update(self, candle):
+        close, volume = candle[4], candle[5]
+        if self.prev_close != self.prev_close or close > self.prev_close:
+            self.total += volume
+        elif close < self.prev_close:
+            self.total -= volume
+        self.prev_close = close
+        return {"value": self.total}
+
+INCREMENTAL_CLASSES = {
+    "sma": _SmaIndicator, "ema": _EmaIndicator, "rsi": _RsiIndicator, "atr": _AtrIndicator,
+    "macd": _MacdIndicator, "bbands": _BbandsIndicator, "kc": _KcIndicator, "obv": _ObvIndicator,
+}
+
+# =======================================================================================
+# --- Per-Series State & Store ---
+# =======================================================================================
+
+class IncrementalSeries:
+    """Indicator state for one (exchange, symbol, timeframe), fed one closed candle at a time."""
+    def __init__(self, specs):
+        self.specs = frozenset(specs)
+        self.indicators = {s: INCREMENTAL_CLASSES[s[0]](**dict(s[1])) for s in self.specs}
+        self.tails = {s: {} for s in self.specs}
+        self.last_ts = None
+
+    def update(self, candle):
+        for key, indicator in self.indicators.items():
+            for component, value in indicator.update(candle).items():
+                tail = self.tails[key].get(component)
+                if tail is None:
+                    tail = self.tails[key][component] = deque(maxlen=TAIL_LENGTH)
+                tail.append(value)
+        self.last_ts = candle[0]
+
+    def tail_arrays(self, length):
+        """Full-length arrays (NaN except the last closed values) aligned so index -1 is the forming candle."""
+        out = {}
+        for key, components in self.tails.items():
+            out[key] = {}
+            for component, tail in components.items():
+                values = np.full(length, np.nan)
+                count = min(len(tail), length - 1)
+                if count:
+                    values[length - 1 - count:length - 1] = list(tail)[-count:]
+                out[key][component] = values
+        return out
+
+class IndicatorStore:
+    """All incremental series, with checkpointing so restarts don't need a long warm-up.
+
+    At most `max_series` series are kept; symbols that left the scanned universe are evicted least recently used first.
+    """
+    def __init__(self, max_series=INDICATOR_STORE_MAX_SERIES):
+        self.max_series = max_series
+        self.series = OrderedDict()
+        self.stats = {"warmups": 0, "candles_applied": 0, "reused": 0, "evicted": 0}
+
+    def _evict(self):
+        while len(self.series) > self.max_series:
+            self.series.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    @staticmethod
+    def supported(specs):
+        return {s for s in specs if s[0] in INCREMENTAL_INDICATORS}
+
+    def sync(self, key, ohlcv, specs):
+        """Feeds new closed candles of `ohlcv` (last row = forming candle) and returns precomputed tails.
+
+        Re-warms from the whole window when the series is new, the spec set changed, or the cached
+        state no longer connects to the candles (gap after downtime or a stale checkpoint).
+        """
+        specs = self.supported(specs)
+        candles = np.asarray(ohlcv, dtype=np.float64)
+        if not specs or len(candles) < 2:
+            return {}
+        closed = candles[:-1]
+        series = self.series.get(key)
+        start = None
+        if series is not None and series.specs >= specs and series.last_ts is not None:
+            matches = np.flatnonzero(closed[:, 0] == series.last_ts)
+            if matches.size:
+                start = matches[0] + 1
+        if start is None:
+            series = self.series[key] = IncrementalSeries(specs | (series.specs if series else frozenset()))
+            start = 0
+            self.stats["warmups"] += 1
+        self.series.move_to_end(key)
+        self._evict()
+        for candle in closed[start:]:
+            series.update(candle)
+        self.stats["candles_applied"] += int(len(closed) - start)
+        if start == len(closed):
+            self.stats["reused"] += 1
+        tails = series.tail_arrays(len(candles))
+        return {s: tails[s] for s in specs}
+
+    def save_checkpoint(self, path):
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                pickle.dump(self.series, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.error(f"Could not save indicator checkpoint to {path}: {e}")
+
+    def load_checkpoint(self, path):
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'rb') as f:
+                self.series = OrderedDict(pickle.load(f))
+            self._evict()
+            logger.info(f"Loaded incremental indicator state for {len(self.series)} series from {path}.")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable indicator checkpoint {path}: {e}")
+            self.series = OrderedDict()
+        return len(self.series)
+
+def checkpoint_path(exchange_ids=None):
+    """The main process's checkpoint file, or one per scan shard (keyed by its exchanges) so shards don't overwrite each other."""
+    if not exchange_ids:
+        return INDICATOR_CHECKPOINT_FILE
+    root, ext = os.path.splitext(INDICATOR_CHECKPOINT_FILE)
+    return f"{root}.{'-'.join(sorted(exchange_ids))}{ext}"
+
+# =======================================================================================
+# --- Tolerance Check Against pandas_ta ---
+# =======================================================================================
+
+def verify_against_pandas_ta(ohlcv, specs, rtol=1e-6, atol=1e-9):
+    """Feeds all closed candles incrementally and compares the tails with a full pandas_ta computation.
+
+    Returns {spec: {component: max_abs_diff}} for every component outside tolerance (empty = match).
+    """
+    candles = np.asarray(ohlcv, dtype=np.float64)
+    store = IndicatorStore()
+    precomputed = store.sync(("verify", "", ""), candles, specs)
+    df = pd.DataFrame(candles[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'],
+                      index=pd.to_datetime(candles[:, 0], unit='ms'))
+    reference = IndicatorSet(df)
+    mismatches = {}
+    window = slice(len(candles) - 1 - TAIL_LENGTH, len(candles) - 1)
+    for key, components in precomputed.items():
+        expected = reference.get(key[0], **dict(key[1]))
+        if expected is None:
+            continue
+        for component, values in components.items():
+            ours, theirs = values[window], expected[component][window]
+            if not np.allclose(ours, theirs, rtol=rtol, atol=atol, equal_nan=True):
+                mismatches.setdefault(key, {})[component] = float(np.nanmax(np.abs(ours - theirs)))
+    return mismatches
+
+# نسخة واحدة مشتركة
+indicator_store = IndicatorStore()
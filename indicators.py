@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🧮 ملف المؤشرات (indicators.py) | بوت كاسحة الألغام v6.6 🧮 ---
+# =======================================================================================
+
+import logging
+import numpy as np
+
+from lazy_import import LazyModule
+
+ta = LazyModule("pandas_ta")   # يُستورد عند أول حساب وليس عند التشغيل
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Indicator Specs ---
+# =======================================================================================
+
+def spec(name, **params):
+    """Builds a hashable indicator spec, e.g. spec('bbands', length=20, std=2.0)."""
+    return (name, tuple(sorted(params.items())))
+
+def _as_array(series):
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _by_prefix(frame, mapping):
+    """Maps pandas_ta output columns to short component names, once per computation."""
+    out = {}
+    for key, prefix in mapping.items():
+        col = next((c for c in frame.columns if c.startswith(prefix)), None)
+        if col is None:
+            return None
+        out[key] = _as_array(frame[col])
+    return out
+
+# =======================================================================================
+# --- Indicator Calculators ---
+# =======================================================================================
+
+def _calc_sma(df, source='close', length=20):
+    return {"value": _as_array(df[source].rolling(length).mean())}
+
+def _calc_ema(df, source='close', length=200):
+    result = ta.ema(df[source], length=length)
+    return None if result is None else {"value": _as_array(result)}
+
+def _calc_rsi(df, length=14):
+    result = ta.rsi(df['close'], length=length)
+    return None if result is None else {"value": _as_array(result)}
+
+def _calc_atr(df, length=14):
+    result = ta.atr(df['high'], df['low'], df['close'], length=length)
+    return None if result is None else {"value": _as_array(result)}
+
+def _calc_adx(df, length=14):
+    result = ta.adx(df['high'], df['low'], df['close'], length=length)
+    return None if result is None else _by_prefix(result, {"adx": "ADX_", "dmp": "DMP_", "dmn": "DMN_"})
+
+def _calc_vwap(df):
+    result = ta.vwap(df['high'], df['low'], df['close'], df['volume'])
+    return None if result is None else {"value": _as_array(result)}
+
+def _calc_obv(df):
+    result = ta.obv(df['close'], df['volume'])
+    return None if result is None else {"value": _as_array(result)}
+
+def _calc_bbands(df, length=20, std=2.0):
+    result = ta.bbands(df['close'], length=length, std=std)
+    return None if result is None else _by_prefix(result, {"lower": "BBL_", "mid": "BBM_", "upper": "BBU_"})
+
+def _calc_macd(df, fast=12, slow=26, signal=9):
+    result = ta.macd(df['close'], fast=fast, slow=slow, signal=signal)
+    return None if result is None else _by_prefix(result, {"macd": "MACD_", "hist": "MACDh_", "signal": "MACDs_"})
+
+def _calc_kc(df, length=20, scalar=1.5):
+    result = ta.kc(df['high'], df['low'], df['close'], length=length, scalar=scalar)
+    return None if result is None else _by_prefix(result, {"lower": "KCL", "basis": "KCB", "upper": "KCU"})
+
+INDICATOR_CALCULATORS = {
+    "sma": _calc_sma, "ema": _calc_ema, "rsi": _calc_rsi, "atr": _calc_atr, "adx": _calc_adx,
+    "vwap": _calc_vwap, "obv": _calc_obv, "bbands": _calc_bbands, "macd": _calc_macd, "kc": _calc_kc,
+}
+
+# =======================================================================================
+# --- Per-Symbol Indicator Engine ---
+# =======================================================================================
+
+class IndicatorSet:
+    """Computes each unique (indicator, params) once per symbol per scan and returns float64 arrays.
+
+    `precomputed` ({spec: components}) seeds the cache, e.g. with tails from incremental_indicators.
+    """
+    def __init__(self, df, precomputed=None):
+        self.df = df
+        self._cache = dict(precomputed or {})
+        self.stats = {"computed": 0, "reused": 0}
+
+    def require(self, specs):
+        """Pre-computes every spec in `specs`; duplicates across scanners are computed once."""
+        for name, params in set(specs):
+            self.get(name, **dict(params))
+        return self
+
+    def get(self, name, **params):
+        """Returns a dict of component arrays for the indicator, or None if it cannot be computed."""
+        key = spec(name, **params)
+        if key in self._cache:
+            self.stats["reused"] += 1
+            return self._cache[key]
+        try:
+            result = INDICATOR_CALCULATORS[name](self.df, **params)
+        except Exception as e:
+            logger.debug(f"Indicator {name}{params} failed: {e}")
+            result = None
+        self._cache[key] = result
+        self.stats["computed"] += 1
+        return result
+
+    def value(self, name, **params):
+        """Shortcut for single-output indicators (rsi, ema, atr...)."""
+        result = self.get(name, **params)
+        return None if result is None else result["value"]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 💤 ملف الاستيراد المؤجل (lazy_import.py) | بوت كاسحة الألغام v6.6 💤 ---
+# =======================================================================================
+# مكتبات التحليل الثقيلة (pandas_ta, scipy, nltk, feedparser) تُستورد عند أول استخدام فعلي
+# بدلاً من لحظة تشغيل البوت، حتى تبدأ متابعة الصفقات المفتوحة بعد إعادة التشغيل خلال ثوانٍ.
+
+import importlib
+import importlib.util
+import threading
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+def module_available(name):
+    """Whether `name` can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
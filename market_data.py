@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🕯️ ملف بيانات السوق (market_data.py) | بوت كاسحة الألغام v6.6 🕯️ ---
+# =======================================================================================
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from config import CANDLE_CACHE_MAX_CANDLES, CANDLE_CACHE_MIN_REFRESH_SECONDS
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Shared OHLCV Candle Cache ---
+# =======================================================================================
+
+class _CandleSeries:
+    """حلقة محدودة من الشموع لزوج (منصة، عملة، فريم) واحد."""
+    def __init__(self, max_candles):
+        self.candles = deque(maxlen=max_candles)
+        self.depth = 0
+        self.last_refresh = 0.0
+        self.lock = asyncio.Lock()
+
+class CandleCache:
+    """Keeps recent candles per (exchange, symbol, timeframe) and refreshes them with `since` deltas."""
+    def __init__(self, max_candles=CANDLE_CACHE_MAX_CANDLES, min_refresh_seconds=CANDLE_CACHE_MIN_REFRESH_SECONDS):
+        self.max_candles = max_candles
+        self.min_refresh_seconds = min_refresh_seconds
+        self._series = {}
+        self.stats = {"full_fetches": 0, "delta_fetches": 0, "cache_hits": 0}
+
+    def _get_series(self, key):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _CandleSeries(self.max_candles)
+        return series
+
+    async def get_ohlcv(self, exchange, symbol, timeframe, limit=100):
+        """Returns the last `limit` candles in ccxt format, fetching only what changed since the last call."""
+        limit = min(limit, self.max_candles)
+        series = self._get_series((exchange.id, symbol, timeframe))
+        async with series.lock:
+            now = time.time()
+            if series.depth >= limit and now - series.last_refresh < self.min_refresh_seconds:
+                self.stats["cache_hits"] += 1
+            elif series.depth < limit or not series.candles:
+                await self._full_fetch(series, exchange, symbol, timeframe, limit)
+            else:
+                await self._delta_fetch(series, exchange, symbol, timeframe, limit)
+            return list(series.candles)[-limit:]
+
+    async def _full_fetch(self, series, exchange, symbol, timeframe, limit):
+        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        series.candles.clear()
+        series.candles.extend(ohlcv)
+        series.depth = limit
+        series.last_refresh = time.time()
+        self.stats["full_fetches"] += 1
+
+    async def _delta_fetch(self, series, exchange, symbol, timeframe, limit):
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+        last_ts = series.candles[-1][0]
+        missing = int((exchange.milliseconds() - last_ts) // timeframe_ms) + 1
+        if missing >= limit:
+            # الفجوة أكبر من المطلوب، لا فائدة من الدمج
+            await self._full_fetch(series, exchange, symbol, timeframe, limit)
+            return
+
+        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, since=last_ts, limit=missing + 1)
+        if ohlcv and ohlcv[0][0] > last_ts + timeframe_ms:
+            logger.debug(f"Candle gap detected for {symbol} {timeframe} on {exchange.id}. Refetching full history.")
+            await self._full_fetch(series, exchange, symbol, timeframe, limit)
+            return
+
+        self._merge(series, ohlcv)
+        series.last_refresh = time.time()
+        self.stats["delta_fetches"] += 1
+
+    @staticmethod
+    def _merge(series, ohlcv):
+        """Replaces the still-forming last candle and appends anything newer."""
+        candles = series.candles
+        for candle in ohlcv:
+            if candles and candle[0] == candles[-1][0]:
+                candles[-1] = candle
+            elif not candles or candle[0] > candles[-1][0]:
+                candles.append(candle)
+
+    def ingest(self, exchange_id, symbol, timeframe, candles, timeframe_ms):
+        """Merges pushed candles (e.g. from a stream) into an existing series if they are contiguous."""
+        series = self._series.get((exchange_id, symbol, timeframe))
+        if series is None or not series.candles or not candles:
+            return False
+        if candles[0][0] > series.candles[-1][0] + timeframe_ms:
+            return False
+        self._merge(series, candles)
+        series.last_refresh = time.time()
+        return True
+
+    def invalidate(self, exchange_id=None):
+        """Drops cached series, optionally only for one exchange."""
+        if exchange_id is None:
+            self._series.clear()
+        else:
+            self._series = {k: v for k, v in self._series.items() if k[0] != exchange_id}
+
+# نسخة واحدة مشتركة بين core_logic و strategies
+candle_cache = CandleCache()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 💾 ملف ذاكرة الأسواق على القرص (markets_cache.py) | بوت كاسحة الألغام v6.6 💾 ---
+# =======================================================================================
+# قائمة الأسواق (load_markets) تُحفظ على القرص لكل منصة وتُستخدم ما دامت أحدث من المهلة، فإعادة
+# التشغيل لا تعيد تنزيلها. العميل الخاص يأخذ الأسواق من العميل العام للمنصة نفسها بدلاً من تنزيل
+# ثانٍ، وعند فشل التنزيل تُستخدم النسخة المحفوظة حتى لو كانت قديمة.
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from config import MARKETS_CACHE_DIR, MARKETS_CACHE_TTL_SECONDS
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+def _cache_path(exchange_id, cache_dir=MARKETS_CACHE_DIR):
+    return os.path.join(cache_dir, f"{exchange_id}.json")
+
+def read_markets_cache(exchange_id, cache_dir=MARKETS_CACHE_DIR):
+    """(saved_at, markets, currencies) from disk, or None if there is no readable cache."""
+    path = _cache_path(exchange_id, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data["saved_at"], data["markets"], data.get("currencies")
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable markets cache {path}: {e}")
+        return None
+
+def write_markets_cache(exchange_id, markets, currencies, cache_dir=MARKETS_CACHE_DIR):
+    path = _cache_path(exchange_id, cache_dir)
+    # اسم مؤقت لكل عملية: عمليات الفحص المقسمة قد تكتب الملف نفسه في الوقت نفسه
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"saved_at": time.time(), "markets": markets, "currencies": currencies}, f)
+        os.replace(temp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.error(f"Could not save markets cache to {path}: {e}")
+
+async def save_markets_cache(client, cache_dir=MARKETS_CACHE_DIR):
+    if client.markets:
+        await asyncio.to_thread(write_markets_cache, client.id, client.markets, client.currencies, cache_dir)
+
+async def load_markets_cached(client, ttl=MARKETS_CACHE_TTL_SECONDS, cache_dir=MARKETS_CACHE_DIR):
+    """Fills `client` with markets from the disk cache if it is younger than `ttl`, otherwise downloads them.
+
+    If the download fails, an expired cache is used rather than leaving the client without markets.
+    """
+    cached = await asyncio.to_thread(read_markets_cache, client.id, cache_dir)
+    if cached is not None and time.time() - cached[0] < ttl:
+        client.set_markets(cached[1], cached[2])
+        logger.info(f"Loaded {len(cached[1])} {client.id} markets from disk cache ({(time.time() - cached[0]) / 60:.0f} min old).")
+        return client.markets
+    try:
+        await client.load_markets()
+    except Exception as e:
+        if cached is None:
+            raise
+        logger.warning(f"Could not download {client.id} markets, using the expired disk cache instead: {e}")
+        client.set_markets(cached[1], cached[2])
+        return client.markets
+    await save_markets_cache(client, cache_dir)
+    return client.markets
+
+def share_markets(source, target):
+    """Gives `target` the markets and currencies `source` already loaded (e.g. public -> private client)."""
+    target.set_markets(source.markets, source.currencies)
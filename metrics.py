@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 📊 ملف القياسات (metrics.py) | بوت كاسحة الألغام v6.6 📊 ---
+# =======================================================================================
+
+import logging
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from config import METRICS_HOST, METRICS_PORT
+
+# استيراد مشروط لخادم HTTP (مستخدم فقط لنقطة القياسات المحلية)
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# حدود الـ histogram بالثواني: من طلبات المنصات السريعة حتى فحص كامل
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# =======================================================================================
+# --- Histograms & Registry ---
+# =======================================================================================
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus a window of recent samples for exact percentiles."""
+    __slots__ = ("buckets", "counts", "count", "sum", "recent")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(math.ceil(q / 100 * len(ordered))) - 1)]
+
+class MetricsRegistry:
+    """Process-wide timing spans, histograms and counters, labelled by stage/exchange."""
+    def __init__(self):
+        self.histograms = defaultdict(dict)   # name -> {labels tuple: Histogram}
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.started_at = time.time()
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._labels(labels)
+        histogram = self.histograms[name].get(key)
+        if histogram is None:
+            histogram = self.histograms[name][key] = Histogram()
+        histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        self.counters[name][self._labels(labels)] += value
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Times the enclosed block into `stage_duration_seconds{stage=...}`; errors are counted separately.
+
+        Cancellation (e.g. stragglers cancelled by the scan budget) is not an error.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("stage_errors_total", stage=stage, **labels)
+            raise
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+    def timed(self, stage):
+        """Decorator form of span() for coroutines."""
+        def decorator(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stage_summary(self, name="stage_duration_seconds"):
+        """{labels: {"count", "total", "p50", "p95", "max"}} for one histogram family."""
+        summary = {}
+        for key, histogram in self.histograms.get(name, {}).items():
+            summary[key] = {"count": histogram.count, "total": histogram.sum,
+                            "p50": histogram.percentile(50), "p95": histogram.percentile(95),
+                            "max": max(histogram.recent) if histogram.recent else 0.0}
+        return summary
+
+    # --- الإخراج ---
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = ["# TYPE minesweeper_uptime_seconds gauge", f"minesweeper_uptime_seconds {time.time() - self.started_at:.0f}"]
+        for name, series in sorted(self.histograms.items()):
+            metric = f"minesweeper_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(key + (('le', repr(float(bound))),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        for name, series in sorted(self.counters.items()):
+            metric = f"minesweeper_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{metric}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def diagnostics_text(self, top=12):
+        """Short plain-text breakdown for the Telegram /diagnostics command."""
+        lines = ["🩺 Diagnostics (p50 / p95 / total, seconds)"]
+        stages = sorted(self.stage_summary().items(), key=lambda item: item[1]["total"], reverse=True)
+        for key, s in stages[:top]:
+            lines.append(f"• {_short_labels(key)}: {s['p50']:.3f} / {s['p95']:.3f} / {s['total']:.1f} (n={s['count']})")
+        exchange_stats = sorted(self.stage_summary("exchange_request_seconds").items())
+        waits = self.stage_summary("rate_limit_wait_seconds")
+        if exchange_stats:
+            lines.append("")
+            lines.append("🌐 Exchange requests (p50 / p95, rate-limit wait total)")
+            for key, s in exchange_stats:
+                wait = waits.get(key, {}).get("total", 0.0)
+                lines.append(f"• {_short_labels(key)}: {s['p50'] * 1000:.0f}ms / {s['p95'] * 1000:.0f}ms, "
+                             f"waited {wait:.1f}s (n={s['count']})")
+        errors = self.counters.get("stage_errors_total", {})
+        if errors:
+            lines.append("")
+            lines.append("⚠️ Errors: " + ", ".join(f"{_short_labels(k)}={v:g}" for k, v in sorted(errors.items())))
+        return "\n".join(lines)
+
+def _format_labels(key):
+    if not key:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+def _short_labels(key):
+    # اسم المرحلة أولاً ثم باقي التسميات (مثل المنصة)
+    return " ".join(v for _, v in sorted(key, key=lambda item: item[0] != 'stage'))
+
+# نسخة واحدة مشتركة
+metrics = MetricsRegistry()
+
+# =======================================================================================
+# --- Local Prometheus Endpoint ---
+# =======================================================================================
+
+_metrics_runner = None
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serves GET /metrics on localhost (disabled when the port is 0 or aiohttp is missing)."""
+    global _metrics_runner
+    if not port or _metrics_runner is not None:
+        return
+    if not AIOHTTP_AVAILABLE:
+        logger.warning("aiohttp is not installed. Metrics endpoint disabled.")
+        return
+
+    async def handle_metrics(request):
+        return web.Response(text=metrics.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _metrics_runner = runner
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+
+async def stop_metrics_server():
+    global _metrics_runner
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
+        _metrics_runner = None
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 📰 ملف الأخبار وتحليل المشاعر (news_feed.py) | بوت كاسحة الألغام v6.6 📰 ---
+# =======================================================================================
+# جلب خلاصات RSS بالتوازي بطلبات مشروطة (ETag / Last-Modified) بدلاً من feedparser.parse المتزامن،
+# ومحلل VADER واحد طويل العمر مع ذاكرة (عنوان -> درجة) حتى يُحلل كل عنوان جديد مرة واحدة فقط.
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+import httpx
+
+from config import NEWS_FEED_URLS, NEWS_ENTRIES_PER_FEED, NEWS_FETCH_TIMEOUT_SECONDS, NEWS_SENTIMENT_CACHE_SIZE
+from lazy_import import LazyModule, module_available
+
+# feedparser و nltk يُستوردان عند أول جلب / تحليل وليس عند التشغيل
+feedparser = LazyModule("feedparser")
+NLTK_AVAILABLE = module_available("nltk")
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Conditional RSS Fetcher ---
+# =======================================================================================
+
+class _FeedState:
+    __slots__ = ("etag", "last_modified", "headlines")
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.headlines = []
+
+class NewsFeedFetcher:
+    """Fetches all feeds concurrently; unchanged feeds (HTTP 304) reuse the headlines parsed last time."""
+    def __init__(self, urls=NEWS_FEED_URLS, entries_per_feed=NEWS_ENTRIES_PER_FEED, timeout=NEWS_FETCH_TIMEOUT_SECONDS):
+        self.urls = list(urls)
+        self.entries_per_feed = entries_per_feed
+        self.timeout = timeout
+        self._feeds = {url: _FeedState() for url in self.urls}
+        self.stats = {"fetched": 0, "not_modified": 0, "errors": 0}
+
+    async def _fetch_feed(self, client, url):
+        state = self._feeds[url]
+        headers = {}
+        if state.etag:
+            headers['If-None-Match'] = state.etag
+        if state.last_modified:
+            headers['If-Modified-Since'] = state.last_modified
+        try:
+            response = await client.get(url, headers=headers)
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                return state.headlines
+            response.raise_for_status()
+            feed = feedparser.parse(response.content)
+        except Exception as e:
+            # نبقي آخر عناوين ناجحة لهذه الخلاصة
+            self.stats["errors"] += 1
+            logger.error(f"Failed to fetch news from {url}: {e}")
+            return state.headlines
+        state.etag = response.headers.get('ETag')
+        state.last_modified = response.headers.get('Last-Modified')
+        state.headlines = [entry.title for entry in feed.entries[:self.entries_per_feed] if entry.get('title')]
+        self.stats["fetched"] += 1
+        return state.headlines
+
+    async def fetch_headlines(self, limit=15):
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
+            results = await asyncio.gather(*[self._fetch_feed(client, url) for url in self.urls])
+        # إزالة التكرار مع الحفاظ على الترتيب
+        return list(dict.fromkeys(h for headlines in results for h in headlines))[:limit]
+
+# =======================================================================================
+# --- Memoized Sentiment Scoring ---
+# =======================================================================================
+
+class SentimentScorer:
+    """One VADER analyzer for the process and an LRU memo of headline -> compound score."""
+    def __init__(self, max_size=NEWS_SENTIMENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._analyzer = None
+        self._scores = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _get_analyzer(self):
+        if self._analyzer is None:
+            from nltk.sentiment.vader import SentimentIntensityAnalyzer
+            self._analyzer = SentimentIntensityAnalyzer()   # تحميل القاموس مرة واحدة
+        return self._analyzer
+
+    def score(self, headline):
+        cached = self._scores.get(headline)
+        if cached is not None:
+            self._scores.move_to_end(headline)
+            self.stats["hits"] += 1
+            return cached
+        self.stats["misses"] += 1
+        value = self._get_analyzer().polarity_scores(headline)['compound']
+        self._scores[headline] = value
+        if len(self._scores) > self.max_size:
+            self._scores.popitem(last=False)
+        return value
+
+    def average(self, headlines):
+        if not headlines or not NLTK_AVAILABLE:
+            return 0.0
+        return sum(self.score(headline) for headline in headlines) / len(headlines)
+
+def ensure_vader_lexicon():
+    """Downloads the VADER lexicon if it is missing. Blocking; run it off the event loop."""
+    if not NLTK_AVAILABLE:
+        return
+    import nltk
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        logger.info("Downloading NLTK data for sentiment analysis...")
+        nltk.download('vader_lexicon')
+
+# نسخ واحدة مشتركة
+news_fetcher = NewsFeedFetcher()
+sentiment_scorer = SentimentScorer()
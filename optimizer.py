@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🎛️ ملف محسّن المعاملات (optimizer.py) | بوت كاسحة الألغام v6.6 🎛️ ---
+# =======================================================================================
+# بحث شبكي أو عشوائي على معاملات الماسحات والفلاتر والمخاطر فوق بيانات تاريخية،
+# يكتب أفضل المرشحين كأنماط جاهزة بنفس شكل config.PRESETS، وتُطبق من تيليجرام بالأمر /preset OPT_1.
+#
+# الاستخدام:
+#   python optimizer.py --data-dir ./ohlcv --mode random --samples 200 --top 5
+
+import argparse
+import copy
+import itertools
+import json
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_SETTINGS, OPTIMIZED_PRESETS_FILE
+from backtester import load_ohlcv_dir, backtest_symbol, _max_drawdown
+from indicators import IndicatorSet
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Search Space ---
+# =======================================================================================
+# المفاتيح مسارات منقوطة داخل الإعدادات. القائمة = قيم منفصلة، والـ tuple = مدى (أدنى، أقصى) للبحث العشوائي.
+DEFAULT_SEARCH_SPACE = {
+    "liquidity_filters.min_rvol": [1.1, 1.5, 2.2],
+    "volatility_filters.min_atr_percent": [0.3, 0.8, 1.4],
+    "ema_trend_filter.enabled": [True, False],
+    "momentum_breakout.rsi_max_level": [62, 68, 75],
+    "breakout_squeeze_pro.keltner_atr_multiplier": [1.25, 1.5, 2.0],
+    "atr_sl_multiplier": (1.5, 3.5),
+    "risk_reward_ratio": (1.2, 3.0),
+    "trailing_sl_activation_percent": (0.8, 3.0),
+    "trailing_sl_callback_percent": (0.5, 2.0),
+}
+
+OBJECTIVES = ("total_pnl_percent", "profit_factor", "pnl_to_drawdown")
+
+def _set_path(settings, path, value):
+    keys = path.split('.')
+    target = settings
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    target[keys[-1]] = value
+
+def apply_overrides(settings, overrides):
+    """Returns a deep copy of `settings` with the dotted-path overrides applied."""
+    candidate = copy.deepcopy(settings)
+    for path, value in overrides.items():
+        _set_path(candidate, path, value)
+    return candidate
+
+def grid_candidates(space):
+    """Every combination of the discrete values (ranges contribute their two ends and midpoint)."""
+    axes = []
+    for path, values in space.items():
+        if isinstance(values, tuple):
+            low, high = values
+            values = [low, round((low + high) / 2, 4), high]
+        axes.append([(path, v) for v in values])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+def random_candidates(space, samples, seed=None):
+    rng = random.Random(seed)
+    candidates = []
+    for _ in range(samples):
+        candidate = {}
+        for path, values in space.items():
+            candidate[path] = round(rng.uniform(*values), 4) if isinstance(values, tuple) else rng.choice(values)
+        candidates.append(candidate)
+    return candidates
+
+# =======================================================================================
+# --- Evaluation ---
+# =======================================================================================
+
+def _sweep_symbol(args):
+    """Backtests every candidate on one symbol, reusing one IndicatorSet across all of them.
+
+    Neighbouring parameter sets mostly ask for the same indicator specs (same periods, different
+    thresholds), so each spec is computed once per symbol instead of once per candidate.
+    """
+    symbol, candles, base_settings, candidates, strategies, fee_percent = args
+    candles = np.asarray(candles, dtype=np.float64)
+    indicators = IndicatorSet(pd.DataFrame(
+        {'open': candles[:, 1], 'high': candles[:, 2], 'low': candles[:, 3], 'close': candles[:, 4], 'volume': candles[:, 5]},
+        index=pd.to_datetime(candles[:, 0], unit='ms')))
+    results = []
+    for overrides in candidates:
+        settings = apply_overrides(base_settings, overrides)
+        try:
+            trades = backtest_symbol(symbol, candles, settings, strategies, fee_percent, indicators=indicators)
+        except Exception as e:
+            logger.warning(f"Optimizer: backtest failed for {symbol} with {overrides}: {e}")
+            trades = []
+        results.append((np.array([t['exit_time'] for t in trades], dtype=np.int64),
+                        np.array([t['pnl_percent'] for t in trades], dtype=np.float64)))
+    return results, indicators.stats
+
+def _metrics(exit_times, pnl, trade_size):
+    order = np.argsort(exit_times, kind='stable')
+    pnl = pnl[order]
+    if pnl.size == 0:
+        return {"trades": 0, "win_rate": 0.0, "total_pnl_percent": 0.0, "max_drawdown_usdt": 0.0,
+                "total_pnl_usdt": 0.0, "profit_factor": 0.0, "pnl_to_drawdown": 0.0}
+    pnl_usdt = pnl / 100 * trade_size
+    gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    drawdown = _max_drawdown(pnl_usdt)
+    return {
+        "trades": int(pnl.size), "win_rate": round(float((pnl > 0).mean() * 100), 2),
+        "total_pnl_percent": round(float(pnl.sum()), 2), "total_pnl_usdt": round(float(pnl_usdt.sum()), 2),
+        "max_drawdown_usdt": round(drawdown, 2),
+        "profit_factor": round(float(gains / losses), 3) if losses > 0 else float(gains > 0) * 99.0,
+        "pnl_to_drawdown": round(float(pnl_usdt.sum() / drawdown), 3) if drawdown > 0 else float(pnl_usdt.sum()),
+    }
+
+def run_sweep(data, candidates, base_settings=None, strategies=None, fee_percent=0.1,
+              objective="total_pnl_percent", min_trades=20, workers=1):
+    """Evaluates all candidates on all symbols (one pool task per symbol) and returns them ranked best first."""
+    base_settings = base_settings or copy.deepcopy(DEFAULT_SETTINGS)
+    tasks = [(symbol, candles, base_settings, candidates, strategies, fee_percent) for symbol, candles in data.items()]
+    per_candidate = [([], []) for _ in candidates]
+    cache_stats = {"computed": 0, "reused": 0}
+
+    def collect(result):
+        symbol_results, stats = result
+        for k in cache_stats:
+            cache_stats[k] += stats.get(k, 0)
+        for (times, pnls), (exit_times, pnl) in zip(per_candidate, symbol_results):
+            times.append(exit_times)
+            pnls.append(pnl)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_sweep_symbol, tasks):
+                collect(result)
+    else:
+        for task in tasks:
+            collect(_sweep_symbol(task))
+
+    trade_size = base_settings['virtual_portfolio_balance_usdt'] * base_settings['virtual_trade_size_percentage'] / 100
+    ranked = []
+    for overrides, (times, pnls) in zip(candidates, per_candidate):
+        metrics = _metrics(np.concatenate(times or [np.empty(0, np.int64)]),
+                           np.concatenate(pnls or [np.empty(0)]), trade_size)
+        if metrics["trades"] >= min_trades:
+            ranked.append({"overrides": overrides, "metrics": metrics, "score": metrics[objective]})
+    ranked.sort(key=lambda c: c["score"], reverse=True)
+    logger.info(f"Optimizer: {len(candidates)} candidates x {len(data)} symbols, "
+                f"indicators computed {cache_stats['computed']}, reused {cache_stats['reused']}.")
+    return ranked, cache_stats
+
+# =======================================================================================
+# --- Candidate Presets ---
+# =======================================================================================
+
+def overrides_to_preset(overrides):
+    """Nested dict in the same shape as config.PRESETS entries."""
+    preset = {}
+    for path, value in overrides.items():
+        _set_path(preset, path, value)
+    return preset
+
+def write_candidate_presets(ranked, path=OPTIMIZED_PRESETS_FILE, top=5, objective="total_pnl_percent"):
+    presets = {
+        f"OPT_{rank}": {"preset": overrides_to_preset(c["overrides"]), "metrics": c["metrics"], "score": c["score"]}
+        for rank, c in enumerate(ranked[:top], start=1)
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"generated_at": datetime.now().isoformat(timespec='seconds'), "objective": objective,
+                   "presets": presets}, f, indent=4, ensure_ascii=False)
+    logger.info(f"Optimizer: wrote {len(presets)} candidate presets to {path}.")
+    return presets
+
+def load_candidate_presets(path=OPTIMIZED_PRESETS_FILE):
+    """{name: preset} from the optimizer output, ready to merge like config.PRESETS (empty if missing)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {name: entry["preset"] for name, entry in json.load(f).get("presets", {}).items()}
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not read optimized presets from {path}: {e}")
+        return {}
+
+def apply_preset(settings, preset, preset_name=None):
+    """Merges a preset into `settings` in place (nested sections are updated, not replaced)."""
+    for key, value in preset.items():
+        if isinstance(value, dict) and isinstance(settings.get(key), dict):
+            apply_preset(settings[key], value)
+        else:
+            settings[key] = copy.deepcopy(value)
+    if preset_name:
+        settings['active_preset_name'] = preset_name
+    return settings
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid/random parameter sweep over historical OHLCV.")
+    parser.add_argument('--data-dir', required=True, help="Folder of per-symbol OHLCV CSV files.")
+    parser.add_argument('--mode', choices=('grid', 'random'), default='random')
+    parser.add_argument('--samples', type=int, default=100, help="Random-search sample count.")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--space', help='JSON search space: {path: [values]} or {path: {"range": [low, high]}}.')
+    parser.add_argument('--strategies', nargs='*', help="Subset of strategies to optimize.")
+    parser.add_argument('--objective', choices=OBJECTIVES, default='total_pnl_percent')
+    parser.add_argument('--min-trades', type=int, default=20)
+    parser.add_argument('--fee-percent', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--output', default=OPTIMIZED_PRESETS_FILE)
+    args = parser.parse_args()
+
+    space = DEFAULT_SEARCH_SPACE
+    if args.space:
+        with open(args.space, 'r', encoding='utf-8') as f:
+            # في ملف JSON يُكتب المدى كـ {"range": [low, high]}
+            space = {k: tuple(v["range"]) if isinstance(v, dict) else v for k, v in json.load(f).items()}
+    candidates = grid_candidates(space) if args.mode == 'grid' else random_candidates(space, args.samples, args.seed)
+
+    data = load_ohlcv_dir(args.data_dir)
+    ranked, _ = run_sweep(data, candidates, copy.deepcopy(DEFAULT_SETTINGS), args.strategies, args.fee_percent,
+                          args.objective, args.min_trades, args.workers)
+    presets = write_candidate_presets(ranked, args.output, args.top, args.objective)
+    for name, entry in presets.items():
+        print(f"{name}: score={entry['score']} {json.dumps(entry['metrics'])}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 📚 ملف دفاتر الأوامر المحلية (order_books.py) | بوت كاسحة الألغام v6.6 📚 ---
+# =======================================================================================
+# دفاتر أوامر L2 محلية لكل (منصة، عملة) تُبنى من لقطة كاملة ثم تُحدَّث بالفروقات من البث،
+# مع لقطة REST كاحتياط عند انقطاع البث أو اكتشاف فجوة في التسلسل. المقاييس (قيمة الجدار
+# ضمن نسبة من السعر، عدم التوازن، ثبات الجدار عبر الزمن) تُحسب بـ numpy على مصفوفات العمق.
+
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+from config import (ORDER_BOOK_DEPTH, ORDER_BOOK_STALE_SECONDS, ORDER_BOOK_WALL_PERCENT,
+                    ORDER_BOOK_HISTORY_SECONDS, ORDER_BOOK_SAMPLE_SECONDS)
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Vectorized Depth Metrics ---
+# =======================================================================================
+
+def depth_metrics(bids, asks, within_percent=ORDER_BOOK_WALL_PERCENT, levels=10):
+    """Bid/ask value in the top `levels` and within `within_percent` of mid, plus imbalance.
+
+    `bids` must be sorted best (highest) first and `asks` best (lowest) first, as (N, 2) arrays.
+    """
+    bid_notional = bids[:, 0] * bids[:, 1]
+    ask_notional = asks[:, 0] * asks[:, 1]
+    best_bid = float(bids[0, 0]) if len(bids) else np.nan
+    best_ask = float(asks[0, 0]) if len(asks) else np.nan
+    mid = (best_bid + best_ask) / 2 if len(bids) and len(asks) else (best_bid if len(bids) else best_ask)
+    bid_within = float(bid_notional[bids[:, 0] >= mid * (1 - within_percent / 100)].sum()) if len(bids) else 0.0
+    ask_within = float(ask_notional[asks[:, 0] <= mid * (1 + within_percent / 100)].sum()) if len(asks) else 0.0
+    total = bid_within + ask_within
+    return {
+        "best_bid": best_bid, "best_ask": best_ask, "mid": mid,
+        "spread_percent": (best_ask - best_bid) / mid * 100 if len(bids) and len(asks) else np.nan,
+        "bid_value_top": float(bid_notional[:levels].sum()), "ask_value_top": float(ask_notional[:levels].sum()),
+        "bid_value_within": bid_within, "ask_value_within": ask_within,
+        "imbalance": (bid_within - ask_within) / total if total else 0.0,
+    }
+
+# =======================================================================================
+# --- Local Order Book ---
+# =======================================================================================
+
+class LocalOrderBook:
+    """One L2 book kept as price -> amount maps, materialized to sorted arrays only when read."""
+    def __init__(self, depth=ORDER_BOOK_DEPTH):
+        self.depth = depth
+        self.bids = {}
+        self.asks = {}
+        self.nonce = None
+        self.updated_at = 0.0
+        self.source = None
+        self.in_sync = False
+        self._arrays = None
+        self.wall_metric = ("top", 10)   # ("top", levels) أو ("within", percent): نفس مقياس قرار الجدار
+        self.history = deque()   # (timestamp, قيمة الجدار حسب wall_metric)
+        self._last_sample = 0.0
+
+    @staticmethod
+    def _to_map(levels):
+        return {float(level[0]): float(level[1]) for level in levels if float(level[1]) > 0}
+
+    def apply_snapshot(self, bids, asks, nonce=None, source="stream"):
+        self.bids, self.asks = self._to_map(bids), self._to_map(asks)
+        self.nonce, self.source, self.in_sync = nonce, source, True
+        self._touched()
+
+    def apply_delta(self, bids, asks, nonce=None, prev_nonce=None):
+        """Applies changed levels (amount 0 removes the level). Returns False on a sequence gap."""
+        if not self.in_sync or (prev_nonce is not None and self.nonce is not None and prev_nonce != self.nonce):
+            self.in_sync = False
+            return False
+        for side, levels in ((self.bids, bids), (self.asks, asks)):
+            for level in levels:
+                price, amount = float(level[0]), float(level[1])
+                if amount > 0:
+                    side[price] = amount
+                else:
+                    side.pop(price, None)
+        self.nonce = nonce if nonce is not None else self.nonce
+        self._touched()
+        return True
+
+    def set_wall_metric(self, wall_metric):
+        """Samples `wall_metric` from now on; history of a different metric is dropped rather than mixed in."""
+        if wall_metric != self.wall_metric:
+            self.wall_metric = wall_metric
+            self.history.clear()
+            self._last_sample = 0.0
+
+    def wall_value(self, metrics):
+        """The bid wall value from depth_metrics output, as measured by `wall_metric`."""
+        return metrics["bid_value_within"] if self.wall_metric[0] == "within" else metrics["bid_value_top"]
+
+    def _touched(self):
+        self._arrays = None
+        self.updated_at = time.time()
+        if self.updated_at - self._last_sample >= ORDER_BOOK_SAMPLE_SECONDS:
+            self._last_sample = self.updated_at
+            bids, asks = self.arrays()
+            kind, param = self.wall_metric
+            metrics = depth_metrics(bids, asks, within_percent=param if kind == "within" else ORDER_BOOK_WALL_PERCENT,
+                                    levels=param if kind == "top" else 10)
+            self.history.append((self.updated_at, self.wall_value(metrics)))
+            while self.history and self.history[0][0] < self.updated_at - ORDER_BOOK_HISTORY_SECONDS:
+                self.history.popleft()
+
+    def arrays(self):
+        """(bids, asks) as (N, 2) arrays, best level first, truncated to `depth`."""
+        if self._arrays is None:
+            bid_prices = sorted(self.bids, reverse=True)[:self.depth]
+            ask_prices = sorted(self.asks)[:self.depth]
+            # نحذف المستويات البعيدة حتى لا تكبر القواميس بلا حد
+            if len(self.bids) > 4 * self.depth:
+                self.bids = {p: self.bids[p] for p in bid_prices}
+            if len(self.asks) > 4 * self.depth:
+                self.asks = {p: self.asks[p] for p in ask_prices}
+            bids = np.array([(p, self.bids[p]) for p in bid_prices], dtype=np.float64).reshape(-1, 2)
+            asks = np.array([(p, self.asks[p]) for p in ask_prices], dtype=np.float64).reshape(-1, 2)
+            self._arrays = (bids, asks)
+        return self._arrays
+
+    def wall_persistence(self, threshold, window_seconds=ORDER_BOOK_HISTORY_SECONDS):
+        """Fraction of recent samples whose wall value (per `wall_metric`) was above `threshold`."""
+        cutoff = time.time() - window_seconds
+        values = np.array([value for ts, value in self.history if ts >= cutoff])
+        return float((values > threshold).mean()) if values.size else 0.0
+
+    def age(self):
+        return time.time() - self.updated_at
+
+# =======================================================================================
+# --- Order Book Service ---
+# =======================================================================================
+
+class OrderBookService:
+    """Local books fed by the stream (snapshots + diffs), with REST snapshots when a book is stale or out of sync."""
+    def __init__(self, depth=ORDER_BOOK_DEPTH, stale_after_seconds=ORDER_BOOK_STALE_SECONDS):
+        self.depth = depth
+        self.stale_after_seconds = stale_after_seconds
+        self._books = {}
+        self.stats = {"stream_hits": 0, "rest_snapshots": 0, "deltas": 0, "gaps": 0}
+
+    def _book(self, exchange_id, symbol):
+        book = self._books.get((exchange_id, symbol))
+        if book is None:
+            book = self._books[(exchange_id, symbol)] = LocalOrderBook(self.depth)
+        return book
+
+    # --- أحداث قادمة من البث ---
+    def on_snapshot(self, exchange_id, symbol, bids, asks, nonce=None):
+        self._book(exchange_id, symbol).apply_snapshot(bids, asks, nonce)
+
+    def on_delta(self, exchange_id, symbol, bids, asks, nonce=None, prev_nonce=None):
+        self.stats["deltas"] += 1
+        if not self._book(exchange_id, symbol).apply_delta(bids, asks, nonce, prev_nonce):
+            # فجوة في التسلسل: الدفتر غير موثوق حتى تصل لقطة جديدة (من البث أو REST)
+            self.stats["gaps"] += 1
+            logger.debug(f"Order book gap for {symbol} on {exchange_id}; waiting for a fresh snapshot.")
+
+    # --- القراءة ---
+    async def get_book(self, exchange, symbol):
+        """The local book if it is in sync and fresh, otherwise a REST snapshot loaded into it."""
+        book = self._book(exchange.id, symbol)
+        if book.in_sync and book.age() < self.stale_after_seconds:
+            if book.source == "stream":
+                self.stats["stream_hits"] += 1
+            return book
+        ob = await exchange.fetch_order_book(symbol, limit=self.depth)
+        self.stats["rest_snapshots"] += 1
+        book.apply_snapshot(ob.get('bids') or [], ob.get('asks') or [], ob.get('nonce'), source="rest")
+        return book
+
+    async def get_metrics(self, exchange, symbol, within_percent=ORDER_BOOK_WALL_PERCENT, levels=10, wall_metric=None):
+        """depth_metrics for the book, plus the book itself. `wall_metric` sets what its history samples."""
+        book = await self.get_book(exchange, symbol)
+        if wall_metric is not None:
+            book.set_wall_metric(wall_metric)
+        bids, asks = book.arrays()
+        return depth_metrics(bids, asks, within_percent, levels), book
+
+    def invalidate(self, exchange_id=None):
+        if exchange_id is None:
+            self._books.clear()
+        else:
+            self._books = {k: v for k, v in self._books.items() if k[0] != exchange_id}
+
+# نسخة واحدة مشتركة
+order_book_service = OrderBookService()
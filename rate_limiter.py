@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🚦 ملف تنظيم الطلبات (rate_limiter.py) | بوت كاسحة الألغام v6.6 🚦 ---
+# =======================================================================================
+
+import asyncio
+import logging
+import time
+
+import ccxt
+
+from config import RATE_LIMIT_BURST_SECONDS, RATE_LIMIT_HIGH_UTILIZATION, RATE_LIMIT_MAX_BACKOFF_SECONDS
+from metrics import metrics
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# رؤوس الاستجابة التي تعلن عنها المنصات: (المتبقي، الحد) أو (المستخدم، الحد)
+REMAINING_HEADERS = [
+    ("x-ratelimit-remaining", "x-ratelimit-limit"),
+    ("x-bapi-limit-status", "x-bapi-limit"),                      # bybit
+    ("gw-ratelimit-remaining", "gw-ratelimit-limit"),             # kucoin
+    ("x-gate-ratelimit-requests-remain", "x-gate-ratelimit-limit"),  # gate
+]
+USED_WEIGHT_HEADERS = {
+    "x-mbx-used-weight-1m": 6000,   # binance (وزن الطلبات المستخدم في الدقيقة)
+}
+
+# =======================================================================================
+# --- Adaptive Token Bucket ---
+# =======================================================================================
+
+class ExchangeRateLimiter:
+    """Token bucket shared by every ccxt client of one exchange, sized from ccxt's `rateLimit`.
+
+    `cost` is the endpoint weight ccxt passes to `throttle()`. The refill rate shrinks when the
+    exchange reports high utilisation or answers 429, and recovers gradually on success.
+
+    A bucket only sees its own process. When several processes call the same exchange (scan shards),
+    each gets a `share` of the exchange's budget so that together they stay within it.
+    """
+    def __init__(self, exchange_id, rate_limit_ms, share=1.0):
+        self.exchange_id = exchange_id
+        self.full_rate = 1000.0 / max(rate_limit_ms, 1)
+        self.rate_factor = 1.0
+        self.set_share(share)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._backoff = 1.0
+        self._last_refill = time.monotonic()
+        self.stats = {"requests": 0, "weight": 0.0, "waited_seconds": 0.0, "rate_limited": 0, "throttled_by_headers": 0}
+
+    def set_share(self, share):
+        """Limits this process to `share` (0-1] of the exchange's request budget."""
+        old_capacity = getattr(self, 'capacity', None)
+        if old_capacity:
+            self._refill(time.monotonic())   # ما تراكم حتى الآن يُحسب بالمعدل القديم
+        self.share = share
+        self.base_rate = self.full_rate * share
+        self.capacity = max(self.base_rate * RATE_LIMIT_BURST_SECONDS, 1.0)
+        if old_capacity:
+            # الرصيد (أو الدين) يتغير بنسبة السعة، فلا يضيع الرصيد المتاح ولا يُمحى دين طلب ثقيل
+            self.tokens *= self.capacity / old_capacity
+
+    @property
+    def rate(self):
+        return self.base_rate * self.rate_factor
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self, cost=None):
+        """Waits until this call may go out, then charges its cost to the bucket.
+
+        Like ccxt's own throttler, a call is let through whenever the bucket is not in debt and its
+        cost is then subtracted in full, so a weight above `capacity` (e.g. fetch_open_orders without
+        a symbol) leaves the bucket negative and the callers after it wait the debt off. Nothing is
+        held while sleeping: between waking up and charging there is no await, so the check and the
+        charge cannot interleave with another task.
+        """
+        cost = 1.0 if cost is None else float(cost)
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if self.paused_until > now:
+                delay = self.paused_until - now
+            elif self.tokens >= 0:
+                self.tokens -= cost
+                break
+            else:
+                delay = -self.tokens / self.rate
+            await asyncio.sleep(delay)
+        self.stats["requests"] += 1
+        self.stats["weight"] += cost
+        self.stats["waited_seconds"] += time.monotonic() - started
+
+    def on_success(self):
+        if self.rate_factor < 1.0:
+            self.rate_factor = min(1.0, self.rate_factor * 1.02)
+        self._backoff = max(1.0, self._backoff * 0.9)
+
+    def on_rate_limited(self, retry_after=None):
+        """429 / DDoS response: pause everyone sharing this bucket and halve the refill rate."""
+        self.stats["rate_limited"] += 1
+        try:
+            pause = float(retry_after) if retry_after else self._backoff
+        except (TypeError, ValueError):
+            pause = self._backoff
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        self.rate_factor = max(0.1, self.rate_factor * 0.5)
+        self.tokens = min(self.tokens, 0.0)
+        self._backoff = min(self._backoff * 2, RATE_LIMIT_MAX_BACKOFF_SECONDS)
+        logger.warning(f"{self.exchange_id} rate limited. Pausing {pause:.1f}s, rate now {self.rate:.2f} units/s.")
+
+    def observe_headers(self, headers):
+        """Slows down when the exchange says we are close to its limit."""
+        if not headers:
+            self.on_success()
+            return
+        headers = {str(k).lower(): v for k, v in headers.items()}
+        utilization = None
+        try:
+            for remaining_key, limit_key in REMAINING_HEADERS:
+                if remaining_key in headers and limit_key in headers:
+                    utilization = 1 - float(headers[remaining_key]) / float(headers[limit_key])
+                    break
+            else:
+                for used_key, limit in USED_WEIGHT_HEADERS.items():
+                    if used_key in headers:
+                        utilization = float(headers[used_key]) / limit
+                        break
+        except (TypeError, ValueError, ZeroDivisionError):
+            return
+
+        if utilization is not None and utilization >= RATE_LIMIT_HIGH_UTILIZATION:
+            self.stats["throttled_by_headers"] += 1
+            self.rate_factor = max(0.1, self.rate_factor * 0.8)
+            self.tokens = min(self.tokens, 0.0)
+        else:
+            self.on_success()
+
+# =======================================================================================
+# --- Client Wiring ---
+# =======================================================================================
+
+rate_limiters = {}
+
+def get_rate_limiter(exchange_id, rate_limit_ms=None, share=1.0):
+    limiter = rate_limiters.get(exchange_id)
+    if limiter is None:
+        limiter = rate_limiters[exchange_id] = ExchangeRateLimiter(exchange_id, rate_limit_ms or 100, share)
+    return limiter
+
+def set_budget_share(exchange_ids, share):
+    """Changes this process's share of each exchange's budget (e.g. while scan shards use the rest)."""
+    for exchange_id in exchange_ids:
+        limiter = rate_limiters.get(exchange_id)
+        if limiter is not None:
+            limiter.set_share(share)
+
+def attach_rate_limiter(exchange, share=1.0):
+    """Routes a ccxt async client's throttling and HTTP responses through its exchange's shared limiter."""
+    limiter = get_rate_limiter(exchange.id, exchange.rateLimit, share)
+    original_fetch = exchange.fetch
+
+    async def throttle(cost=None):
+        started = time.perf_counter()
+        await limiter.acquire(cost)
+        metrics.observe("rate_limit_wait_seconds", time.perf_counter() - started, exchange=exchange.id)
+
+    async def fetch(url, method='GET', headers=None, body=None):
+        started = time.perf_counter()
+        try:
+            response = await original_fetch(url, method, headers, body)
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+            metrics.inc("exchange_requests_total", exchange=exchange.id, outcome="rate_limited")
+            response_headers = {str(k).lower(): v for k, v in (exchange.last_response_headers or {}).items()}
+            limiter.on_rate_limited(response_headers.get('retry-after'))
+            raise
+        except Exception:
+            metrics.inc("exchange_requests_total", exchange=exchange.id, outcome="error")
+            raise
+        finally:
+            metrics.observe("exchange_request_seconds", time.perf_counter() - started, exchange=exchange.id)
+        metrics.inc("exchange_requests_total", exchange=exchange.id, outcome="ok")
+        limiter.observe_headers(exchange.last_response_headers)
+        return response
+
+    exchange.throttle = throttle
+    exchange.fetch = fetch
+    return limiter
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🧭 ملف ذاكرة مدخلات وضع السوق (regime_cache.py) | بوت كاسحة الألغام v6.6 🧭 ---
+# =======================================================================================
+# اتجاه BTC ومؤشر الخوف والطمع والمزاج الأساسي تتغير ببطء، لذا تُخزن بمدة صلاحية لكل مصدر.
+# بعد انتهاء الصلاحية تُعاد القيمة القديمة فوراً ويُحدَّث المصدر في الخلفية، وعند فشل الجلب
+# تبقى آخر قيمة سليمة مستخدمة حتى حد أقصى للتقادم.
+
+import asyncio
+import logging
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Hedged Requests ---
+# =======================================================================================
+
+async def hedged(calls, hedge_delay):
+    """Runs calls[0], starting the next call every `hedge_delay` seconds (or right after a failure).
+
+    The first successful result wins and the remaining attempts are cancelled.
+    """
+    remaining = iter(calls)
+    pending = set()
+    last_error = None
+
+    def launch():
+        call = next(remaining, None)
+        if call is None:
+            return False
+        pending.add(asyncio.ensure_future(call()))
+        return True
+
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch()
+                continue
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+                launch()
+        raise last_error or RuntimeError("No sources to query.")
+    finally:
+        for task in pending:
+            task.cancel()
+
+# =======================================================================================
+# --- TTL Cache with Stale-While-Revalidate ---
+# =======================================================================================
+
+class _Source:
+    def __init__(self, loader, ttl, max_stale, default):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.default = default
+        self.value = None
+        self.fetched_at = None
+        self.last_error = None
+        self.refresh_task = None
+        self.used = False
+
+class RegimeCache:
+    """Named slow-moving inputs, each with its own loader, TTL and last-known-good window."""
+    def __init__(self):
+        self._sources = {}
+
+    def register(self, name, loader, ttl, max_stale, default=None):
+        """`loader` is a coroutine function; it should raise (not return a sentinel) when the source fails."""
+        self._sources[name] = _Source(loader, ttl, max_stale, default)
+
+    async def get(self, name):
+        source = self._sources[name]
+        source.used = True
+        age = time.time() - source.fetched_at if source.fetched_at is not None else None
+        if age is not None and age < source.ttl:
+            metrics.inc("regime_cache_total", source=name, outcome="hit")
+            return source.value
+        if age is not None and age < source.max_stale:
+            # نعيد القيمة القديمة فوراً ونحدث في الخلفية
+            metrics.inc("regime_cache_total", source=name, outcome="stale")
+            self._start_refresh(name)
+            return source.value
+
+        metrics.inc("regime_cache_total", source=name, outcome="miss")
+        # shield: إلغاء فحص واحد لا يلغي التحديث المشترك (الأخطاء تُسجل داخل _refresh)
+        await asyncio.shield(self._start_refresh(name))
+        if source.fetched_at is not None and time.time() - source.fetched_at < source.max_stale:
+            return source.value
+        return source.default
+
+    def _start_refresh(self, name):
+        source = self._sources[name]
+        if source.refresh_task is None or source.refresh_task.done():
+            source.refresh_task = asyncio.ensure_future(self._refresh(name))
+        return source.refresh_task
+
+    async def _refresh(self, name):
+        source = self._sources[name]
+        started = time.perf_counter()
+        try:
+            value = await source.loader()
+        except Exception as e:
+            source.last_error = str(e)
+            metrics.inc("regime_refresh_total", source=name, outcome="error")
+            level = logging.WARNING if source.fetched_at is not None else logging.ERROR
+            logger.log(level, f"Regime input '{name}' refresh failed, keeping last known value: {e}")
+            return
+        finally:
+            metrics.observe("stage_duration_seconds", time.perf_counter() - started, stage=f"regime.{name}")
+        source.value, source.fetched_at, source.last_error = value, time.time(), None
+        metrics.inc("regime_refresh_total", source=name, outcome="ok")
+
+    def refresh_due(self, lead_seconds=0):
+        """Starts background refreshes for used sources that expire within `lead_seconds` (job-queue hook)."""
+        now = time.time()
+        started = []
+        for name, source in self._sources.items():
+            if source.used and (source.fetched_at is None or now - source.fetched_at >= source.ttl - lead_seconds):
+                self._start_refresh(name)
+                started.append(name)
+        return started
+
+    def invalidate(self, name=None):
+        for key in ([name] if name else list(self._sources)):
+            self._sources[key].fetched_at = None
+
+    def snapshot(self):
+        """{name: {"age", "value", "last_error"}} for diagnostics."""
+        now = time.time()
+        return {name: {"age": round(now - s.fetched_at, 1) if s.fetched_at is not None else None,
+                       "value": s.value, "last_error": s.last_error}
+                for name, s in self._sources.items()}
+
+# نسخة واحدة مشتركة
+regime_cache = RegimeCache()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- ⏱️ ملف جدولة الفحص (scan_scheduler.py) | بوت كاسحة الألغام v6.6 ⏱️ ---
+# =======================================================================================
+
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import defaultdict
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Market Selection ---
+# =======================================================================================
+
+def select_top_markets(all_tickers, settings):
+    """Filters raw tickers to liquid USDT pairs and keeps the best exchange per symbol. Returns (top_markets, post_filter_count)."""
+    excluded_bases = settings.get('stablecoin_filter', {}).get('exclude_bases', [])
+    min_volume = settings.get('liquidity_filters', {}).get('min_quote_volume_24h_usd', 1000000)
+    
+    usdt_tickers = [
+        t for t in all_tickers if t.get('symbol') and t['symbol'].upper().endswith('/USDT') and 
+        t['symbol'].split('/')[0] not in excluded_bases and 
+        t.get('quoteVolume') and t['quoteVolume'] >= min_volume and 
+        not any(k in t['symbol'].upper() for k in ['UP','DOWN','3L','3S','BEAR','BULL'])
+    ]
+
+    return _best_per_symbol(usdt_tickers, settings), len(usdt_tickers)
+
+def select_top_markets_indexed(tickers_by_exchange, eligible_by_exchange, settings):
+    """Index-based select_top_markets: only walks the symbols the universe index marked eligible.
+
+    `tickers_by_exchange` is {exchange_id: {symbol: ticker}}; only tickers that pass the volume
+    filter are copied and tagged with their exchange.
+    """
+    min_volume = settings.get('liquidity_filters', {}).get('min_quote_volume_24h_usd', 1000000)
+    usdt_tickers = []
+    for exchange_id, tickers in tickers_by_exchange.items():
+        eligible = eligible_by_exchange.get(exchange_id, ())
+        # نمر على الأصغر من المجموعتين
+        symbols = eligible if len(eligible) < len(tickers) else tickers.keys()
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            if ticker is None or symbol not in eligible:
+                continue
+            volume = ticker.get('quoteVolume')
+            if volume and volume >= min_volume:
+                usdt_tickers.append(dict(ticker, symbol=symbol, exchange=exchange_id))
+    return _best_per_symbol(usdt_tickers, settings), len(usdt_tickers)
+
+def _best_per_symbol(usdt_tickers, settings):
+    """Keeps one ticker per symbol (preferring real-trading exchanges, then volume) and the top N by volume."""
+    grouped_symbols = defaultdict(list)
+    for ticker in usdt_tickers:
+        grouped_symbols[ticker['symbol']].append(ticker)
+
+    final_list = []
+    real_trading_exchanges = {ex for ex, enabled in settings.get("real_trading_per_exchange", {}).items() if enabled}
+    
+    for symbol, tickers in grouped_symbols.items():
+        real_trade_options = [t for t in tickers if t['exchange'] in real_trading_exchanges]
+        
+        if real_trade_options:
+            best_option = max(real_trade_options, key=lambda t: t.get('quoteVolume', 0))
+            final_list.append(best_option)
+        else:
+            best_option = max(tickers, key=lambda t: t.get('quoteVolume', 0))
+            final_list.append(best_option)
+
+    final_list.sort(key=lambda t: t.get('quoteVolume', 0), reverse=True)
+    return final_list[:settings.get('top_n_symbols_by_volume', 250)]
+
+# =======================================================================================
+# --- Market Priority Scoring ---
+# =======================================================================================
+
+def _percentile_ranks(values):
+    """Maps each value to its rank in [0, 1] (ties share the lower rank)."""
+    if not values:
+        return []
+    order = sorted(range(len(values)), key=values.__getitem__)
+    ranks = [0.0] * len(values)
+    denominator = max(len(values) - 1, 1)
+    for position, index in enumerate(order):
+        ranks[index] = position / denominator
+    return ranks
+
+def score_markets(markets, weights, proximity=None):
+    """Scores markets by weighted percentile ranks of volume, 24h volatility and previous signal proximity."""
+    proximity = proximity or {}
+    volume_ranks = _percentile_ranks([math.log1p(m.get('quoteVolume') or 0) for m in markets])
+    volatility_ranks = _percentile_ranks([abs(m.get('percentage') or 0) for m in markets])
+    return [
+        weights.get('volume', 1.0) * volume_ranks[i]
+        + weights.get('volatility', 0.0) * volatility_ranks[i]
+        + weights.get('signal_proximity', 0.0) * proximity.get((m.get('exchange'), m.get('symbol')), 0.0)
+        for i, m in enumerate(markets)
+    ]
+
+# =======================================================================================
+# --- Priority Queue with Time Budget ---
+# =======================================================================================
+
+class PriorityScanQueue:
+    """Hands out markets best score first and stops handing out work once the scan's time budget is spent.
+
+    Drop-in for the asyncio.Queue the workers used: get_nowait() returns None when the queue is
+    empty or the budget is exhausted, put() re-queues and task_done() marks completion.
+    """
+    def __init__(self, markets, scores, time_budget_seconds=None):
+        self._heap = []
+        self._counter = itertools.count()
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + time_budget_seconds if time_budget_seconds else None
+        self.skipped = []
+        self.cancelled = []
+        self.in_flight = {}
+        self.stats = {"queued": 0, "started": 0, "completed": 0, "requeued": 0}
+        for market, score in zip(markets, scores):
+            self._push(market, score)
+
+    def _push(self, market, score):
+        market['scan_priority'] = score
+        heapq.heappush(self._heap, (-score, next(self._counter), market))
+        self.stats["queued"] += 1
+
+    def remaining_seconds(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def budget_exhausted(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def empty(self):
+        return not self._heap or self.budget_exhausted()
+
+    def get_nowait(self):
+        if self._heap and self.budget_exhausted():
+            # انتهت الميزانية: كل ما تبقى يُسجل كمتخطى بدلاً من تأخير الفحص لما بعد إغلاق الشمعة
+            self.skipped.extend(market for _, _, market in sorted(self._heap))
+            self._heap.clear()
+        if not self._heap:
+            return None
+        _, seq, market = heapq.heappop(self._heap)
+        self.stats["started"] += 1
+        self.in_flight[id(market)] = market
+        return market
+
+    async def put(self, market):
+        self.stats["requeued"] += 1
+        self._push(market, market.get('scan_priority', 0.0))
+
+    def task_done(self, market=None):
+        if market is not None:
+            self.in_flight.pop(id(market), None)
+        self.stats["completed"] += 1
+
+    def cancel_in_flight(self):
+        """Marks markets still being scanned as cancelled (call right before cancelling the workers)."""
+        self.cancelled.extend(self.in_flight.values())
+        self.in_flight.clear()
+
+    def report(self):
+        """Summary of what was scanned and what the budget forced us to skip."""
+        return {
+            **self.stats,
+            "skipped": len(self.skipped),
+            "cancelled": len(self.cancelled),
+            "skipped_symbols": [f"{m.get('symbol')}@{m.get('exchange')}" for m in self.skipped[:20]],
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 2),
+            "budget_exhausted": self.budget_exhausted(),
+        }
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🧩 ملف تقسيم الفحص على العمليات (scan_shards.py) | بوت كاسحة الألغام v6.6 🧩 ---
+# =======================================================================================
+# كل منصة (أو مجموعة منصات) تُفحص في عملية مستقلة لها حلقة asyncio وعملاء ccxt وذاكرة شموع
+# ومنظم طلبات خاص بها. الإشارات تعود للعملية الرئيسية فور اكتشافها، وهي وحدها من يطبق
+# فترة التهدئة والحد الأقصى للصفقات وفتح الصفقات. تعطل منصة واحدة لا يوقف بقية الفحص.
+# حد طلبات كل منصة يُقسم صراحة: عملية الفحص تأخذ SHARD_RATE_LIMIT_SHARE والعملية الرئيسية
+# (متابعة الصفقات والتداول) الباقي، فلا يتجاوز مجموعهما حد المنصة.
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+
+import ccxt.async_support as ccxt_async
+
+from config import (SHARD_EXTRA_TIMEOUT_SECONDS, SHARD_FALLBACK_TIMEOUT_SECONDS, SHARD_RATE_LIMIT_SHARE,
+                    SCAN_BUDGET_GRACE_SECONDS)
+from rate_limiter import attach_rate_limiter, set_budget_share
+from markets_cache import load_markets_cached
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Shard Process ---
+# =======================================================================================
+
+async def connect_public_clients(exchange_ids):
+    """Default client factory for a shard: public spot clients limited to the shard's share of each exchange's budget."""
+    clients = {}
+
+    async def connect(ex_id):
+        client = getattr(ccxt_async, ex_id)({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
+        try:
+            attach_rate_limiter(client, SHARD_RATE_LIMIT_SHARE)
+            await load_markets_cached(client)
+            clients[ex_id] = client
+        except Exception as e:
+            logger.error(f"Shard could not connect PUBLIC client for {ex_id}: {e}")
+            await client.close()
+
+    await asyncio.gather(*[connect(ex_id) for ex_id in exchange_ids])
+    return clients
+
+class _SignalStream(list):
+    """results_list for run_scan_workers that also sends each signal to the main process as it is found."""
+    def __init__(self, result_queue, shard_id, scan_id):
+        super().__init__()
+        self.result_queue, self.shard_id, self.scan_id = result_queue, shard_id, scan_id
+
+    def append(self, signal):
+        super().append(signal)
+        self.result_queue.put({"type": "signal", "shard": self.shard_id, "scan_id": self.scan_id, "signal": signal})
+
+async def _shard_loop(shard_id, exchange_ids, client_factory, job_queue, result_queue):
+    from exchanges import bot_state
+
+    bot_state.public_exchanges = await client_factory(exchange_ids)
+    # استيراد متأخر: core_logic يُحمَّل داخل العملية الفرعية فقط
+    from core_logic import run_scan_workers
+    from incremental_indicators import indicator_store, checkpoint_path
+    checkpoint, checkpoint_loaded = checkpoint_path(exchange_ids), False
+    result_queue.put({"type": "ready", "shard": shard_id, "exchanges": sorted(bot_state.public_exchanges)})
+    loop = asyncio.get_running_loop()
+    try:
+        while (job := await loop.run_in_executor(None, job_queue.get)) is not None:
+            bot_state.settings = job["settings"]
+            incremental = job["settings"].get('incremental_indicators_enabled')
+            if incremental and not checkpoint_loaded:
+                # كل عملية تحمل حالة مؤشراتها الخاصة؛ العملية الرئيسية لا تملك هذه الحالة
+                await asyncio.to_thread(indicator_store.load_checkpoint, checkpoint)
+                checkpoint_loaded = True
+            bot_state.scan_proximity.update(job["proximity"])
+            signals = _SignalStream(result_queue, shard_id, job["scan_id"])
+            done = {"type": "done", "shard": shard_id, "scan_id": job["scan_id"]}
+            try:
+                _, report, failures = await run_scan_workers(job["markets"], job["settings"], results_list=signals)
+                proximity = {k: v for k, v in bot_state.scan_proximity.items() if k[0] in exchange_ids}
+                done.update(report=report, failures=failures, proximity=proximity)
+            except Exception as e:
+                logger.error(f"Shard {shard_id} scan failed: {e}", exc_info=True)
+                done.update(error=str(e))
+            result_queue.put(done)
+            if incremental:
+                await asyncio.to_thread(indicator_store.save_checkpoint, checkpoint)
+    finally:
+        await asyncio.gather(*[ex.close() for ex in bot_state.public_exchanges.values()], return_exceptions=True)
+
+def _shard_process_main(shard_id, exchange_ids, client_factory, job_queue, result_queue):
+    logging.basicConfig(format=f'%(asctime)s - shard {shard_id} - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_shard_loop(shard_id, exchange_ids, client_factory, job_queue, result_queue))
+    except KeyboardInterrupt:
+        pass
+
+# =======================================================================================
+# --- Main-Process Coordinator ---
+# =======================================================================================
+
+class _Shard:
+    def __init__(self, shard_id, exchange_ids):
+        self.id = shard_id
+        self.exchange_ids = list(exchange_ids)
+        self.process = None
+        self.job_queue = None
+        self.restarts = 0
+
+class ShardedScanner:
+    """Owns one worker process per exchange group and fans a scan's markets out to them."""
+    def __init__(self, groups, client_factory=connect_public_clients):
+        self.groups = [list(group) for group in groups]
+        self.client_factory = client_factory
+        self._context = multiprocessing.get_context('spawn')
+        self._shards = [_Shard(i, group) for i, group in enumerate(self.groups)]
+        self._owner = {ex_id: shard for shard in self._shards for ex_id in shard.exchange_ids}
+        self._results = None
+        self._inbox = None
+        self._pump_thread = None
+        self._scan_id = 0
+
+    def _spawn(self, shard):
+        shard.job_queue = self._context.Queue()
+        shard.process = self._context.Process(
+            target=_shard_process_main, name=f"minesweeper-shard-{shard.id}", daemon=True,
+            args=(shard.id, shard.exchange_ids, self.client_factory, shard.job_queue, self._results))
+        shard.process.start()
+        logger.info(f"Scan shard {shard.id} started for {', '.join(shard.exchange_ids)} (pid {shard.process.pid}).")
+
+    @staticmethod
+    def _kill(process):
+        if process.is_alive():
+            process.kill()
+        process.join(timeout=5)
+
+    async def _restart(self, shard, reason):
+        logger.error(f"Scan shard {shard.id} ({', '.join(shard.exchange_ids)}) {reason}. Restarting it.")
+        # join يحجب، لذا يُنفذ خارج حلقة asyncio حتى لا تتوقف المتابعة وتيليجرام
+        await asyncio.get_running_loop().run_in_executor(None, self._kill, shard.process)
+        shard.restarts += 1
+        self._spawn(shard)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._results = self._context.Queue()
+        self._inbox = asyncio.Queue()
+
+        def pump():
+            # خيط واحد ينقل رسائل العمليات إلى حلقة asyncio
+            while (message := self._results.get()) is not None:
+                try:
+                    loop.call_soon_threadsafe(self._inbox.put_nowait, message)
+                except RuntimeError:
+                    break   # الحلقة أُغلقت أثناء الإيقاف
+
+        self._pump_thread = threading.Thread(target=pump, name="minesweeper-shard-pump", daemon=True)
+        self._pump_thread.start()
+        for shard in self._shards:
+            self._spawn(shard)
+
+    async def scan(self, top_markets, settings, proximity=None):
+        """Like core_logic.run_scan_workers, plus the shards' updated scan proximity: (signals, scan_report, failures, proximity)."""
+        self._scan_id += 1
+        scan_id = self._scan_id
+        proximity = proximity or {}
+        assigned = {}
+        for market in top_markets:
+            shard = self._owner.get(market.get('exchange'))
+            if shard is not None:
+                assigned.setdefault(shard, []).append(market)
+        for shard, markets in assigned.items():
+            shard_proximity = {k: v for k, v in proximity.items() if k[0] in shard.exchange_ids}
+            shard.job_queue.put({"scan_id": scan_id, "markets": markets, "settings": settings, "proximity": shard_proximity})
+
+        budget = settings.get('scan_time_budget_seconds')
+        loop = asyncio.get_running_loop()
+        timeout = budget + SCAN_BUDGET_GRACE_SECONDS if budget else SHARD_FALLBACK_TIMEOUT_SECONDS
+        deadline = loop.time() + timeout + SHARD_EXTRA_TIMEOUT_SECONDS
+        signals, reports, failures, new_proximity = [], {}, 0, {}
+        waiting = set(assigned)
+        while waiting:
+            try:
+                message = await asyncio.wait_for(self._inbox.get(), timeout=1)
+            except asyncio.TimeoutError:
+                for shard in list(waiting):
+                    expired = loop.time() > deadline
+                    if not shard.process.is_alive() or expired:
+                        # عملية عالقة أو متوقفة: عملاتها تُحسب ملغاة وبقية المنصات تكمل
+                        await self._restart(shard, "missed the scan deadline" if expired else "died")
+                        reports[shard.id] = {"cancelled": len(assigned[shard]), "failed_shard": True}
+                        failures += len(assigned[shard])
+                        waiting.discard(shard)
+                continue
+            if message.get("type") == "ready":
+                logger.info(f"Scan shard {message['shard']} ready with: {', '.join(message['exchanges']) or 'no exchanges'}.")
+                continue
+            if message.get("scan_id") != scan_id:
+                continue   # رسالة متأخرة من فحص سابق
+            if message["type"] == "signal":
+                signals.append(message["signal"])
+            elif message["type"] == "done":
+                shard = self._shards[message["shard"]]
+                waiting.discard(shard)
+                if "error" in message:
+                    reports[shard.id] = {"cancelled": len(assigned[shard]), "failed_shard": True}
+                    failures += len(assigned[shard])
+                else:
+                    reports[shard.id] = message["report"]
+                    failures += message["failures"]
+                    new_proximity.update(message["proximity"])
+        return signals, merge_scan_reports(reports), failures, new_proximity
+
+    def _stop_blocking(self):
+        for shard in self._shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.job_queue.put(None)
+        for shard in self._shards:
+            if shard.process is not None:
+                shard.process.join(timeout=10)
+                if shard.process.is_alive():
+                    shard.process.kill()
+        if self._results is not None:
+            self._results.put(None)
+            self._pump_thread.join(timeout=5)
+
+    async def stop(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._stop_blocking)
+
+def merge_scan_reports(reports):
+    """Combines per-shard PriorityScanQueue reports into one, keeping the per-shard reports alongside."""
+    merged = {"queued": 0, "started": 0, "completed": 0, "requeued": 0, "skipped": 0, "cancelled": 0,
+              "skipped_symbols": [], "elapsed_seconds": 0.0, "budget_exhausted": False}
+    for report in reports.values():
+        for key in ("queued", "started", "completed", "requeued", "skipped", "cancelled"):
+            merged[key] += report.get(key, 0)
+        merged["skipped_symbols"].extend(report.get("skipped_symbols", []))
+        merged["elapsed_seconds"] = max(merged["elapsed_seconds"], report.get("elapsed_seconds", 0.0))
+        merged["budget_exhausted"] = merged["budget_exhausted"] or report.get("budget_exhausted", False)
+    merged["skipped_symbols"] = merged["skipped_symbols"][:20]
+    merged["shards"] = reports
+    return merged
+
+# =======================================================================================
+# --- Shared Instance ---
+# =======================================================================================
+
+_scanner = None
+
+def shard_groups(settings, exchange_ids):
+    """`scan_shard_groups` from settings, or one shard per exchange; exchanges not listed get their own shard."""
+    groups = [[ex for ex in group if ex in exchange_ids] for group in settings.get('scan_shard_groups') or []]
+    groups = [group for group in groups if group]
+    listed = {ex for group in groups for ex in group}
+    return groups + [[ex] for ex in exchange_ids if ex not in listed]
+
+async def run_sharded_scan(top_markets, settings, exchange_ids, proximity=None):
+    """Starts (or re-creates, if the grouping changed) the shard processes and runs one scan on them."""
+    global _scanner
+    groups = shard_groups(settings, exchange_ids)
+    if _scanner is not None and _scanner.groups != groups:
+        await shutdown_shards()
+    if _scanner is None:
+        _scanner = ShardedScanner(groups)
+        _scanner.start()
+        # العملية الرئيسية تكتفي بما تبقى من حد كل منصة ما دامت عمليات الفحص تعمل
+        set_budget_share(exchange_ids, 1 - SHARD_RATE_LIMIT_SHARE)
+    return await _scanner.scan(top_markets, settings, proximity)
+
+async def shutdown_shards():
+    global _scanner
+    if _scanner is not None:
+        scanner, _scanner = _scanner, None
+        await scanner.stop()
+        set_budget_share([ex_id for group in scanner.groups for ex_id in group], 1.0)
@@ -4,20 +4,21 @@
 # =======================================================================================
 
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 import logging
 import asyncio
+import time
 
 # استيراد الحالة المشتركة للبوت للوصول إلى الإعدادات
 from exchanges import bot_state
+from market_data import candle_cache
+from order_books import order_book_service
+from config import ORDER_BOOK_WALL_PERCENT
+from indicators import IndicatorSet, spec
+from lazy_import import module_available
 
-# التحقق من وجود مكتبة التحليل المتقدم
-try:
-    from scipy.signal import find_peaks
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
+# التحقق من وجود مكتبة التحليل المتقدم دون استيرادها عند التشغيل
+SCIPY_AVAILABLE = module_available("scipy")
 
 logger = logging.getLogger("MinesweeperBot_v6")
 
@@ -25,6 +26,10 @@ logger = logging.getLogger("MinesweeperBot_v6")
 # --- Utility Functions ---
 # =======================================================================================
 
+def _min_rvol(min_rvol):
+    """The RVOL threshold a rule should use: the caller's, or the live bot settings' when none is given."""
+    return bot_state.settings['liquidity_filters']['min_rvol'] if min_rvol is None else min_rvol
+
 def find_col(df_columns, prefix):
     """Finds the full column name in a DataFrame from its prefix."""
     try:
@@ -36,96 +41,102 @@ def find_col(df_columns, prefix):
 # --- Strategy Analysis Functions ---
 # =======================================================================================
 
-def analyze_momentum_breakout(df, params, rvol, adx_value, exchange, symbol):
+def analyze_momentum_breakout(df, params, rvol, adx_value, exchange, symbol, indicators=None, min_rvol=None):
     """Analyzes data for the Momentum Breakout strategy."""
     try:
-        df.ta.vwap(append=True)
-        df.ta.bbands(length=params['bbands_period'], std=params['bbands_stddev'], append=True)
-        df.ta.macd(fast=params['macd_fast'], slow=params['macd_slow'], signal=params['macd_signal'], append=True)
-        df.ta.rsi(length=params['rsi_period'], append=True)
-        
-        macd_col = find_col(df.columns, f"MACD_{params['macd_fast']}_{params['macd_slow']}_{params['macd_signal']}")
-        macds_col = find_col(df.columns, f"MACDs_{params['macd_fast']}_{params['macd_slow']}_{params['macd_signal']}")
-        bbu_col = find_col(df.columns, f"BBU_{params['bbands_period']}_")
-        rsi_col = find_col(df.columns, f"RSI_{params['rsi_period']}")
-        
-        if not all([macd_col, macds_col, bbu_col, rsi_col]):
+        ind = indicators or IndicatorSet(df)
+        vwap = ind.value("vwap")
+        bb = ind.get("bbands", length=params['bbands_period'], std=params['bbands_stddev'])
+        macd = ind.get("macd", fast=params['macd_fast'], slow=params['macd_slow'], signal=params['macd_signal'])
+        rsi = ind.value("rsi", length=params['rsi_period'])
+
+        if vwap is None or bb is None or macd is None or rsi is None:
             return None
-            
-        last, prev = df.iloc[-2], df.iloc[-3]
-        rvol_ok = rvol >= bot_state.settings['liquidity_filters']['min_rvol']
-        
-        if (prev[macd_col] <= prev[macds_col] and last[macd_col] > last[macds_col] and
-            last['close'] > last[bbu_col] and last['close'] > last["VWAP_D"] and
-            last[rsi_col] < params['rsi_max_level'] and rvol_ok):
+
+        last = df.iloc[-2]
+        rvol_ok = rvol >= _min_rvol(min_rvol)
+
+        if (macd['macd'][-3] <= macd['signal'][-3] and macd['macd'][-2] > macd['signal'][-2] and
+            last['close'] > bb['upper'][-2] and last['close'] > vwap[-2] and
+            rsi[-2] < params['rsi_max_level'] and rvol_ok):
             return {"reason": "momentum_breakout", "type": "long"}
     except Exception as e:
         logger.debug(f"Error in analyze_momentum_breakout for {symbol}: {e}")
     return None
 
-def analyze_breakout_squeeze_pro(df, params, rvol, adx_value, exchange, symbol):
+def analyze_breakout_squeeze_pro(df, params, rvol, adx_value, exchange, symbol, indicators=None, min_rvol=None):
     """Analyzes data for the Breakout Squeeze Pro strategy."""
     try:
-        df.ta.bbands(length=params['bbands_period'], std=params['bbands_stddev'], append=True)
-        df.ta.kc(length=params['keltner_period'], scalar=params['keltner_atr_multiplier'], append=True)
-        df.ta.obv(append=True)
-        
-        bbu_col = find_col(df.columns, f"BBU_{params['bbands_period']}_")
-        bbl_col = find_col(df.columns, f"BBL_{params['bbands_period']}_")
-        kcu_col = find_col(df.columns, f"KCUe_{params['keltner_period']}_")
-        kcl_col = find_col(df.columns, f"KCLEe_{params['keltner_period']}_")
-        
-        if not all([bbu_col, bbl_col, kcu_col, kcl_col]):
+        ind = indicators or IndicatorSet(df)
+        bb = ind.get("bbands", length=params['bbands_period'], std=params['bbands_stddev'])
+        kc = ind.get("kc", length=params['keltner_period'], scalar=params['keltner_atr_multiplier'])
+        obv = ind.value("obv")
+
+        if bb is None or kc is None or obv is None:
             return None
-            
-        last, prev = df.iloc[-2], df.iloc[-3]
-        is_in_squeeze = prev[bbl_col] > prev[kcl_col] and prev[bbu_col] < prev[kcu_col]
-        
+
+        is_in_squeeze = bb['lower'][-3] > kc['lower'][-3] and bb['upper'][-3] < kc['upper'][-3]
+
         if is_in_squeeze:
-            breakout_fired = last['close'] > last[bbu_col]
-            volume_ok = not params.get('volume_confirmation_enabled', True) or last['volume'] > df['volume'].rolling(20).mean().iloc[-2] * 1.5
-            rvol_ok = rvol >= bot_state.settings['liquidity_filters']['min_rvol']
-            obv_rising = df['OBV'].iloc[-2] > df['OBV'].iloc[-3]
-            
+            last = df.iloc[-2]
+            breakout_fired = last['close'] > bb['upper'][-2]
+            volume_ok = not params.get('volume_confirmation_enabled', True) or last['volume'] > ind.value("sma", source='volume', length=20)[-2] * 1.5
+            rvol_ok = rvol >= _min_rvol(min_rvol)
+            obv_rising = obv[-2] > obv[-3]
+
             if breakout_fired and rvol_ok and obv_rising and volume_ok:
                 return {"reason": "breakout_squeeze_pro", "type": "long"}
     except Exception as e:
         logger.debug(f"Error in analyze_breakout_squeeze_pro for {symbol}: {e}")
     return None
 
+def _sliding_extreme(values, window, op):
+    """Centered rolling max/min of width 2*window+1 in O(n) (van Herk / Gil-Werman block scan).
+
+    Returns an array aligned with values[window:len(values)-window].
+    """
+    size = 2 * window + 1
+    n = len(values)
+    fill = -np.inf if op is np.maximum else np.inf
+    padded = np.full(-(-n // size) * size, fill)
+    padded[:n] = values
+    blocks = padded.reshape(-1, size)
+    prefix = op.accumulate(blocks, axis=1).ravel()
+    suffix = op.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return op(suffix[:n - size + 1], prefix[size - 1:n])
+
+def _cluster_levels(levels, tolerance_percent=0.5):
+    """Groups sorted levels whose gap to the previous level is under tolerance_percent, returning cluster means."""
+    if levels.size == 0:
+        return []
+    levels = np.sort(levels)
+    gaps = np.diff(levels) / levels[:-1] * 100
+    starts = np.concatenate(([0], np.flatnonzero(~(gaps < tolerance_percent)) + 1))
+    counts = np.diff(np.append(starts, levels.size))
+    return (np.add.reduceat(levels, starts) / counts).tolist()
+
 def find_support_resistance(high_prices, low_prices, window=10):
-    """Helper function to find support and resistance levels."""
+    """Helper function to find support and resistance levels.
+
+    `window` may be a single int or a sequence of ints; pivots from every window are clustered together.
+    """
+    high_prices = np.asarray(high_prices, dtype=np.float64)
+    low_prices = np.asarray(low_prices, dtype=np.float64)
+    windows = [window] if np.isscalar(window) else list(window)
+
     supports, resistances = [], []
-    if len(high_prices) < (2 * window + 1):
-        return [], []
-        
-    for i in range(window, len(high_prices) - window):
-        if high_prices[i] == max(high_prices[i-window:i+window+1]):
-            resistances.append(high_prices[i])
-        if low_prices[i] == min(low_prices[i-window:i+window+1]):
-            supports.append(low_prices[i])
-            
-    if not supports and not resistances:
+    for w in windows:
+        if len(high_prices) < (2 * w + 1):
+            continue
+        core = slice(w, len(high_prices) - w)
+        resistances.append(high_prices[core][high_prices[core] == _sliding_extreme(high_prices, w, np.maximum)])
+        supports.append(low_prices[core][low_prices[core] == _sliding_extreme(low_prices, w, np.minimum)])
+
+    if not supports:
         return [], []
+    return _cluster_levels(np.concatenate(supports)), _cluster_levels(np.concatenate(resistances))
 
-    def cluster_levels(levels, tolerance_percent=0.5):
-        if not levels: return []
-        clustered = []
-        levels.sort()
-        current_cluster = [levels[0]]
-        for level in levels[1:]:
-            if (level - current_cluster[-1]) / current_cluster[-1] * 100 < tolerance_percent:
-                current_cluster.append(level)
-            else:
-                clustered.append(np.mean(current_cluster))
-                current_cluster = [level]
-        if current_cluster:
-            clustered.append(np.mean(current_cluster))
-        return clustered
-
-    return cluster_levels(supports), cluster_levels(resistances)
-
-def analyze_sniper_pro(df, params, rvol, adx_value, exchange, symbol):
+def analyze_sniper_pro(df, params, rvol, adx_value, exchange, symbol, indicators=None, min_rvol=None):
     """Analyzes data for the Sniper Pro (compression breakout) strategy."""
     try:
         compression_candles = int(params.get("compression_hours", 6) * 4) 
@@ -148,45 +159,60 @@ def analyze_sniper_pro(df, params, rvol, adx_value, exchange, symbol):
         logger.warning(f"Sniper Pro scan failed for {symbol}: {e}")
     return None
 
-async def analyze_whale_radar(df, params, rvol, adx_value, exchange, symbol):
-    """Analyzes order book for the Whale Radar strategy."""
-    try:
-        threshold = params.get("wall_threshold_usdt", 30000)
-        ob = await exchange.fetch_order_book(symbol, limit=20)
-        if not ob or not ob.get('bids'):
-            return None
+async def _has_whale_bid_wall(exchange, symbol, params):
+    """True when the bid wall holds more than `wall_threshold_usdt` of value.
 
-        bids = ob.get('bids', [])
-        total_bid_value = sum(float(price) * float(qty) for price, qty in bids[:10] if isinstance(price, (int, float)) and isinstance(qty, (int, float)))
+    The wall is the top `wall_levels` bids, or every bid within `wall_within_percent` of mid when set.
+    With `min_wall_persistence` the wall must also have been there for that fraction of recent samples.
+    """
+    threshold = params.get("wall_threshold_usdt", 30000)
+    within_percent = params.get("wall_within_percent") or ORDER_BOOK_WALL_PERCENT
+    levels = params.get("wall_levels", 10)
+    # الثبات يُقاس على نفس قيمة الجدار التي يُتخذ بها القرار
+    wall_metric = ("within", within_percent) if params.get("wall_within_percent") else ("top", levels)
+    depth, book = await order_book_service.get_metrics(exchange, symbol, within_percent, levels, wall_metric)
+    wall_value = book.wall_value(depth)
+    if wall_value <= threshold:
+        return False
+    min_persistence = params.get("min_wall_persistence", 0.0)
+    return not min_persistence or book.wall_persistence(threshold) >= min_persistence
 
-        if total_bid_value > threshold:
+async def analyze_whale_radar(df, params, rvol, adx_value, exchange, symbol, indicators=None):
+    """Analyzes order book for the Whale Radar strategy."""
+    try:
+        if await _has_whale_bid_wall(exchange, symbol, params):
             return {"reason": "whale_radar", "type": "long"}
     except Exception as e:
         logger.warning(f"Whale Radar scan failed for {symbol}: {e}")
     return None
 
-async def analyze_support_rebound(df, params, rvol, adx_value, exchange, symbol):
-    """Analyzes for bounces off of significant support levels."""
-    try:
-        ohlcv_1h = await exchange.fetch_ohlcv(symbol, '1h', limit=100)
-        if not ohlcv_1h or len(ohlcv_1h) < 50:
-            return None
+async def _is_near_support(exchange, symbol, params):
+    """True when the current 1h price sits within 1% above its closest support level."""
+    ohlcv_1h = await candle_cache.get_ohlcv(exchange, symbol, '1h', limit=params.get('lookback_candles', 100))
+    if not ohlcv_1h or len(ohlcv_1h) < 50:
+        return False
 
-        df_1h = pd.DataFrame(ohlcv_1h, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        current_price = df_1h['close'].iloc[-1]
+    bars_1h = CandleArrays.from_ohlcv(ohlcv_1h)
+    current_price = bars_1h.close[-1]
 
-        supports, _ = find_support_resistance(df_1h['high'].to_numpy(), df_1h['low'].to_numpy(), window=5)
-        if not supports:
-            return None
+    supports, _ = find_support_resistance(bars_1h.high, bars_1h.low, window=params.get('sr_windows', [5]))
+    if not supports:
+        return False
 
-        closest_support = max([s for s in supports if s < current_price], default=None)
-        if not closest_support:
-            return None
+    closest_support = max([s for s in supports if s < current_price], default=None)
+    if not closest_support:
+        return False
 
-        # Check if price is within 1% of the closest support
-        if (current_price - closest_support) / closest_support * 100 < 1.0:
+    # Check if price is within 1% of the closest support
+    return (current_price - closest_support) / closest_support * 100 < 1.0
+
+async def analyze_support_rebound(df, params, rvol, adx_value, exchange, symbol, indicators=None):
+    """Analyzes for bounces off of significant support levels."""
+    try:
+        if await _is_near_support(exchange, symbol, params):
+            ind = indicators or IndicatorSet(df)
             last_candle_15m = df.iloc[-2]
-            avg_volume_15m = df['volume'].rolling(window=20).mean().iloc[-2]
+            avg_volume_15m = ind.value("sma", source='volume', length=20)[-2]
 
             # Look for a bullish confirmation candle on the 15m chart with increased volume
             if last_candle_15m['close'] > last_candle_15m['open'] and last_candle_15m['volume'] > avg_volume_15m * 1.5:
@@ -196,6 +222,127 @@ async def analyze_support_rebound(df, params, rvol, adx_value, exchange, symbol)
     return None
 
 
+# =======================================================================================
+# --- Array Evaluation Path ---
+# =======================================================================================
+# نفس شروط الماسحات أعلاه لكن على مصفوفات NumPy متصلة بدلاً من صفوف pandas.
+# كل قاعدة تقبل `i` كفهرس واحد (-2 = آخر شمعة مغلقة) أو كمصفوفة فهارس لتقييم كل الشموع دفعة واحدة.
+
+class CandleArrays:
+    """Contiguous float64 OHLCV arrays for one symbol."""
+    __slots__ = ("timestamp", "open", "high", "low", "close", "volume")
+
+    def __init__(self, timestamp, open, high, low, close, volume):
+        self.timestamp, self.open, self.high, self.low, self.close, self.volume = timestamp, open, high, low, close, volume
+
+    def __len__(self):
+        return len(self.close)
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv):
+        data = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+        return cls(*(np.ascontiguousarray(data[:, k]) for k in range(6)))
+
+    @classmethod
+    def from_df(cls, df):
+        return cls(*(np.ascontiguousarray(df[c].to_numpy(dtype=np.float64))
+                     for c in ('timestamp', 'open', 'high', 'low', 'close', 'volume')))
+
+def _window_stat(values, window, i, func):
+    """func over the `window` values ending at index `i` (inclusive), for a scalar or an index array."""
+    if np.isscalar(i):
+        end = len(values) + i + 1 if i < 0 else i + 1
+        return func(values[end - window:end]) if end >= window else np.nan
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = func(np.lib.stride_tricks.sliding_window_view(values, window), axis=1)
+    return out[i]
+
+def momentum_breakout_rule(bars, ind, params, rvol, i, min_rvol=None):
+    vwap = ind.value("vwap")
+    bb = ind.get("bbands", length=params['bbands_period'], std=params['bbands_stddev'])
+    macd = ind.get("macd", fast=params['macd_fast'], slow=params['macd_slow'], signal=params['macd_signal'])
+    rsi = ind.value("rsi", length=params['rsi_period'])
+    if vwap is None or bb is None or macd is None or rsi is None:
+        return False
+    return ((macd['macd'][i - 1] <= macd['signal'][i - 1]) & (macd['macd'][i] > macd['signal'][i]) &
+            (bars.close[i] > bb['upper'][i]) & (bars.close[i] > vwap[i]) &
+            (rsi[i] < params['rsi_max_level']) & (rvol >= _min_rvol(min_rvol)))
+
+def breakout_squeeze_pro_rule(bars, ind, params, rvol, i, min_rvol=None):
+    bb = ind.get("bbands", length=params['bbands_period'], std=params['bbands_stddev'])
+    kc = ind.get("kc", length=params['keltner_period'], scalar=params['keltner_atr_multiplier'])
+    obv = ind.value("obv")
+    if bb is None or kc is None or obv is None:
+        return False
+    is_in_squeeze = (bb['lower'][i - 1] > kc['lower'][i - 1]) & (bb['upper'][i - 1] < kc['upper'][i - 1])
+    volume_ok = True
+    if params.get('volume_confirmation_enabled', True):
+        avg_volume = ind.value("sma", source='volume', length=20)
+        if avg_volume is None:
+            return False
+        volume_ok = bars.volume[i] > avg_volume[i] * 1.5
+    return (is_in_squeeze & (bars.close[i] > bb['upper'][i]) & volume_ok & (obv[i] > obv[i - 1]) &
+            (rvol >= _min_rvol(min_rvol)))
+
+def sniper_pro_rule(bars, ind, params, rvol, i, min_rvol=None):
+    compression_candles = int(params.get("compression_hours", 6) * 4)
+    if len(bars) < compression_candles + 2:
+        return False
+    highest_high = _window_stat(bars.high, compression_candles, i, np.max)
+    lowest_low = _window_stat(bars.low, compression_candles, i, np.min)
+    avg_volume = _window_stat(bars.volume, compression_candles, i, np.mean)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility = np.where(lowest_low > 0, (highest_high - lowest_low) / lowest_low * 100, np.inf)
+    return ((volatility < params.get("max_volatility_percent", 12.0)) &
+            (bars.close[i] > highest_high) & (bars.volume[i] > avg_volume * 2))
+
+def support_rebound_confirmation_rule(bars, ind, params, rvol, i, min_rvol=None):
+    avg_volume = ind.value("sma", source='volume', length=20)
+    if avg_volume is None:
+        return False
+    return (bars.close[i] > bars.open[i]) & (bars.volume[i] > avg_volume[i] * 1.5)
+
+def _array_scanner(reason, rule):
+    def scan(bars, ind, params, rvol, adx_value, exchange, symbol, min_rvol=None):
+        try:
+            if bool(rule(bars, ind, params, rvol, -2, min_rvol)):
+                return {"reason": reason, "type": "long"}
+        except Exception as e:
+            logger.debug(f"Error in array {reason} for {symbol}: {e}")
+        return None
+    scan.__name__ = f"analyze_{reason}_arrays"
+    return scan
+
+async def analyze_support_rebound_arrays(bars, ind, params, rvol, adx_value, exchange, symbol):
+    """Array version of analyze_support_rebound."""
+    try:
+        if await _is_near_support(exchange, symbol, params) and bool(support_rebound_confirmation_rule(bars, ind, params, rvol, -2)):
+            return {"reason": "support_rebound", "type": "long"}
+    except Exception as e:
+        logger.warning(f"Support Rebound scan failed for {symbol}: {e}")
+    return None
+
+async def analyze_whale_radar_arrays(bars, ind, params, rvol, adx_value, exchange, symbol):
+    """Whale Radar only reads the order book, so both paths share the same logic."""
+    return await analyze_whale_radar(None, params, rvol, adx_value, exchange, symbol)
+
+def compare_evaluation_paths(df, settings, rvol, adx_value=0, symbol="PARITY"):
+    """Runs the synchronous scanners through both paths on the same candles and returns any disagreements."""
+    min_rvol = settings['liquidity_filters']['min_rvol']
+    indicators = IndicatorSet(df).require(required_indicators(settings))
+    bars = CandleArrays.from_df(df)
+    mismatches = {}
+    for name, scanner in SCANNERS.items():
+        if asyncio.iscoroutinefunction(scanner):
+            continue
+        params = settings.get(name, {})
+        pandas_result = scanner(df, params, rvol, adx_value, None, symbol, indicators=indicators, min_rvol=min_rvol)
+        array_result = SCANNERS_ARRAY[name](bars, indicators, params, rvol, adx_value, None, symbol, min_rvol=min_rvol)
+        if pandas_result != array_result:
+            mismatches[name] = (pandas_result, array_result)
+    return mismatches
+
 # =======================================================================================
 # --- Scanners Dictionary ---
 # =======================================================================================
@@ -208,3 +355,128 @@ SCANNERS = {
     "whale_radar": analyze_whale_radar,
     "sniper_pro": analyze_sniper_pro,
 }
+
+# نفس الماسحات بتوقيع المصفوفات: (bars, indicators, params, rvol, adx_value, exchange, symbol)
+SCANNERS_ARRAY = {
+    "momentum_breakout": _array_scanner("momentum_breakout", momentum_breakout_rule),
+    "breakout_squeeze_pro": _array_scanner("breakout_squeeze_pro", breakout_squeeze_pro_rule),
+    "support_rebound": analyze_support_rebound_arrays,
+    "whale_radar": analyze_whale_radar_arrays,
+    "sniper_pro": _array_scanner("sniper_pro", sniper_pro_rule),
+}
+
+# المؤشرات التي يحتاجها كل ماسح، ليحسبها المحرك مرة واحدة فقط لكل عملة
+SCANNER_INDICATORS = {
+    "momentum_breakout": lambda p: [
+        spec("vwap"), spec("bbands", length=p['bbands_period'], std=p['bbands_stddev']),
+        spec("macd", fast=p['macd_fast'], slow=p['macd_slow'], signal=p['macd_signal']),
+        spec("rsi", length=p['rsi_period']),
+    ],
+    "breakout_squeeze_pro": lambda p: [
+        spec("bbands", length=p['bbands_period'], std=p['bbands_stddev']),
+        spec("kc", length=p['keltner_period'], scalar=p['keltner_atr_multiplier']),
+        spec("obv"), spec("sma", source='volume', length=20),
+    ],
+    "support_rebound": lambda p: [spec("sma", source='volume', length=20)],
+}
+
+def required_indicators(settings):
+    """Collects the unique indicator specs needed by all active scanners."""
+    specs = set()
+    for name in settings.get('active_scanners', []):
+        declare = SCANNER_INDICATORS.get(name)
+        if declare:
+            specs.update(declare(settings.get(name, {})))
+    return specs
+
+# =======================================================================================
+# --- Candle Evaluation (CPU-only, safe to run in a worker process) ---
+# =======================================================================================
+
+# الماسحات التي تحتاج طلباً للمنصة: (قاعدة شموع تُفحص أولاً أو None، الفحص الشبكي)
+NETWORK_SCANNERS = {
+    "support_rebound": (support_rebound_confirmation_rule, _is_near_support),
+    "whale_radar": (None, _has_whale_bid_wall),
+}
+
+def evaluation_specs(settings):
+    """Every indicator spec evaluate_candles needs: the active scanners' plus the filters'."""
+    return required_indicators(settings) | {
+        spec("sma", source='volume', length=settings['liquidity_filters']['rvol_period']),
+        spec("atr", length=settings['volatility_filters']['atr_period_for_filter']),
+        spec("atr", length=settings['atr_period']),
+        spec("ema", length=settings['ema_trend_filter']['ema_period']),
+        spec("adx", length=14),
+    }
+
+def evaluate_candles(candles, settings, symbol="", precomputed=None):
+    """Indicators, volatility/EMA filters and every candle-only scanner rule for one symbol.
+
+    `candles` is an (N, 6) OHLCV array. Everything here is pure CPU and picklable in and out, so
+    it can run inline or in a process pool. Scanners that need the exchange are returned in
+    `network_checks` (only if their candle part already passed) for the async worker to finish.
+    `precomputed` indicator values (from the incremental store) are used instead of recomputing.
+
+    Every rule reads the last closed candle (index -2); the forming candle is never evaluated:
+      - volatility: ATR(`atr_period_for_filter`) / close must be at least `min_atr_percent`;
+      - trend: with `ema_trend_filter.enabled`, close must be above EMA(`ema_period`);
+      - liquidity: rvol = volume / SMA(volume, `rvol_period`) goes to the scanners, which reject
+        anything below `liquidity_filters.min_rvol`.
+    `entry_price` is that same closed candle's close and `atr` is ATR(`atr_period`) on it, which
+    the worker turns into SL/TP exactly as backtester.simulate_trades does.
+    """
+    liq_filters = settings['liquidity_filters']
+    vol_filters = settings['volatility_filters']
+    ema_filters = settings['ema_trend_filter']
+    result = {"passed_filters": False, "reasons": [], "network_checks": [], "rvol": 0, "adx_value": 0, "timings": {}}
+
+    started = time.perf_counter()
+    bars = CandleArrays.from_ohlcv(candles)
+    df = pd.DataFrame({'timestamp': bars.timestamp, 'open': bars.open, 'high': bars.high,
+                       'low': bars.low, 'close': bars.close, 'volume': bars.volume})
+    df.index = pd.to_datetime(df['timestamp'], unit='ms')
+
+    # كل المؤشرات المطلوبة من الماسحات النشطة تُحسب مرة واحدة هنا
+    indicators = IndicatorSet(df, precomputed)
+    indicators.require(evaluation_specs(settings))
+    result["timings"]["indicators"] = time.perf_counter() - started
+
+    avg_volume = indicators.value("sma", source='volume', length=liq_filters['rvol_period'])[-2]
+    rvol = bars.volume[-2] / avg_volume if avg_volume > 0 else 0
+    last_close = bars.close[-2]
+
+    atr_filter = indicators.value("atr", length=vol_filters['atr_period_for_filter'])
+    if atr_filter is None or atr_filter[-2] / last_close * 100 < vol_filters['min_atr_percent']:
+        return result
+
+    if ema_filters['enabled']:
+        ema = indicators.value("ema", length=ema_filters['ema_period'])
+        if ema is None or not last_close > ema[-2]:
+            return result
+
+    adx = indicators.get("adx", length=14)
+    adx_value = float(adx['adx'][-2]) if adx else 0
+    atr = indicators.value("atr", length=settings['atr_period'])
+    use_arrays = settings.get('evaluation_mode') == 'array'
+    result.update({"passed_filters": True, "rvol": float(rvol), "adx_value": adx_value,
+                   "entry_price": float(last_close), "atr": float(atr[-2]) if atr is not None else None})
+
+    started = time.perf_counter()
+    for name in settings['active_scanners']:
+        params = settings.get(name, {})
+        if name in NETWORK_SCANNERS:
+            candle_rule, _ = NETWORK_SCANNERS[name]
+            if candle_rule is None or bool(candle_rule(bars, indicators, params, rvol, -2, liq_filters['min_rvol'])):
+                result["network_checks"].append(name)
+            continue
+        scanner = SCANNERS_ARRAY.get(name) if use_arrays else SCANNERS.get(name)
+        if not scanner:
+            continue
+        if use_arrays:
+            signal = scanner(bars, indicators, params, rvol, adx_value, None, symbol, min_rvol=liq_filters['min_rvol'])
+        else:
+            signal = scanner(df, params, rvol, adx_value, None, symbol, indicators=indicators, min_rvol=liq_filters['min_rvol'])
+        if signal:
+            result["reasons"].append(signal['reason'])
+    result["timings"]["strategies"] = time.perf_counter() - started
+    return result
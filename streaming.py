@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 📶 ملف البث المباشر (streaming.py) | بوت كاسحة الألغام v6.6 📶 ---
+# =======================================================================================
+
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+
+from config import TIMEFRAME, STREAM_RECONNECT_MAX_SECONDS, ORDER_BOOK_DEPTH
+from market_data import candle_cache
+from markets_cache import load_markets_cached
+from order_books import order_book_service
+
+# استيراد مشروط لمكتبة البث (ccxt.pro مدمجة في ccxt الحديثة)
+try:
+    import ccxt.pro as ccxt_pro
+    CCXT_PRO_AVAILABLE = True
+except ImportError:
+    CCXT_PRO_AVAILABLE = False
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+# =======================================================================================
+# --- Feeds ---
+# =======================================================================================
+
+class MarketFeed:
+    """كلاس أساسي لمصدر بيانات مباشر. يدفع الأحداث إلى الخدمة عبر on_tickers / on_candles."""
+    def __init__(self, exchange_id):
+        self.exchange_id = exchange_id
+
+    async def run(self, service):
+        raise NotImplementedError("يجب تعريف هذه الدالة في الكلاس الفرعي")
+
+    async def close(self):
+        pass
+
+class CcxtProFeed(MarketFeed):
+    """WebSocket tickers and klines through ccxt.pro for the symbols the service is subscribed to."""
+    def __init__(self, exchange_id, timeframe=TIMEFRAME):
+        super().__init__(exchange_id)
+        self.timeframe = timeframe
+        self.client = getattr(ccxt_pro, exchange_id)({'options': {'defaultType': 'spot'}})
+
+    async def run(self, service):
+        if not self.client.markets:   # عند إعادة الاتصال تبقى الأسواق المحمّلة سابقاً
+            await load_markets_cached(self.client)
+        tasks = [asyncio.create_task(self._tickers_loop(service))]
+        if self.client.has.get('watchOHLCVForSymbols'):
+            tasks.append(asyncio.create_task(self._klines_loop(service)))
+        if self.client.has.get('watchOrderBookForSymbols'):
+            tasks.append(asyncio.create_task(self._order_books_loop(service)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _tickers_loop(self, service):
+        while True:
+            symbols = service.subscribed_symbols(self.exchange_id)
+            if not symbols:
+                # بعض المنصات (okx, bybit) ترفض watch_tickers بدون قائمة رموز
+                await asyncio.sleep(1)
+                continue
+            tickers = await self.client.watch_tickers(symbols)
+            service.on_tickers(self.exchange_id, tickers)
+
+    async def _klines_loop(self, service):
+        while True:
+            symbols = service.subscribed_symbols(self.exchange_id)
+            if not symbols:
+                await asyncio.sleep(1)
+                continue
+            updates = await self.client.watch_ohlcv_for_symbols([[s, self.timeframe] for s in symbols])
+            for symbol, by_timeframe in updates.items():
+                for timeframe, candles in by_timeframe.items():
+                    service.on_candles(self.exchange_id, symbol, timeframe, candles)
+
+    async def _order_books_loop(self, service):
+        # ccxt.pro يبني الدفتر من لقطة + فروقات ويعيد المزامنة عند الفجوات، فنأخذ الدفتر كاملاً
+        while True:
+            symbols = service.subscribed_book_symbols(self.exchange_id)
+            if not symbols:
+                await asyncio.sleep(1)
+                continue
+            book = await self.client.watch_order_book_for_symbols(symbols, limit=ORDER_BOOK_DEPTH)
+            service.on_order_book(self.exchange_id, book['symbol'], book['bids'], book['asks'], book.get('nonce'))
+
+    async def close(self):
+        await self.client.close()
+
+class ReplayFeed(MarketFeed):
+    """Local stand-in feed: replays recorded events (JSONL file or in-memory list) for offline runs.
+
+    Each event is {"type": "tickers", "data": {symbol: ticker}},
+    {"type": "candles", "symbol": ..., "timeframe": ..., "data": [[ts, o, h, l, c, v], ...]},
+    {"type": "book", "symbol": ..., "bids": [...], "asks": [...], "nonce": ...} (snapshot) or
+    {"type": "book_delta", "symbol": ..., "bids": [...], "asks": [...], "nonce": ..., "prev_nonce": ...},
+    with an optional "delay" in seconds before it is emitted.
+    """
+    def __init__(self, exchange_id, events=None, path=None, speed=1.0, loop_forever=False):
+        super().__init__(exchange_id)
+        self.events = events
+        self.path = path
+        self.speed = speed
+        self.loop_forever = loop_forever
+
+    def _load_events(self):
+        if self.events is not None:
+            return self.events
+        with open(self.path, 'r', encoding='utf-8') as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        return [e for e in events if e.get('exchange', self.exchange_id) == self.exchange_id]
+
+    async def run(self, service):
+        events = self._load_events()
+        while True:
+            for event in events:
+                delay = event.get('delay', 0) / self.speed if self.speed else 0
+                if delay:
+                    await asyncio.sleep(delay)
+                if event['type'] == 'tickers':
+                    service.on_tickers(self.exchange_id, event['data'])
+                elif event['type'] == 'candles':
+                    service.on_candles(self.exchange_id, event['symbol'], event['timeframe'], event['data'])
+                elif event['type'] == 'book':
+                    service.on_order_book(self.exchange_id, event['symbol'], event['bids'], event['asks'], event.get('nonce'))
+                elif event['type'] == 'book_delta':
+                    service.on_order_book_delta(self.exchange_id, event['symbol'], event['bids'], event['asks'],
+                                                event.get('nonce'), event.get('prev_nonce'))
+            if not self.loop_forever:
+                # انتهى التسجيل: نبقى متصلين حتى تعلن الخدمة أن البيانات قديمة وتتحول للاستطلاع
+                await asyncio.Event().wait()
+
+# =======================================================================================
+# --- Streaming Market Data Service ---
+# =======================================================================================
+
+class StreamingMarketData:
+    """Keeps live tickers and candles in memory from push feeds, with REST polling as fallback.
+
+    Subscriptions are kept per group (e.g. "scan" for the current top-N, "trades" for open trades), and
+    replacing a group unsubscribes the symbols that left it. Every ticker carries its own receive time,
+    so a symbol the feed stopped sending is treated as missing even while the exchange stream is live.
+    """
+    def __init__(self, stale_after_seconds=30):
+        self.stale_after_seconds = stale_after_seconds
+        self.tickers = defaultdict(dict)
+        self.ticker_times = defaultdict(dict)
+        self.last_message = {}
+        self.subscriptions = defaultdict(dict)        # exchange_id -> {group: set(symbols)}
+        self.book_subscriptions = defaultdict(dict)
+        self._feeds = {}
+        self._tasks = {}
+        self.stats = {"stream_hits": 0, "poll_fallbacks": 0, "reconnects": 0}
+
+    @staticmethod
+    def _union(groups):
+        return set().union(*groups.values()) if groups else set()
+
+    def set_subscriptions(self, exchange_id, symbols, group="scan"):
+        """Replaces `group`'s symbols; symbols no other group wants are unsubscribed and their tickers dropped."""
+        groups = self.subscriptions[exchange_id]
+        before = self._union(groups)
+        groups[group] = set(symbols)
+        for symbol in before - self._union(groups):
+            self.tickers[exchange_id].pop(symbol, None)
+            self.ticker_times[exchange_id].pop(symbol, None)
+
+    def subscribed_symbols(self, exchange_id):
+        return sorted(self._union(self.subscriptions.get(exchange_id, {})))
+
+    def set_book_subscriptions(self, exchange_id, symbols, group="scan"):
+        self.book_subscriptions[exchange_id][group] = set(symbols)
+
+    def subscribed_book_symbols(self, exchange_id):
+        return sorted(self._union(self.book_subscriptions.get(exchange_id, {})))
+
+    def is_live(self, exchange_id):
+        last = self.last_message.get(exchange_id)
+        return last is not None and time.time() - last < self.stale_after_seconds
+
+    # --- أحداث قادمة من المصادر ---
+    def on_tickers(self, exchange_id, tickers):
+        now = time.time()
+        wanted = self._union(self.subscriptions.get(exchange_id, {}))
+        live, times = self.tickers[exchange_id], self.ticker_times[exchange_id]
+        for symbol, ticker in tickers.items():
+            if symbol in wanted:   # الرموز الملغى اشتراكها قد تستمر بالوصول من المنصة لفترة
+                live[symbol] = ticker
+                times[symbol] = now
+        self.last_message[exchange_id] = now
+
+    def on_candles(self, exchange_id, symbol, timeframe, candles):
+        self.last_message[exchange_id] = time.time()
+        feed = self._feeds.get(exchange_id)
+        client = getattr(feed, 'client', None)
+        timeframe_ms = client.parse_timeframe(timeframe) * 1000 if client else _timeframe_to_ms(timeframe)
+        candle_cache.ingest(exchange_id, symbol, timeframe, candles, timeframe_ms)
+
+    def on_order_book(self, exchange_id, symbol, bids, asks, nonce=None):
+        self.last_message[exchange_id] = time.time()
+        order_book_service.on_snapshot(exchange_id, symbol, bids, asks, nonce)
+
+    def on_order_book_delta(self, exchange_id, symbol, bids, asks, nonce=None, prev_nonce=None):
+        self.last_message[exchange_id] = time.time()
+        order_book_service.on_delta(exchange_id, symbol, bids, asks, nonce, prev_nonce)
+
+    # --- القراءة مع الرجوع للاستطلاع ---
+    def _fresh_ticker(self, exchange_id, symbol):
+        received = self.ticker_times[exchange_id].get(symbol)
+        if received is None or time.time() - received >= self.stale_after_seconds:
+            return None
+        return self.tickers[exchange_id].get(symbol)
+
+    async def get_tickers(self, exchange_id, exchange, symbols=None):
+        """Tickers for `symbols` from the stream when every one of them is fresh, otherwise one REST call.
+
+        With `symbols=None` (the whole exchange) this always goes to REST: the stream only holds subscribed symbols.
+        """
+        if symbols and self.is_live(exchange_id):
+            fresh = {s: self._fresh_ticker(exchange_id, s) for s in symbols}
+            if all(t is not None for t in fresh.values()):
+                self.stats["stream_hits"] += 1
+                return fresh
+        self.stats["poll_fallbacks"] += 1
+        return await exchange.fetch_tickers(symbols) if symbols else await exchange.fetch_tickers()
+
+    def get_price(self, exchange_id, symbol):
+        """Last streamed price, or None when the stream is down or has no fresh ticker for the symbol."""
+        if not self.is_live(exchange_id):
+            return None
+        ticker = self._fresh_ticker(exchange_id, symbol)
+        return ticker.get('last') if ticker else None
+
+    # --- دورة حياة المصادر ---
+    def start(self, feeds):
+        for feed in feeds:
+            self._feeds[feed.exchange_id] = feed
+            self._tasks[feed.exchange_id] = asyncio.create_task(self._supervise(feed))
+        logger.info(f"Streaming market data started for: {', '.join(self._feeds) or 'none'}.")
+
+    async def _supervise(self, feed):
+        backoff = 1
+        while True:
+            try:
+                await feed.run(self)
+                backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_message.pop(feed.exchange_id, None)
+                self.stats["reconnects"] += 1
+                logger.warning(f"Stream for {feed.exchange_id} dropped, polling fallback active. Reconnecting in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, STREAM_RECONNECT_MAX_SECONDS)
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        await asyncio.gather(*[feed.close() for feed in self._feeds.values()], return_exceptions=True)
+        self._tasks.clear()
+        self._feeds.clear()
+
+def _timeframe_to_ms(timeframe):
+    units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    return int(timeframe[:-1]) * units[timeframe[-1]] * 1000
+
+def build_feeds(exchange_ids, replay_file=None):
+    """ReplayFeed for every exchange when a replay file is given, otherwise ccxt.pro feeds."""
+    if replay_file:
+        return [ReplayFeed(ex_id, path=replay_file) for ex_id in exchange_ids]
+    if not CCXT_PRO_AVAILABLE:
+        logger.warning("ccxt.pro is not available. Streaming disabled, using REST polling.")
+        return []
+    return [CcxtProFeed(ex_id) for ex_id in exchange_ids]
+
+# نسخة واحدة مشتركة
+market_stream = StreamingMarketData()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# =======================================================================================
+# --- 🗂️ ملف فهرس الأسواق (symbol_universe.py) | بوت كاسحة الألغام v6.6 🗂️ ---
+# =======================================================================================
+# تصنيف الأسواق (أزواج USDT فورية مؤهلة، عملات مستقرة، رموز ذات رافعة) مرة واحدة من بيانات
+# load_markets بدلاً من فحوص النصوص على عشرات الآلاف من التيكرات في كل فحص. عند إعادة تحميل
+# قائمة الأسواق يُعاد التصنيف ويُسجل ما أضيف وما أزيل وما تغير تصنيفه (سوق أوقفته المنصة مثلاً).
+
+import asyncio
+import logging
+import time
+
+from config import LEVERAGED_TOKEN_SUFFIXES, UNIVERSE_SERVER_FILTER_EXCHANGES
+from markets_cache import save_markets_cache
+
+logger = logging.getLogger("MinesweeperBot_v6")
+
+ELIGIBLE, STABLECOIN, LEVERAGED, OTHER = "eligible", "stablecoin", "leveraged", "other"
+
+def classify_market(market, excluded_bases):
+    """One of ELIGIBLE / STABLECOIN / LEVERAGED / OTHER for a ccxt market entry."""
+    symbol = market.get('symbol') or ''
+    base = (market.get('base') or symbol.split('/')[0]).upper()
+    quote = (market.get('quote') or (symbol.split('/')[1] if '/' in symbol else '')).upper()
+    if quote != 'USDT' or market.get('spot') is False or market.get('active') is False or ':' in symbol:
+        return OTHER
+    if base in excluded_bases:
+        return STABLECOIN
+    if base.endswith(LEVERAGED_TOKEN_SUFFIXES) or market.get('info', {}).get('isLeveraged'):
+        return LEVERAGED
+    return ELIGIBLE
+
+class _ExchangeIndex:
+    __slots__ = ("markets_ref", "classes", "eligible", "built_at")
+
+    def __init__(self):
+        self.markets_ref = None   # كائن قاموس الأسواق الذي بُني منه الفهرس (ccxt يستبدله عند إعادة التحميل)
+        self.classes = {}
+        self.eligible = frozenset()
+        self.built_at = 0.0
+
+class SymbolUniverse:
+    """Per-exchange classification of markets, rebuilt whenever exchange.markets is replaced."""
+    def __init__(self):
+        self._indexes = {}
+        self._excluded = frozenset()
+        self.stats = {"full_builds": 0, "delta_updates": 0, "added": 0, "removed": 0, "reclassified": 0}
+
+    def sync(self, exchange_id, markets, excluded_bases):
+        """Updates the index if the markets dict or the stablecoin list changed. Returns the eligible set."""
+        excluded = frozenset(b.upper() for b in excluded_bases)
+        if excluded != self._excluded:
+            self._excluded = excluded
+            self._indexes.clear()   # تغيرت قائمة المستقرة: إعادة تصنيف الكل (عملية رخيصة ونادرة)
+        index = self._indexes.get(exchange_id)
+        if index is None:
+            index = self._indexes[exchange_id] = _ExchangeIndex()
+        if index.markets_ref is markets and len(index.classes) == len(markets or {}):
+            return index.eligible
+
+        markets = markets or {}
+        previous = index.classes
+        # التصنيف رخيص (بضع مقارنات لكل رمز)، فيُعاد لكل الأسواق: سوق باقٍ قد يتوقف أو يتغير نوعه
+        index.classes = {symbol: classify_market(m, excluded) for symbol, m in markets.items()}
+        if not previous:
+            self.stats["full_builds"] += 1
+        else:
+            added = index.classes.keys() - previous.keys()
+            removed = previous.keys() - index.classes.keys()
+            changed = [s for s, c in index.classes.items() if s in previous and previous[s] != c]
+            self.stats["delta_updates"] += 1
+            self.stats["added"] += len(added)
+            self.stats["removed"] += len(removed)
+            self.stats["reclassified"] += len(changed)
+            if added or removed or changed:
+                logger.info(f"Symbol universe for {exchange_id}: +{len(added)} / -{len(removed)} markets, "
+                            f"{len(changed)} reclassified.")
+        index.markets_ref = markets
+        index.eligible = frozenset(s for s, c in index.classes.items() if c == ELIGIBLE)
+        index.built_at = time.time()
+        return index.eligible
+
+    def eligible(self, exchange_id):
+        index = self._indexes.get(exchange_id)
+        return index.eligible if index else frozenset()
+
+    def request_symbols(self, exchange_id):
+        """Symbols to pass to fetch_tickers, or None where the exchange would fetch everything anyway."""
+        if exchange_id not in UNIVERSE_SERVER_FILTER_EXCHANGES:
+            return None
+        return sorted(self.eligible(exchange_id)) or None
+
+    def counts(self):
+        return {ex_id: {c: sum(1 for v in index.classes.values() if v == c) for c in (ELIGIBLE, STABLECOIN, LEVERAGED, OTHER)}
+                for ex_id, index in self._indexes.items()}
+
+async def reload_markets(exchanges, excluded_bases):
+    """Job helper: reloads market lists, applies the symbol deltas to the universe and refreshes the disk cache."""
+    async def reload(ex_id, exchange):
+        try:
+            await exchange.load_markets(reload=True)
+            symbol_universe.sync(ex_id, exchange.markets, excluded_bases)
+            await save_markets_cache(exchange)
+        except Exception as e:
+            logger.warning(f"Could not reload markets for {ex_id}, keeping the current universe: {e}")
+    await asyncio.gather(*[reload(ex_id, ex) for ex_id, ex in exchanges.items()])
+
+# نسخة واحدة مشتركة
+symbol_universe = SymbolUniverse()
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# وحدات المشروع في جذر المستودع وليست حزمة، لذا نضيف الجذر إلى مسار الاستيراد للاختبارات
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# سلسلة أقصر من فترات المؤشرات لا يجب أن تُسقط الاختبار الرجعي: المؤشر غير المحسوب يعني لا إشارات.
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+pytest.importorskip("ccxt")
+
+from backtester import BACKTEST_RULES, _trailing_stops, backtest_symbol, compute_signal_masks
+from config import DEFAULT_SETTINGS
+from indicators import IndicatorSet
+
+def _ohlcv(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 50 + np.cumsum(rng.normal(0, 0.5, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + rng.random(n) * 0.3
+    low = np.minimum(open_, close) - rng.random(n) * 0.3
+    volume = rng.random(n) * 1000 + 10
+    timestamp = np.arange(n, dtype=np.float64) * 15 * 60 * 1000
+    return np.column_stack([timestamp, open_, high, low, close, volume])
+
+class ShortHistoryIndicators(IndicatorSet):
+    """Like pandas_ta, returns None for any indicator whose length exceeds the series."""
+    def get(self, name, **params):
+        if params.get('length', 0) > len(self.df):
+            return None
+        return super().get(name, **params)
+
+def _indicators(candles):
+    df = pd.DataFrame(candles[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'],
+                      index=pd.to_datetime(candles[:, 0], unit='ms'))
+    return ShortHistoryIndicators(df)
+
+@pytest.fixture
+def settings():
+    s = copy.deepcopy(DEFAULT_SETTINGS)
+    s["active_scanners"] = list(BACKTEST_RULES)
+    # فلتر EMA قصير يمرر فحص الطول في backtest_symbol، والبقية أطول من السلسلة
+    s["ema_trend_filter"] = {"enabled": True, "ema_period": 5}
+    s["liquidity_filters"]["rvol_period"] = 60
+    s["volatility_filters"]["atr_period_for_filter"] = 60
+    s["atr_period"] = 60
+    return s
+
+def test_short_series_gives_empty_masks(settings):
+    candles = _ohlcv(30)
+    _, _, masks = compute_signal_masks(candles, settings, indicators=_indicators(candles))
+    assert set(masks) == set(BACKTEST_RULES)
+    assert not any(mask.any() for mask in masks.values())
+
+def test_short_series_backtests_to_no_trades(settings):
+    candles = _ohlcv(30)
+    assert backtest_symbol("SHORT/USDT", candles, settings, indicators=_indicators(candles)) == []
+
+@pytest.mark.parametrize("mode", ["atr", "ema"])
+def test_trailing_stop_without_indicator_keeps_the_initial_stop(settings, mode):
+    settings["trailing_sl_advanced"] = {"tsl_atr_period": 60, "tsl_ema_period": 60}
+    candles = _ohlcv(30)
+    bars, indicators, _ = compute_signal_masks(candles, settings, indicators=_indicators(candles))
+    stops = _trailing_stops(bars, 5, 30, entry=bars.open[5], sl=bars.open[5] * 0.9, mode=mode,
+                            settings=settings, indicators=indicators)
+    assert len(stops) == 25
+    assert np.all(stops >= bars.open[5] * 0.9)
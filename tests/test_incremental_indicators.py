@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# الحالة التراكمية يجب أن تطابق حساب pandas_ta الكامل ضمن حد تسامح صغير، شمعة بعد شمعة.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorSet, spec
+from incremental_indicators import IndicatorStore, verify_against_pandas_ta
+
+SPECS = [
+    spec("ema", length=20),
+    spec("macd", fast=12, slow=26, signal=9),
+    spec("rsi", length=14),
+    spec("atr", length=14),
+    spec("bbands", length=20, std=2.0),
+    spec("kc", length=20, scalar=1.5),
+]
+
+def _ohlcv(seed, n=500):
+    rng = np.random.default_rng(seed)
+    close = 50 + np.cumsum(rng.normal(0, 0.5, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + rng.random(n) * 0.3
+    low = np.minimum(open_, close) - rng.random(n) * 0.3
+    volume = rng.random(n) * 1000 + 10
+    timestamp = np.arange(n, dtype=np.float64) * 15 * 60 * 1000
+    return np.column_stack([timestamp, open_, high, low, close, volume])
+
+@pytest.mark.parametrize("indicator_spec", SPECS, ids=lambda s: s[0])
+@pytest.mark.parametrize("seed", range(3))
+def test_warmup_matches_pandas_ta(indicator_spec, seed):
+    pytest.importorskip("pandas_ta")
+    assert verify_against_pandas_ta(_ohlcv(seed), [indicator_spec]) == {}
+
+@pytest.mark.parametrize("seed", range(3))
+def test_candle_by_candle_updates_match_pandas_ta(seed):
+    pytest.importorskip("pandas_ta")
+    candles = _ohlcv(seed)
+    store = IndicatorStore()
+    key = ("binance", "TEST/USDT", "15m")
+    for end in range(300, len(candles) + 1, 7):
+        window = candles[:end]
+        precomputed = store.sync(key, window, SPECS)
+        df = pd.DataFrame(window[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'],
+                          index=pd.to_datetime(window[:, 0], unit='ms'))
+        reference = IndicatorSet(df)
+        for indicator_spec in SPECS:
+            expected = reference.get(indicator_spec[0], **dict(indicator_spec[1]))
+            for component, values in precomputed[indicator_spec].items():
+                np.testing.assert_allclose(values[-3:-1], expected[component][-3:-1], rtol=1e-6, atol=1e-9,
+                                           err_msg=f"{indicator_spec} {component} at {end}")
+    # أول مزامنة فقط تبني الحالة من الصفر، والبقية شموع جديدة
+    assert store.stats["warmups"] == 1
+
+def test_store_evicts_least_recently_used_series():
+    candles = _ohlcv(0, n=60)
+    store = IndicatorStore(max_series=2)
+    for symbol in ("A/USDT", "B/USDT", "C/USDT"):
+        store.sync(("binance", symbol, "15m"), candles, [spec("sma", source='close', length=10)])
+    assert list(store.series) == [("binance", "B/USDT", "15m"), ("binance", "C/USDT", "15m")]
+    assert store.stats["evicted"] == 1
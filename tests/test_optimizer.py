@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# ملف الأنماط المحسّنة: ما يكتبه المحسّن يُقرأ كأنماط بنفس شكل config.PRESETS ويُدمج في الإعدادات.
+
+import copy
+
+import pytest
+
+pytest.importorskip("pandas_ta")
+pytest.importorskip("ccxt")
+
+from config import DEFAULT_SETTINGS, PRESETS
+from optimizer import apply_preset, load_candidate_presets, write_candidate_presets
+
+def test_written_presets_load_and_apply(tmp_path):
+    path = str(tmp_path / "presets.json")
+    ranked = [
+        {"overrides": {"liquidity_filters.min_rvol": 2.2, "atr_sl_multiplier": 3.0}, "metrics": {"trades": 40}, "score": 12.5},
+        {"overrides": {"ema_trend_filter.enabled": False}, "metrics": {"trades": 25}, "score": 8.0},
+    ]
+    write_candidate_presets(ranked, path, top=5)
+
+    presets = load_candidate_presets(path)
+    assert list(presets) == ["OPT_1", "OPT_2"]
+    assert not set(presets) & set(PRESETS)
+
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    apply_preset(settings, presets["OPT_1"], "OPT_1")
+    assert settings["liquidity_filters"]["min_rvol"] == 2.2
+    assert settings["atr_sl_multiplier"] == 3.0
+    # الأقسام المتداخلة تُحدَّث ولا تُستبدل
+    assert settings["liquidity_filters"]["rvol_period"] == DEFAULT_SETTINGS["liquidity_filters"]["rvol_period"]
+    assert settings["active_preset_name"] == "OPT_1"
+
+def test_missing_or_corrupt_file_gives_no_presets(tmp_path):
+    assert load_candidate_presets(str(tmp_path / "missing.json")) == {}
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{not json", encoding="utf-8")
+    assert load_candidate_presets(str(corrupt)) == {}
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# الدلو المشترك لكل منصة: الطلبات الأثقل من سعة الدلو، إيقاف 429، والتباطؤ حسب رؤوس الاستجابة.
+# الوقت وهمي: asyncio.sleep داخل rate_limiter يقدّم الساعة بدلاً من الانتظار الفعلي.
+
+import asyncio
+import types
+
+import pytest
+
+ccxt = pytest.importorskip("ccxt")
+rate_limiter = pytest.importorskip("rate_limiter")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.slept.append(delay)
+        self.now += max(delay, 0.0)
+        await asyncio.sleep(0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(monotonic=clock.monotonic, perf_counter=clock.monotonic))
+    monkeypatch.setattr(rate_limiter, "asyncio", types.SimpleNamespace(sleep=clock.sleep))
+    monkeypatch.setattr(rate_limiter, "rate_limiters", {})
+    return clock
+
+def _run(coro, timeout=5):
+    return asyncio.run(asyncio.wait_for(coro, timeout))
+
+def test_cost_above_capacity_goes_through_and_leaves_debt(clock):
+    limiter = rate_limiter.ExchangeRateLimiter("binance", rate_limit_ms=50)   # 20 وحدة/ث، السعة 40
+    assert limiter.capacity == 40
+
+    _run(limiter.acquire(80))
+    assert clock.slept == []
+    assert limiter.tokens == pytest.approx(-40)
+
+    # الطلب التالي ينتظر سداد الدين (40 / 20 = ثانيتان) ثم يمر
+    _run(limiter.acquire(1))
+    assert sum(clock.slept) == pytest.approx(2.0)
+    assert limiter.stats["requests"] == 2
+
+def test_concurrent_heavy_calls_all_complete(clock):
+    limiter = rate_limiter.ExchangeRateLimiter("binance", rate_limit_ms=50)
+
+    async def burst():
+        await asyncio.gather(*(limiter.acquire(80) for _ in range(4)))
+
+    _run(burst())
+    assert limiter.stats["requests"] == 4
+    # الأول يمر فوراً، وكل واحد بعده ينتظر دين سابقه: 40 ثم 80 ثم 80 وحدة بمعدل 20/ث على الأقل
+    assert clock.now - 1000.0 >= 10.0 - 1e-9
+
+def test_rate_limited_pauses_and_backs_off(clock):
+    limiter = rate_limiter.ExchangeRateLimiter("binance", rate_limit_ms=50)
+    limiter.on_rate_limited(retry_after="3")
+    assert limiter.paused_until == pytest.approx(clock.now + 3)
+    assert limiter.rate_factor == pytest.approx(0.5)
+    assert limiter.tokens == 0
+
+    _run(limiter.acquire(1))
+    assert clock.now - 1000.0 >= 3.0
+
+    # بدون Retry-After تتضاعف مهلة الإيقاف في كل مرة حتى الحد الأعلى
+    pauses = []
+    for _ in range(3):
+        before = clock.now
+        limiter.on_rate_limited()
+        pauses.append(limiter.paused_until - before)
+        clock.now = limiter.paused_until
+    assert pauses == [2.0, 4.0, 8.0]
+    assert limiter.rate_factor == pytest.approx(0.1)
+
+def test_high_utilization_headers_slow_the_bucket_and_success_recovers(clock):
+    limiter = rate_limiter.ExchangeRateLimiter("binance", rate_limit_ms=50)
+    limiter.observe_headers({"X-MBX-USED-WEIGHT-1M": "5800"})
+    assert limiter.stats["throttled_by_headers"] == 1
+    assert limiter.rate_factor == pytest.approx(0.8)
+    assert limiter.tokens == 0
+
+    limiter.observe_headers({"x-ratelimit-remaining": "90", "x-ratelimit-limit": "100"})
+    assert limiter.stats["throttled_by_headers"] == 1
+    assert limiter.rate_factor == pytest.approx(0.8 * 1.02)
+
+def test_fake_exchange_open_orders_behind_shared_limiter(clock):
+    fake_exchange = pytest.importorskip("fake_exchange")
+    exchange = fake_exchange.FakeExchange("binance", markets=5, latency_ms=0, jitter_ms=0, rate_limit_ms=50)
+    limiter = rate_limiter.attach_rate_limiter(exchange)
+    assert limiter.capacity < 80
+
+    async def calls():
+        # fetch_open_orders بدون رمز وزنه 80، أي ضعف سعة الدلو
+        await exchange.fetch_open_orders()
+        await exchange.fetch_open_orders()
+
+    _run(calls())
+    assert exchange.stats["requests"] == 2
+    assert limiter.stats["weight"] == 160
+
+def test_429_from_exchange_pauses_the_bucket(clock):
+    fake_exchange = pytest.importorskip("fake_exchange")
+    exchange = fake_exchange.FakeExchange("binance", markets=5, latency_ms=0, jitter_ms=0, requests_per_second=1)
+    limiter = rate_limiter.attach_rate_limiter(exchange)
+
+    async def calls():
+        await exchange.fetch_ticker("BTC/USDT")
+        with pytest.raises(ccxt.RateLimitExceeded):
+            await exchange.fetch_ticker("BTC/USDT")
+
+    _run(calls())
+    assert limiter.stats["rate_limited"] == 1
+    assert limiter.paused_until == pytest.approx(clock.now + 1)
+
+def test_share_scales_tokens_and_heavy_call_completes_at_reduced_share(clock):
+    limiter = rate_limiter.get_rate_limiter("binance", rate_limit_ms=50)
+    _run(limiter.acquire(20))
+    assert limiter.tokens == pytest.approx(20)
+
+    # عملية رئيسية أثناء الفحص المقسم: 30% من الحد، أي 6 وحدات/ث وسعة 12
+    rate_limiter.set_budget_share(["binance"], 0.3)
+    assert limiter.capacity == pytest.approx(12)
+    assert limiter.tokens == pytest.approx(6)
+
+    _run(limiter.acquire(80))
+    _run(limiter.acquire(80))
+    assert limiter.stats["requests"] == 3
+    # الطلب الثالث ينتظر دين الثاني: (80 - 6) / 6 ثانية
+    assert sum(clock.slept) == pytest.approx(74 / 6)
+
+    # العودة للحصة الكاملة تكبّر الدين بالنسبة نفسها بدل محوه
+    debt = limiter.tokens
+    rate_limiter.set_budget_share(["binance"], 1.0)
+    assert limiter.tokens == pytest.approx(debt * 40 / 12)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# طابور الفحص: الأعلى أولوية أولاً، وعند انتهاء الميزانية يُسجل الباقي كمتخطى والجاري كملغى.
+
+import asyncio
+import types
+
+import pytest
+
+import scan_scheduler
+from scan_scheduler import PriorityScanQueue
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=100.0)
+    monkeypatch.setattr(scan_scheduler, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+def _markets(*symbols):
+    return [{"symbol": symbol, "exchange": "binance"} for symbol in symbols]
+
+def test_hands_out_best_score_first(clock):
+    queue = PriorityScanQueue(_markets("A", "B", "C"), [0.2, 0.9, 0.5])
+    assert [queue.get_nowait()["symbol"] for _ in range(3)] == ["B", "C", "A"]
+    assert queue.get_nowait() is None
+    assert queue.deadline is None and not queue.budget_exhausted()
+
+def test_budget_expiry_skips_the_rest_in_priority_order(clock):
+    queue = PriorityScanQueue(_markets("A", "B", "C", "D"), [0.1, 0.4, 0.3, 0.2], time_budget_seconds=5)
+    first = queue.get_nowait()
+    queue.task_done(first)
+    assert queue.remaining_seconds() == 5
+
+    clock.now += 5
+    assert queue.empty()
+    assert queue.get_nowait() is None
+
+    report = queue.report()
+    assert report["budget_exhausted"]
+    assert report["started"] == report["completed"] == 1
+    assert report["skipped"] == 3
+    assert report["skipped_symbols"] == ["C@binance", "D@binance", "A@binance"]
+    assert report["cancelled"] == 0
+    assert report["elapsed_seconds"] == 5
+
+def test_in_flight_markets_are_reported_as_cancelled(clock):
+    queue = PriorityScanQueue(_markets("A", "B", "C"), [0.3, 0.2, 0.1], time_budget_seconds=5)
+    done, running = queue.get_nowait(), queue.get_nowait()
+    queue.task_done(done)
+
+    clock.now += 6
+    queue.cancel_in_flight()
+    assert queue.cancelled == [running]
+    assert queue.get_nowait() is None
+
+    report = queue.report()
+    assert (report["started"], report["completed"], report["cancelled"], report["skipped"]) == (2, 1, 1, 1)
+
+def test_requeued_market_keeps_its_priority(clock):
+    queue = PriorityScanQueue(_markets("A", "B"), [0.9, 0.1])
+    market = queue.get_nowait()
+    asyncio.run(queue.put(dict(market, rate_limit_retried=True)))
+    retried = queue.get_nowait()
+    assert retried["symbol"] == "A" and retried["rate_limit_retried"]
+    assert queue.report()["requeued"] == 1
+    assert queue.report()["queued"] == 3
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# مسار المصفوفات (evaluation_mode="array") يجب أن يعطي نفس قرارات مسار DataFrame على نفس الشموع.
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+pytest.importorskip("ccxt")
+
+from config import DEFAULT_SETTINGS
+from strategies import SCANNERS, IndicatorSet, compare_evaluation_paths, required_indicators
+
+SYNC_SCANNERS = ["momentum_breakout", "breakout_squeeze_pro", "sniper_pro"]
+
+def _candles(seed, n=420, tick=None):
+    """Random walk with flat compression stretches ending in volume-backed breakouts.
+
+    `tick` rounds prices so highs and lows tie. Returns the frame and the breakout bar indices.
+    """
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.02, 0.6, n)
+    volume = rng.random(n) * 1000 + 100
+    breakouts = sorted(rng.choice(np.arange(240, n - 3, 30), size=4, replace=False))
+    for bar in breakouts:
+        steps[bar - 24:bar] *= 0.05              # انضغاط
+        steps[bar] = abs(steps[bar]) + 2.5       # اختراق
+        volume[bar] *= 8
+    close = 100 + np.cumsum(steps)
+    open_ = np.roll(close, 1)
+    open_[0] = close[0]
+    high = np.maximum(open_, close) + rng.random(n) * 0.3
+    low = np.minimum(open_, close) - rng.random(n) * 0.3
+    if tick:
+        open_, high, low, close = (np.round(a / tick) * tick for a in (open_, high, low, close))
+    timestamp = np.arange(n, dtype=np.float64) * 15 * 60 * 1000
+    df = pd.DataFrame({"timestamp": timestamp, "open": open_, "high": high, "low": low,
+                       "close": close, "volume": volume})
+    return df, breakouts
+
+def _windows(n, breakouts):
+    """Window ends every 5 bars plus the ends that put each breakout (and its neighbours) at the signal bar."""
+    ends = set(range(260, n + 1, 5))
+    for bar in breakouts:
+        ends.update(end for end in range(bar + 1, bar + 5) if end <= n)
+    return sorted(ends)
+
+@pytest.fixture
+def settings():
+    s = copy.deepcopy(DEFAULT_SETTINGS)
+    s["active_scanners"] = SYNC_SCANNERS
+    return s
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("tick", [None, 0.5])
+def test_array_path_matches_dataframe_path(settings, seed, tick):
+    df, breakouts = _candles(seed, tick=tick)
+    mismatches = []
+    for end in _windows(len(df), breakouts):
+        window = df.iloc[:end].reset_index(drop=True)
+        for rvol in (0.5, settings["liquidity_filters"]["min_rvol"], 3.0):
+            diff = compare_evaluation_paths(window, settings, rvol)
+            if diff:
+                mismatches.append((end, rvol, diff))
+    assert mismatches == []
+
+def test_fixtures_produce_signals(settings):
+    # حتى لا تنجح المقارنة لمجرد أن المسارين لا يعطيان أي إشارة
+    fired = 0
+    for seed in range(6):
+        df, breakouts = _candles(seed)
+        for end in _windows(len(df), breakouts):
+            window = df.iloc[:end].reset_index(drop=True)
+            indicators = IndicatorSet(window).require(required_indicators(settings))
+            fired += bool(SCANNERS["breakout_squeeze_pro"](window, settings["breakout_squeeze_pro"], 3.0, 0, None,
+                                                             "PARITY", indicators=indicators, min_rvol=1.0))
+    assert fired > 0
+
+def test_tied_highs_and_lows(settings):
+    # قمم وقيعان متساوية تماماً: حالة حدية لمقارنات > و >= في قواعد الاختراق
+    df, _ = _candles(42)
+    df.loc[300:330, ["open", "high", "low", "close"]] = [100.0, 100.5, 99.5, 100.0]
+    df.loc[331, ["open", "high", "low", "close", "volume"]] = [100.0, 100.5, 100.0, 100.5, 50000.0]
+    for end in range(320, 340):
+        assert compare_evaluation_paths(df.iloc[:end].reset_index(drop=True), settings, 3.0) == {}
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# تصنيف الأسواق ومزامنة الفهرس عند إعادة تحميل load_markets (إضافة، حذف، وتغير حالة سوق باقٍ).
+
+import pytest
+
+from symbol_universe import ELIGIBLE, LEVERAGED, OTHER, STABLECOIN, SymbolUniverse, classify_market
+
+EXCLUDED = frozenset({"USDC", "FDUSD"})
+
+def _market(symbol, **fields):
+    base, quote = symbol.split(':')[0].split('/')
+    return {"symbol": symbol, "base": base, "quote": quote, "spot": True, "active": True, **fields}
+
+@pytest.mark.parametrize("market, expected", [
+    (_market("BTC/USDT"), ELIGIBLE),
+    (_market("USDC/USDT"), STABLECOIN),
+    (_market("BTCUP/USDT"), LEVERAGED),
+    (_market("ETH/USDT", info={"isLeveraged": True}), LEVERAGED),
+    (_market("ETH/BTC"), OTHER),
+    (_market("ETH/USDT", active=False), OTHER),
+    (_market("ETH/USDT", spot=False), OTHER),
+    (_market("ETH/USDT:USDT"), OTHER),
+    ({"symbol": "sol/usdt"}, ELIGIBLE),   # بدون base/quote: تُستنتج من الرمز
+])
+def test_classify_market(market, expected):
+    assert classify_market(market, EXCLUDED) == expected
+
+def test_delta_sync_adds_removes_and_reclassifies():
+    universe = SymbolUniverse()
+    markets = {s: _market(s) for s in ("BTC/USDT", "ETH/USDT", "XRP/USDT", "USDC/USDT")}
+    assert universe.sync("binance", markets, EXCLUDED) == {"BTC/USDT", "ETH/USDT", "XRP/USDT"}
+    assert universe.stats["full_builds"] == 1
+
+    # إعادة التحميل تعطي قاموساً جديداً: عملة أضيفت، عملة أزيلت، وعملة باقية أوقفتها المنصة
+    reloaded = {s: dict(m) for s, m in markets.items() if s != "XRP/USDT"}
+    reloaded["SOL/USDT"] = _market("SOL/USDT")
+    reloaded["ETH/USDT"]["active"] = False
+    assert universe.sync("binance", reloaded, EXCLUDED) == {"BTC/USDT", "SOL/USDT"}
+    assert universe.stats == {"full_builds": 1, "delta_updates": 1, "added": 1, "removed": 1, "reclassified": 1}
+    assert universe.counts()["binance"] == {ELIGIBLE: 2, STABLECOIN: 1, LEVERAGED: 0, OTHER: 1}
+
+    # السوق يعود للعمل في تحميل لاحق
+    relisted = {s: dict(m) for s, m in reloaded.items()}
+    relisted["ETH/USDT"]["active"] = True
+    assert "ETH/USDT" in universe.sync("binance", relisted, EXCLUDED)
+    assert universe.stats["reclassified"] == 2
+
+def test_same_markets_dict_is_not_rebuilt():
+    universe = SymbolUniverse()
+    markets = {"BTC/USDT": _market("BTC/USDT")}
+    first = universe.sync("binance", markets, EXCLUDED)
+    assert universe.sync("binance", markets, EXCLUDED) is first
+    assert universe.stats["delta_updates"] == 0
+
+def test_changed_stablecoin_list_rebuilds_every_exchange():
+    universe = SymbolUniverse()
+    markets = {s: _market(s) for s in ("BTC/USDT", "USDC/USDT", "FDUSD/USDT")}
+    universe.sync("binance", markets, EXCLUDED)
+    assert universe.sync("binance", markets, {"USDC"}) == {"BTC/USDT", "FDUSD/USDT"}
+    assert universe.stats["full_builds"] == 2
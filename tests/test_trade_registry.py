@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# سجل الصفقات المفتوحة في الذاكرة يجب أن يبقى مطابقاً لقاعدة البيانات: فتح، تحديث الوقف، إغلاق فاشل، إغلاق.
+
+import pytest
+
+import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "trades.db"))
+    monkeypatch.setattr(database, "_connection", None)
+    monkeypatch.setattr(database, "active_trade_registry", database.ActiveTradeRegistry())
+    monkeypatch.setattr(database, "trade_write_buffer", database.TradeWriteBuffer())
+    database.init_database()
+    yield database
+    with database._connection_lock:
+        if database._connection is not None:
+            database._connection.close()
+            database._connection = None
+
+def _signal(symbol="BTC/USDT", exchange="Binance"):
+    return {"symbol": symbol, "exchange": exchange, "entry_price": 100.0, "stop_loss": 95.0, "take_profit": 110.0,
+            "quantity": 0.5, "entry_value_usdt": 50.0, "reason": "sniper_pro"}
+
+def _row(db, trade_id):
+    with db._transaction() as cursor:
+        cursor.execute("SELECT * FROM trades WHERE id = ?", (trade_id,))
+        return dict(cursor.fetchone())
+
+def test_open_update_failed_close_and_close(db, monkeypatch):
+    assert db.get_open_trades() == []
+    trade_id = db.log_trade_to_db(_signal())
+    assert [t['id'] for t in db.get_open_trades()] == [trade_id]
+    assert db.active_trade_registry.symbols_by_exchange() == {"binance": ["BTC/USDT"]}
+
+    # تحديث الوقف المؤجل يظهر في السجل فوراً ويُكتب عند التفريغ
+    db.update_trade_sl_in_db(trade_id, new_sl=101.0, highest_price=104.0)
+    assert db.get_open_trades()[0]['stop_loss'] == 101.0
+    assert _row(db, trade_id)['stop_loss'] == 95.0
+    assert db.flush_pending_trade_updates() == 1
+    assert _row(db, trade_id)['stop_loss'] == 101.0
+
+    # إغلاق يفشل داخل المعاملة: الصفقة تبقى في السجل، والتحديثات المؤجلة لا تضيع
+    db.update_trade_peak_price_in_db(trade_id, highest_price=106.0)
+    monkeypatch.setattr(db, "SQL_CLOSE_TRADE", "UPDATE no_such_table SET x = ?")
+    db.close_trade_in_db(trade_id, "ناجحة", exit_price=106.0, pnl_usdt=3.0)
+    assert [t['id'] for t in db.get_open_trades()] == [trade_id]
+    assert db.trade_write_buffer.pending() == {trade_id: {"highest_price": 106.0}}
+    assert _row(db, trade_id)['highest_price'] == 104.0   # أُلغي مع بقية المعاملة
+
+def test_close_removes_trade_and_writes_pending_peak(db):
+    db.get_open_trades()
+    trade_id = db.log_trade_to_db(_signal())
+    db.update_trade_peak_price_in_db(trade_id, highest_price=107.0)
+    db.close_trade_in_db(trade_id, "ناجحة", exit_price=106.0, pnl_usdt=3.0)
+
+    assert db.get_open_trades() == []
+    assert db.active_trade_registry.symbols_by_exchange() == {}
+    assert db.trade_write_buffer.pending() == {}
+    row = _row(db, trade_id)
+    assert row['highest_price'] == 107.0
+    assert row['exit_value_usdt'] == pytest.approx(53.0)
+
+def test_registry_load_overlays_pending_writes(db):
+    # صفقة فُتحت قبل تحميل السجل (مثلاً قبل إعادة التشغيل) ولها تحديث وقف لم يُكتب بعد
+    trade_id = db.log_trade_to_db(_signal())
+    other_id = db.log_trade_to_db(_signal("ETH/USDT", "Bybit"))
+    assert not db.active_trade_registry.loaded
+    db.update_trade_sl_in_db(trade_id, new_sl=99.0, highest_price=103.0)
+
+    trades = {t['id']: t for t in db.get_open_trades()}
+    assert db.active_trade_registry.loaded
+    assert set(trades) == {trade_id, other_id}
+    assert (trades[trade_id]['stop_loss'], trades[trade_id]['highest_price']) == (99.0, 103.0)
+    assert trades[other_id]['stop_loss'] == 95.0
+    assert db.active_trade_registry.symbols_by_exchange() == {"binance": ["BTC/USDT"], "bybit": ["ETH/USDT"]}